@@ -209,7 +209,7 @@ class Analyzer(enb.atable.ATable):
             # is as expected, since the experiment results being analyzed
             # cannot be assumed to be the same as the previous invocation of
             # this analyzer's get_df method).
-            os.remove(self.csv_support_path)
+            self.persistence_backend.remove(self.csv_support_path)
             enb.logger.debug(
                 f"Removed {self.csv_support_path} to allow "
                 f"re-analysis with {self.__class__.__name__}.")
@@ -199,6 +199,7 @@ import collections
 import collections.abc
 import copy
 import datetime
+import fnmatch
 import functools
 import glob
 import inspect
@@ -208,7 +209,9 @@ import os
 import sys
 import pickle
 import shutil
+import time
 import traceback
+import numpy as np
 import pandas as pd
 import rich.progress
 
@@ -620,6 +623,22 @@ class ATable(metaclass=MetaTable):
     #: Column names in this list are not retrieved nor saved to persistence,
     #: even if they are defined.
     ignored_columns = []
+    #: Name of the persistence backend (see `enb.atable.persistence_backends`)
+    #: used to store this table. If None, the backend is selected based on
+    #: the extension of csv_support_path (e.g., .npz, .parquet or .feather),
+    #: or given by enb.config.options.persistence_mode for other extensions.
+    persistence_mode = None
+    #: If enb.config.options.row_batch_size is not set, the number of rows computed
+    #: by each parallel task is chosen so that tasks take approximately this many seconds,
+    #: based on the computation time of previous chunks.
+    row_batch_target_seconds = 0.5
+    #: Rows computed by each parallel task before any computation time has been measured
+    #: (i.e., in the first chunk), if enb.config.options.row_batch_size is not set.
+    initial_row_batch_size = 8
+    #: When enb.config.options.persistence_flush_period is set and the persistence backend
+    #: cannot append rows, the full table is rewritten at most once every this many times
+    #: the duration of the last write, so that flushing does not dominate execution time.
+    flush_write_time_factor = 10
 
     def __init__(self, index="index", csv_support_path=None,
                  column_to_properties=None,
@@ -676,6 +695,28 @@ class ATable(metaclass=MetaTable):
         # but that method is not called.
         self._was_get_df_called = False
 
+    @property
+    def persistence_backend(self):
+        """Get the :class:`PersistenceBackend` instance used to load and save this
+        table's data, as selected by self.persistence_mode.
+        """
+        mode = self.persistence_mode
+        if mode is None and self.csv_support_path:
+            extension = os.path.splitext(self.csv_support_path)[1].lower()
+            mode = next((name for name, backend_class in persistence_backends.items()
+                         if extension in backend_class.extensions), None)
+        mode = mode if mode is not None else options.persistence_mode
+        backend = getattr(self, "_persistence_backend", None)
+        if backend is None or backend.name != mode:
+            try:
+                backend = persistence_backends[mode](atable=self)
+            except KeyError as ex:
+                raise ValueError(
+                    f"Invalid persistence mode {repr(mode)} for {self.__class__.__name__}. "
+                    f"Available modes: {', '.join(repr(m) for m in persistence_backends)}.") from ex
+            self._persistence_backend = backend
+        return backend
+
     # Methods related to defining columns and retrieving them afterwards
 
     @classmethod
@@ -1101,55 +1142,84 @@ class ATable(metaclass=MetaTable):
 
         # If the data is already available for all target indices,
         # there is no need to run the computations for those rows.
-        # This inner join efficiently queries the loaded table for existing target indices.
-        # Its length may be smaller than the requested index length, meaning
-        # that some rows are still to be computed.
-        target_df = pd.DataFrame(target_locs,
-                                 columns=[self.private_index_column])
-        target_df.set_index(self.private_index_column, drop=True, inplace=True)
-        target_df = target_df.merge(
-            right=loaded_table,
-            how="inner",
-            left_index=True,
-            right_index=True,
-            copy=False)
+        # The loaded table is efficiently queried for existing target indices
+        # (keeping their order). Its length may be smaller than the requested index length,
+        # meaning that some rows are still to be computed.
+        target_loc_index = pd.Index(target_locs, name=loaded_table.index.name)
+        is_loaded = target_loc_index.isin(loaded_table.index)
+        target_df = loaded_table.loc[target_loc_index[is_loaded]]
 
         assert len(target_df) <= len(target_locs), f"Error: Duplicated indices? " \
                                                    f"|target_df| = {len(target_df)}, |target_locs| = {len(target_locs)}"
 
-        # This is the case where input samples were previously processed,
-        # but new columns were defined/requested.
-        fill_needed = (fill_needed
-                       and (len(target_df) < len(target_indices)
-                            or target_df[target_columns].isnull().any().any()))
+        # Rows need to be computed if they do not exist in the loaded df, or if
+        # they have missing values in the target columns (e.g., when input samples were
+        # previously processed, but new columns were defined/requested).
+        needed_mask = ~is_loaded
+        if len(target_df) > 0:
+            needed_mask[is_loaded] = target_df[target_columns].isnull().any(axis=1).to_numpy()
+        fill_needed = fill_needed and needed_mask.any()
 
         if fill_needed or overwrite:
             # Needed locs are those of the rows that require an update or do not exist in the loaded df
-            if overwrite:
-                needed_indices = target_indices
-            else:
-                needed_indices = [
-                    index
-                    for index in target_df[target_columns].isnull().any(axis=1).index
-                    if index in target_indices]
-                needed_indices.extend(
-                    index
-                    for index in target_indices
-                    if indices_to_internal_loc(index) not in target_df.index)
+            needed_positions = range(len(target_indices)) if overwrite \
+                else np.flatnonzero(needed_mask)
+            needed_indices = [target_indices[i] for i in needed_positions]
+            needed_locs = [target_locs[i] for i in needed_positions]
+
+            # Rows can be made persistent as they are completed,
+            # instead of waiting for the whole chunk to be completed.
+            # Backends that support it append the rows. Otherwise, the full table
+            # is rewritten (at most once every flush_write_time_factor times the
+            # duration of the last write), and rows are kept until then.
+            streamed_dfs = []
+            unwritten_dfs = []
+            next_write_time = 0
+
+            def persist_completed_rows(rows_df):
+                streamed_dfs.append(rows_df)
+                os.makedirs(os.path.dirname(os.path.abspath(self.csv_support_path)), exist_ok=True)
+                if self.persistence_backend.append(df=rows_df, path=self.csv_support_path):
+                    return
+                unwritten_dfs.append(rows_df)
+                if time.time() >= next_write_time:
+                    write_unwritten_rows()
+
+            def write_unwritten_rows():
+                nonlocal loaded_table, next_write_time
+                time_before = time.time()
+                new_df = pd.concat(unwritten_dfs)
+                unwritten_dfs.clear()
+                loaded_table = pd.concat([loaded_table, new_df])
+                loaded_table = loaded_table[~loaded_table.index.duplicated(keep="last")]
+                self.write_persistence(df=loaded_table, output_csv=self.csv_support_path,
+                                       new_df=new_df)
+                next_write_time = time.time() \
+                                  + self.flush_write_time_factor * (time.time() - time_before)
 
             # Process only columns that need an update and rows that did not exist.
-            computed_df = self.compute_target_rows(
-                # By passing target_df instead of loaded_table,
-                # there is less memory (and possibly network traffic) footprint.
-                loaded_df=loaded_table,
-                target_df=target_df,
-                target_indices=needed_indices,
-                target_columns=target_columns,
-                overwrite=overwrite,
-                progress_tracker=progress_tracker)
-
-            # Insert or update rows
-            target_df = pd.concat([target_df, computed_df])
+            try:
+                computed_df = self.compute_target_rows(
+                    # By passing target_df instead of loaded_table,
+                    # there is less memory (and possibly network traffic) footprint.
+                    loaded_df=loaded_table,
+                    target_df=target_df,
+                    target_indices=needed_indices,
+                    target_columns=target_columns,
+                    overwrite=overwrite,
+                    progress_tracker=progress_tracker,
+                    target_locs=needed_locs,
+                    completed_rows_callback=persist_completed_rows
+                    if self.csv_support_path and options.persistence_flush_period else None)
+            except BaseException:
+                # Rows completed before the failure (or interruption) are not lost
+                if unwritten_dfs:
+                    write_unwritten_rows()
+                raise
+
+            # Insert or update rows. Streamed rows are not included in computed_df.
+            streamed_df = pd.concat(streamed_dfs) if streamed_dfs else None
+            target_df = pd.concat([target_df, streamed_df, computed_df])
             target_df = target_df[~target_df.index.duplicated(keep="last")]
             assert len(target_df) == len(target_indices), (len(target_df), len(target_indices))
 
@@ -1159,11 +1229,20 @@ class ATable(metaclass=MetaTable):
                                        if c not in self.ignored_columns]]
 
             # The new df is available. Store data into persistence if one is configured
-            if self.csv_support_path:
+            # (and if not all computed rows have already been stored)
+            new_locs = list(itertools.chain(
+                *(df.index for df in unwritten_dfs), computed_df.index))
+            if self.csv_support_path and (new_locs or streamed_dfs):
                 loaded_table = pd.concat([loaded_table, target_df])
                 loaded_table = loaded_table[~loaded_table.index.duplicated(keep="last")]
-                os.makedirs(os.path.dirname(os.path.abspath(self.csv_support_path)), exist_ok=True)
-                self.write_persistence(df=loaded_table, output_csv=self.csv_support_path)
+                if new_locs:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.csv_support_path)),
+                                exist_ok=True)
+                    self.write_persistence(df=loaded_table, output_csv=self.csv_support_path,
+                                           new_df=loaded_table.loc[new_locs])
+                else:
+                    # All rows have been appended to persistence as they were completed
+                    self.clear_cached_df(self.csv_support_path)
 
         if progress_tracker:
             progress_tracker.update_chunk_completed_rows(len(target_indices))
@@ -1186,16 +1265,23 @@ class ATable(metaclass=MetaTable):
         csv_support_path = csv_support_path \
             if csv_support_path is not None else self.csv_support_path
 
+        # Persistence data are kept in memory while they are not modified externally
+        loaded_df = self.get_cached_df(csv_support_path)
+        if loaded_df is not None:
+            if run_sanity_checks:
+                self.assert_df_sanity(loaded_df)
+            return loaded_df
+
         try:
             if not csv_support_path:
                 raise FileNotFoundError(
                     f"[W]arning: csv_support_path {csv_support_path} not set for {self}")
 
-            # Read CSV from disk
+            # Read data from disk. Non-scalar values are parsed by the backend.
             with enb.logger.debug_context(
                     f"Loading dataframe from persistence at {csv_support_path}",
                     sep="... "):
-                loaded_df = pd.read_csv(csv_support_path)
+                loaded_df = self.persistence_backend.read(csv_support_path)
                 enb.logger.debug(f"Loaded df with {len(loaded_df)} rows")
             loaded_columns = list(loaded_df.columns)
 
@@ -1222,21 +1308,12 @@ class ATable(metaclass=MetaTable):
             # so that (a) no bogus data is passed to the user (b) the columns
             # whose definition is removed can be removed from persistence
             # when the df is dumped into persistence.
-            with enb.logger.debug_context("Loading serialized objects"):
-                loaded_df = loaded_df[
-                    self.indices_and_columns + [self.private_index_column]]
-                for column, properties in self.column_to_properties.items():
-                    if column in loaded_columns:
-                        # Column existed - parse literals if needed
-                        if properties.has_ast_values:
-                            loaded_df[column] = loaded_df[column].apply(
-                                ast.literal_eval)
-                        elif properties.has_object_values:
-                            loaded_df[column] = loaded_df[column].apply(
-                                lambda v: pickle.loads(ast.literal_eval(v)))
-                    else:
-                        # Column did not exist: create with None values
-                        loaded_df[column] = None
+            loaded_df = loaded_df[
+                self.indices_and_columns + [self.private_index_column]]
+            for column in self.column_to_properties.keys():
+                if column not in loaded_columns:
+                    # Column did not exist: create with None values
+                    loaded_df[column] = None
 
         except (FileNotFoundError, pd.errors.EmptyDataError):
             with enb.logger.debug_context(
@@ -1258,15 +1335,59 @@ class ATable(metaclass=MetaTable):
                     raise CorruptedTableError(
                         f"Error loading table from {csv_support_path}") from ex
 
+        self.set_cached_df(csv_support_path, loaded_df)
+
         return loaded_df
 
+    def get_cached_df(self, csv_support_path):
+        """Get the persistence |DataFrame| previously loaded from
+        csv_support_path by this instance, or None if it is not available or
+        if the persistence data have been modified since.
+
+        Note that the returned |DataFrame| is shared among calls to this method,
+        and it must not be modified.
+        """
+        try:
+            signature, columns, df = self._loaded_df_cache[csv_support_path]
+        except (AttributeError, KeyError):
+            return None
+        if signature is None \
+                or columns != tuple(self.indices_and_columns) \
+                or signature != self.persistence_backend.get_signature(csv_support_path):
+            return None
+        return df
+
+    def set_cached_df(self, csv_support_path, df):
+        """Keep df in memory as the current contents of the
+        persistence data at csv_support_path. Only data read from persistence
+        should be cached, so that the returned types do not depend on the cache.
+        """
+        if not csv_support_path:
+            return
+        if not hasattr(self, "_loaded_df_cache"):
+            self._loaded_df_cache = {}
+        self._loaded_df_cache[csv_support_path] = (
+            self.persistence_backend.get_signature(csv_support_path),
+            tuple(self.indices_and_columns),
+            df)
+
+    def clear_cached_df(self, csv_support_path):
+        """Forget the persistence |DataFrame| cached for csv_support_path, if any.
+        """
+        try:
+            del self._loaded_df_cache[csv_support_path]
+        except (AttributeError, KeyError):
+            pass
+
     def compute_target_rows(self,
                             loaded_df,
                             target_df,
                             target_indices,
                             target_columns,
                             overwrite,
-                            progress_tracker=None):
+                            progress_tracker=None,
+                            completed_rows_callback=None,
+                            target_locs=None):
         """Generate and return a |DataFrame| with as many rows as given by
         `target_indices`, with the columns given in `target_columns`, using this table's column-setting functions.
 
@@ -1300,9 +1421,20 @@ class ATable(metaclass=MetaTable):
         :param progress_tracker: if not None, an enb.progress.ProgressTracker instance
           currently being used to keep track of this ATable's get_df call.
 
+        :param completed_rows_callback: if not None, a function that is called with
+          a |DataFrame| containing the successfully completed rows (with the same column
+          structure as the returned one) every enb.config.options.persistence_flush_period
+          seconds while rows are being computed. Each row is passed to this function at most
+          once, and is then not included in the returned |DataFrame| so that it
+          needs not be kept in memory.
+
+        :param target_locs: if not None, the list of internal locs corresponding to
+          target_indices, in the same order. Otherwise, they are computed here.
+
         :return: a |DataFrame| instance with the same column structure as loaded_df
           (i.e., following this class' column defintion). Each row corresponds to
-          one element in target_indices, maintaining the same order.
+          one element in target_indices not passed to completed_rows_callback,
+          maintaining the same order.
 
         :raises ColumnFailedError: if any of the column-setting functions crashes
           or fails to set a value to their assigned table cell.
@@ -1333,34 +1465,90 @@ class ATable(metaclass=MetaTable):
         enb.logger.debug(
             f"Filling {len(target_indices)} rows, {len(target_columns)} columns...")
 
-        # Start computation of new and updated rows in parallel_decorator
-        pending_ids = [parallel_compute_one_row.start(
-            atable_instance=self,
-            filtered_df=target_df,
-            index=index, loc=indices_to_internal_loc(index),
-            column_fun_tuples=column_fun_tuples,
-            overwrite=overwrite)
-            for index in target_indices]
+        # Start computation of new and updated rows in parallel_decorator.
+        # This instance and the column functions are sent at most once to each worker.
+        # Each task computes a batch of rows, and receives only the existing data
+        # for those rows (if any).
+        target_locs = target_locs if target_locs is not None \
+            else [indices_to_internal_loc(index) for index in target_indices]
+        shared_table = enb.parallel.share((self, column_fun_tuples))
+        loc_to_position = {loc: i for i, loc in enumerate(target_df.index)}
+        batch_size = self.get_row_batch_size(row_count=len(target_indices))
+        batch_bounds = self.get_row_batch_bounds(target_indices, batch_size)
+        batch_weights = self.get_batch_weights(
+            loaded_df=loaded_df, target_indices=target_indices,
+            target_locs=target_locs, batch_bounds=batch_bounds)
+        # Batches are started in decreasing order of weight, so that the longest ones
+        # do not delay the end of the computation. Results are kept in the original order.
+        submission_order = sorted(range(len(batch_bounds)),
+                                  key=lambda i: -batch_weights[i])
+        time_before = time.time()
+        try:
+            pending_ids = [None] * len(batch_bounds)
+            for batch_position in submission_order:
+                start, end = batch_bounds[batch_position]
+                batch_indices = target_indices[start:end]
+                batch_locs = target_locs[start:end]
+                pending_ids[batch_position] = parallel_compute_row_batch.start(
+                    shared_table=shared_table,
+                    filtered_df=target_df.iloc[[loc_to_position[loc] for loc in batch_locs
+                                                if loc in loc_to_position]],
+                    indices=batch_indices, locs=batch_locs,
+                    overwrite=overwrite)
+
+            # Iterating a progressive getter continues until all rows are obtained
+            with enb.logger.debug_context(
+                    f"Parallel computation of {len(target_indices)} "
+                    f"rows in {len(pending_ids)} batches of up to {batch_size} rows "
+                    f"using {self.__class__.__name__} [CPU limit: {enb.config.options.cpu_limit}]",
+                    sep="...\n"):
+                progressive_getter = enb.parallel.ProgressiveGetter(
+                    id_list=pending_ids,
+                    weight_list=batch_weights,
+                    iteration_period=self.progress_report_period,
+                    alive_bar=None)
+                streamed_id_count = 0
+                streamed_ids = set()
+                found_exceptions = []
+                last_stream_time = time.time()
+                for _ in progressive_getter:
+                    if not progress_tracker:
+                        enb.logger.debug(progressive_getter.report())
+                    else:
+                        progress_tracker.update_chunk_completed_rows(progressive_getter.completed_weight)
+
+                    if completed_rows_callback is not None \
+                            and time.time() - last_stream_time >= options.persistence_flush_period:
+                        # Completed rows are passed to the callback in the order they are completed,
+                        # and their results are then freed.
+                        new_completed_ids = progressive_getter.completed_ids[streamed_id_count:]
+                        streamed_id_count += len(new_completed_ids)
+                        streamed_series = []
+                        for row in itertools.chain(*enb.parallel.get(new_completed_ids)):
+                            if isinstance(row, Exception):
+                                found_exceptions.append(row)
+                            else:
+                                streamed_series.append(row)
+                        enb.parallel.release_results(new_completed_ids)
+                        streamed_ids.update(new_completed_ids)
+                        if streamed_series:
+                            completed_rows_callback(self.series_to_df(
+                                streamed_series, columns=loaded_df.columns))
+                        del streamed_series
+                        last_stream_time = time.time()
+                computed_series = list(itertools.chain(*enb.parallel.get(
+                    [i for i in pending_ids if i not in streamed_ids])))
+        finally:
+            shared_table.release()
 
-        # Iterating a progressive getter continues until all rows are obtained
-        with enb.logger.debug_context(
-                f"Parallel computation of {len(pending_ids)} "
-                f"rows using {self.__class__.__name__} [CPU limit: {enb.config.options.cpu_limit}]",
-                sep="...\n"):
-            progressive_getter = enb.parallel.ProgressiveGetter(
-                id_list=pending_ids,
-                iteration_period=self.progress_report_period,
-                alive_bar=None)
-            for _ in progressive_getter:
-                if not progress_tracker:
-                    enb.logger.debug(progressive_getter.report())
-                else:
-                    progress_tracker.update_chunk_completed_rows(len(progressive_getter.completed_ids))
-            computed_series = enb.parallel.get(pending_ids)
+        # The average computation time per row is used to choose the size of future batches
+        if target_indices:
+            self._row_seconds = (time.time() - time_before) \
+                                * min(len(target_indices), enb.parallel.get_worker_count()) \
+                                / len(target_indices)
 
         # Verify that everything went well
-        found_exceptions = [e for e in computed_series if
-                            isinstance(e, Exception)]
+        found_exceptions.extend(e for e in computed_series if isinstance(e, Exception))
         if found_exceptions:
             raise ColumnFailedError(
                 f"Error setting {len(found_exceptions)}/{len(target_indices)} indices"
@@ -1370,13 +1558,92 @@ class ATable(metaclass=MetaTable):
         # Return the dataframe with the requested rows and columns, without attempting to updated
         # the loaded dataframe (that is done by methods calling this one)
         with enb.logger.debug_context(msg="Merging requested rows"):
-            target_df = pd.DataFrame(
-                computed_series,
-                columns=[self.private_index_column] + list(loaded_df.columns))
-            target_df.set_index(self.private_index_column, inplace=True)
+            target_df = self.series_to_df(computed_series, columns=loaded_df.columns)
 
         return target_df
 
+    def series_to_df(self, series_list, columns):
+        """Build a |DataFrame| from a list of rows produced by :meth:`compute_one_row`,
+        indexed by self.private_index_column and with the given columns.
+        """
+        df = pd.DataFrame(series_list, columns=[self.private_index_column] + list(columns))
+        df.set_index(self.private_index_column, inplace=True)
+        return df
+
+    def get_row_batch_size(self, row_count):
+        """Get the number of rows to be computed by each parallel task
+        when row_count rows are computed by :meth:`compute_target_rows`.
+
+        If enb.config.options.row_batch_size is set, that value is used.
+        Otherwise, the batch size is chosen so that each task takes approximately
+        self.row_batch_target_seconds based on the computation times measured in
+        previous calls (e.g., previous chunks of :meth:`get_df`),
+        while producing at least 4 tasks per available worker for load balancing.
+
+        This method is called once per chunk, so the same batch size is used for all
+        rows of a chunk. Until a computation time has been measured (e.g., in the first
+        chunk), self.initial_row_batch_size is used.
+        """
+        if options.row_batch_size:
+            return options.row_batch_size
+        max_batch_size = math.ceil(row_count / (4 * enb.parallel.get_worker_count()))
+        row_seconds = getattr(self, "_row_seconds", None)
+        batch_size = int(self.row_batch_target_seconds / row_seconds) \
+            if row_seconds else self.initial_row_batch_size
+        return max(1, min(max_batch_size, batch_size))
+
+    def get_row_batch_bounds(self, target_indices, batch_size):
+        """Split target_indices into the batches of rows computed by each parallel task
+        in :meth:`compute_target_rows`.
+
+        By default, consecutive batches of batch_size rows are used.
+        Subclasses may overwrite this method, e.g., to keep related rows in the same batch.
+
+        :return: a list of (start, end) tuples, so that target_indices[start:end]
+          are the indices of each batch. Batches must cover all target_indices
+          in the same order.
+        """
+        return [(start, min(start + batch_size, len(target_indices)))
+                for start in range(0, len(target_indices), batch_size)]
+
+    def get_row_costs(self, loaded_df, target_indices, target_locs):
+        """Estimate the relative computation cost (e.g., in seconds) of each of the
+        target_indices to be computed by :meth:`compute_target_rows`.
+
+        By default, costs are not estimated and None is returned.
+        Subclasses may overwrite this method, e.g., based on previously stored results
+        in loaded_df, so that the most expensive rows are started first.
+
+        :param loaded_df: the full loaded dataframe read from persistence.
+        :param target_indices: list of indices to be computed.
+        :param target_locs: list of internal locs corresponding to target_indices.
+        :return: None, or a list with a non-negative cost for each element
+          of target_indices, in the same order.
+        """
+        # pylint: disable=unused-argument
+        return None
+
+    def get_batch_weights(self, loaded_df, target_indices, target_locs, batch_bounds):
+        """Get the weight of each batch of rows defined by batch_bounds, as used
+        by :meth:`compute_target_rows` to choose the order in which batches are started
+        and to report progress.
+
+        Weights are expressed in rows, i.e., they add up to len(target_indices).
+        If :meth:`get_row_costs` provides cost estimations, each batch's weight
+        is proportional to its total cost. Otherwise, the number of rows of each batch
+        is used.
+        """
+        batch_lengths = [end - start for start, end in batch_bounds]
+        row_costs = self.get_row_costs(
+            loaded_df=loaded_df, target_indices=target_indices, target_locs=target_locs)
+        if row_costs is None:
+            return batch_lengths
+        batch_costs = [sum(row_costs[start:end]) for start, end in batch_bounds]
+        total_cost = sum(batch_costs)
+        if not total_cost > 0:
+            return batch_lengths
+        return [len(target_indices) * cost / total_cost for cost in batch_costs]
+
     def compute_one_row(self, filtered_df, index, loc, column_fun_tuples,
                         overwrite):
         """Process a single row of an ATable instance, returning a Series
@@ -1409,6 +1676,9 @@ class ATable(metaclass=MetaTable):
         except KeyError:
             row = pd.Series({k: None for k in self.column_to_properties.keys()})
 
+        # Cells with missing values are identified for the whole row at once
+        missing_columns = set(row.index[row.isnull()]) if not overwrite else set()
+
         with enb.logger.debug_context(
                 f"Computing {self.__class__.__name__}'s row for index {index}"):
             called_functions = set()
@@ -1430,13 +1700,11 @@ class ATable(metaclass=MetaTable):
                     enb.logger.debug(f"Skipping non-selected column {column}")
                     continue
 
-                if overwrite or column not in row or row[column] is None:
+                if overwrite or column not in row or column in missing_columns:
                     skip = False
                 else:
-                    try:
-                        skip = not math.isnan(float(row[column]))
-                    except (ValueError, TypeError):
-                        skip = len(str(row[column])) > 0
+                    # Empty strings are also considered missing values
+                    skip = not isinstance(row[column], str) or len(row[column]) > 0
                 if skip:
                     enb.logger.debug(
                         f"Skipping existing value for column {repr(column)},  "
@@ -1522,23 +1790,23 @@ class ATable(metaclass=MetaTable):
 
         return row
 
-    def write_persistence(self, df, output_csv=None):
-        """Dump a dataframe produced by this table into persistent storage.
+    def write_persistence(self, df, output_csv=None, new_df=None):
+        """Dump a dataframe produced by this table into persistent storage,
+        using self.persistence_backend.
 
         :param output_csv: if None, self.csv_support_path is used as the output path.
+        :param new_df: if not None, the subset of rows of df that have been added or
+          updated since persistence was loaded. Some backends (e.g., the journaled one)
+          use it to avoid rewriting the full table.
         """
+        output_csv = output_csv if output_csv is not None else self.csv_support_path
         with enb.logger.debug_context(
-                msg=f"Dumping CSV with {len(df)} entries into {output_csv}",
+                msg=f"Dumping persistence with {len(df)} entries into {output_csv}",
                 msg_after=" dumped"):
-            if any(p.has_object_values for p in
-                   self.column_to_properties.values()):
-                # If pickling is needed, a copy of the df is made so as not to modify the original.
-                df = df.copy()
-                for column, properties in self.column_to_properties.items():
-                    if properties.has_object_values:
-                        df[column] = df[column].apply(pickle.dumps)
-            output_csv = output_csv if output_csv is not None else self.csv_support_path
-            df.to_csv(output_csv, index=True)
+            self.persistence_backend.write(df=df, path=output_csv, new_df=new_df)
+            # The written df may have different types than the stored data
+            # (e.g., for non-scalar columns), so they are read again when needed
+            self.clear_cached_df(output_csv)
 
     def get_matlab_struct_str(self, target_indices):
         """Return a string containing MATLAB code that defines a list of structs
@@ -1581,6 +1849,13 @@ class ATable(metaclass=MetaTable):
 
         check_unique_indices(df)
 
+    def __getstate__(self):
+        """Persistence data kept in memory are not sent to other processes.
+        """
+        state = dict(self.__dict__)
+        state.pop("_loaded_df_cache", None)
+        return state
+
     def __del__(self):
         """Upon deletion of an ATable instance, if the get_df method had not been called at
         some point, then a warning message is shown. This is to help new users realize
@@ -1757,6 +2032,379 @@ class SummaryTable(ATable):
         return index
 
 
+class PersistenceBackend:
+    """Base class for the storage engines used by |ATable| instances
+    to load and save their persistence data.
+
+    Backends are registered by name in :data:`persistence_backends` and
+    selected with the `persistence_mode` attribute of |ATable|. If that attribute
+    is None, the backend is chosen based on the extension of the persistence path,
+    or by `enb.config.options.persistence_mode` if no backend claims that extension.
+    New backends can be plugged in by subclassing this class and adding it
+    to that dictionary.
+
+    Dataframes passed to and returned by backends contain the cell values
+    as produced by the column-setting functions, i.e., backends are
+    responsible for encoding and decoding non-scalar values.
+    """
+    #: Name with which the backend is registered in :data:`persistence_backends`.
+    name = None
+    #: Lowercase file extensions (including the dot) for which this backend is
+    #: selected by default, e.g., when an |ATable|'s csv_support_path ends in one of them.
+    extensions = ()
+
+    def __init__(self, atable):
+        """
+        :param atable: |ATable| instance whose data are stored with this backend.
+        """
+        self.atable = atable
+
+    def read(self, path):
+        """Read the data stored at path.
+
+        :return: a |DataFrame| with the stored rows. The atable's private index
+          column is a regular column of this dataframe.
+        :raises FileNotFoundError: if no data are stored at path.
+        """
+        raise NotImplementedError()
+
+    def write(self, df, path, new_df=None):
+        """Make df persistent at path.
+
+        :param df: |DataFrame| with all rows of the table, indexed by the
+          atable's private index column.
+        :param path: path where the data are to be stored.
+        :param new_df: if not None, a |DataFrame| with the subset of rows of df
+          that have been added or modified since path was last read.
+          Backends may use it to avoid rewriting the full table.
+        """
+        raise NotImplementedError()
+
+    def append(self, df, path):
+        """Add the rows of df to the data stored at path without rewriting them,
+        if supported by this backend. Rows with an existing index replace
+        the stored ones. By default, appending is not supported.
+
+        :param df: |DataFrame| with the new or updated rows, indexed by the
+          atable's private index column.
+        :return: True if the rows have been stored, or False if appending is not
+          supported (in that case, :meth:`write` must be used instead).
+        """
+        # pylint: disable=no-self-use,unused-argument
+        return False
+
+    def get_signature(self, path):
+        """Return a hashable value that changes whenever the data stored
+        at path are modified, or None if no data are stored there.
+        By default, the modification time and size of path are used.
+        """
+        # pylint: disable=no-self-use
+        try:
+            path_stat = os.stat(path)
+            return path_stat.st_mtime_ns, path_stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def compact(self, path):
+        """Reorganize the data stored at path, if needed by the backend.
+        By default, nothing is done.
+        """
+
+    def remove(self, path):
+        """Remove all data stored at path, if any.
+        """
+        # pylint: disable=no-self-use
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class CSVPersistenceBackend(PersistenceBackend):
+    """Store the full table in a CSV file, which is rewritten entirely
+    every time data are made persistent.
+
+    Scalar values are stored directly. Non-scalar values are stored as
+    literals (for columns with iterable or dict values) or as the literal of
+    their pickled bytes (for columns with object values).
+    """
+    name = "csv"
+
+    def read(self, path):
+        return self.decode_df(pd.read_csv(path, float_precision="round_trip"))
+
+    def write(self, df, path, new_df=None):
+        self.encode_df(df).to_csv(path, index=True)
+
+    def encode_df(self, df):
+        """Return a version of df with non-scalar values ready to be stored as text.
+        If no encoding is necessary, df itself is returned. Otherwise, a copy
+        is made so as not to modify the original.
+        """
+        object_columns = [c for c, p in self.atable.column_to_properties.items()
+                          if p.has_object_values and c in df.columns]
+        if object_columns:
+            df = df.copy()
+            for column in object_columns:
+                df[column] = df[column].apply(pickle.dumps)
+        return df
+
+    def decode_df(self, df):
+        """Parse the non-scalar values of a df read from a CSV file (in place),
+        and return it.
+        """
+        with enb.logger.debug_context("Loading serialized objects"):
+            for column, properties in self.atable.column_to_properties.items():
+                if column not in df.columns:
+                    continue
+                if properties.has_ast_values:
+                    df[column] = df[column].apply(ast.literal_eval)
+                elif properties.has_object_values:
+                    df[column] = df[column].apply(
+                        lambda v: pickle.loads(ast.literal_eval(v)))
+        return df
+
+
+class JournaledCSVPersistenceBackend(CSVPersistenceBackend):
+    """Append-only version of :class:`CSVPersistenceBackend`.
+
+    New and updated rows are appended to a journal file next to the
+    main CSV, so that the cost of making a chunk persistent is proportional to
+    the size of the chunk and not to the size of the table.
+    When reading, rows in the journal take precedence over those in the main
+    CSV with the same index.
+
+    The journal is merged into the main CSV (compacted) when the number of
+    journaled rows exceeds `min_compaction_rows` plus `compaction_ratio` times
+    the number of rows in the main CSV, or when the set of columns changes.
+    """
+    name = "journal"
+    #: Suffix appended to the persistence path to obtain the journal path.
+    journal_suffix = ".journal"
+    #: Journal rows allowed per row in the main CSV before compaction.
+    compaction_ratio = 1
+    #: Journal rows allowed before compaction regardless of the main CSV size.
+    min_compaction_rows = 1000
+
+    def __init__(self, atable):
+        super().__init__(atable=atable)
+        # Path to (main CSV row count, journal row count, journal columns),
+        # updated whenever a path is read or written.
+        self.path_to_state = {}
+
+    def get_journal_path(self, path):
+        """Get the path of the journal associated to a persistence path.
+        """
+        return f"{path}{self.journal_suffix}"
+
+    def read(self, path):
+        journal_path = self.get_journal_path(path)
+        try:
+            main_df = pd.read_csv(path, float_precision="round_trip")
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            if not os.path.exists(journal_path):
+                raise
+            main_df = None
+
+        if os.path.exists(journal_path):
+            journal_df = pd.read_csv(journal_path, float_precision="round_trip")
+            journal_columns = list(journal_df.columns)
+            df = pd.concat([main_df, journal_df], ignore_index=True) \
+                if main_df is not None else journal_df
+            df = df[~df[self.atable.private_index_column].duplicated(keep="last")]
+            df.reset_index(drop=True, inplace=True)
+        else:
+            journal_df = None
+            journal_columns = None
+            df = main_df
+
+        self.path_to_state[path] = (
+            len(main_df) if main_df is not None else 0,
+            len(journal_df) if journal_df is not None else 0,
+            journal_columns)
+
+        return self.decode_df(df)
+
+    def write(self, df, path, new_df=None):
+        try:
+            main_row_count, journal_row_count, journal_columns = self.path_to_state[path]
+        except KeyError:
+            main_row_count, journal_row_count, journal_columns = None, None, None
+
+        if new_df is None or main_row_count is None:
+            # The current contents are unknown. A full write is safest.
+            return self.write_compacted(df=df, path=path)
+
+        columns = [df.index.name] + list(df.columns)
+        if journal_columns is not None and journal_columns != columns:
+            # The table structure changed since the journal was started
+            return self.write_compacted(df=df, path=path)
+
+        if journal_row_count + len(new_df) \
+                > self.min_compaction_rows + self.compaction_ratio * main_row_count:
+            return self.write_compacted(df=df, path=path)
+
+        self.append(df=new_df, path=path)
+        return None
+
+    def append(self, df, path):
+        """Append the rows of df to the journal of path, without compacting it.
+        Appending is not possible if the current contents of path are unknown
+        or were stored with different columns.
+        """
+        try:
+            main_row_count, journal_row_count, journal_columns = self.path_to_state[path]
+        except KeyError:
+            if os.path.exists(path) or os.path.exists(self.get_journal_path(path)):
+                return False
+            main_row_count, journal_row_count, journal_columns = 0, 0, None
+        columns = [df.index.name] + list(df.columns)
+        if journal_columns is not None and journal_columns != columns:
+            return False
+
+        journal_path = self.get_journal_path(path)
+        with enb.logger.debug_context(
+                f"Appending {len(df)} rows to {journal_path}"):
+            self.encode_df(df).to_csv(
+                journal_path, mode="a", index=True,
+                header=not os.path.exists(journal_path))
+        self.path_to_state[path] = (main_row_count, journal_row_count + len(df), columns)
+        return True
+
+    def write_compacted(self, df, path):
+        """Write all rows of df into the main CSV at path and remove the journal.
+        """
+        super().write(df=df, path=path)
+        journal_path = self.get_journal_path(path)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        self.path_to_state[path] = (len(df), 0, None)
+
+    def get_signature(self, path):
+        main_signature = super().get_signature(path)
+        journal_signature = super().get_signature(self.get_journal_path(path))
+        if main_signature is None and journal_signature is None:
+            return None
+        return main_signature, journal_signature
+
+    def compact(self, path):
+        """Merge the journal of path (if any) into its main CSV file.
+        """
+        if os.path.exists(self.get_journal_path(path)):
+            df = self.read(path)
+            df = df.set_index(self.atable.private_index_column, drop=True)
+            self.write_compacted(df=df, path=path)
+
+    def remove(self, path):
+        super().remove(path)
+        super().remove(self.get_journal_path(path))
+        self.path_to_state.pop(path, None)
+
+
+class ColumnarPersistenceBackend(PersistenceBackend):
+    """Base class for binary backends that store each column separately.
+    Scalar columns are stored with their native types, and each cell of
+    non-scalar columns (those with iterable, dict or object values) is pickled.
+    """
+
+    def get_nonscalar_columns(self, df):
+        """Get the list of columns of df declared to contain non-scalar values.
+        """
+        return [c for c, p in self.atable.column_to_properties.items()
+                if (p.has_ast_values or p.has_object_values) and c in df.columns]
+
+    def encode_df(self, df):
+        """Return a copy of df with the private index column as a regular column,
+        and with non-scalar values pickled.
+        """
+        df = df.reset_index()
+        for column in self.get_nonscalar_columns(df):
+            df[column] = df[column].apply(pickle.dumps)
+        return df
+
+    def decode_df(self, df):
+        """Unpickle the non-scalar values of a df read from persistence (in place),
+        and return it.
+        """
+        for column in self.get_nonscalar_columns(df):
+            df[column] = df[column].apply(pickle.loads)
+        return df
+
+
+class ParquetPersistenceBackend(ColumnarPersistenceBackend):
+    """Store the table in the Apache Parquet format. Requires pyarrow.
+    """
+    name = "parquet"
+    extensions = (".parquet",)
+
+    def read(self, path):
+        return self.decode_df(pd.read_parquet(path))
+
+    def write(self, df, path, new_df=None):
+        self.encode_df(df).to_parquet(path, index=False)
+
+
+class FeatherPersistenceBackend(ColumnarPersistenceBackend):
+    """Store the table in the Apache Arrow IPC (Feather) format. Requires pyarrow.
+    """
+    name = "feather"
+    extensions = (".feather",)
+
+    def read(self, path):
+        return self.decode_df(pd.read_feather(path))
+
+    def write(self, df, path, new_df=None):
+        self.encode_df(df).to_feather(path)
+
+
+class NPZPersistenceBackend(ColumnarPersistenceBackend):
+    """Store the table in numpy's npz format, without any additional dependency.
+
+    Numeric and boolean columns are stored as typed arrays. All other columns
+    are pickled as a whole, so that a single `pickle.loads` call is needed
+    per column when loading.
+    """
+    name = "npz"
+    extensions = (".npz",)
+
+    def read(self, path):
+        with np.load(path, allow_pickle=False) as npz_data:
+            columns = npz_data["columns"]
+            is_pickled = npz_data["is_pickled"]
+            column_values = {}
+            for i, (column, pickled) in enumerate(zip(columns, is_pickled)):
+                values = npz_data[f"column_{i}"]
+                column_values[str(column)] = pickle.loads(values.tobytes()) \
+                    if pickled else values
+        return pd.DataFrame(column_values, columns=[str(c) for c in columns])
+
+    def write(self, df, path, new_df=None):
+        df = df.reset_index()
+        arrays = {}
+        is_pickled = []
+        for i, column in enumerate(df.columns):
+            if df[column].dtype.kind in "biuf":
+                arrays[f"column_{i}"] = df[column].to_numpy()
+                is_pickled.append(False)
+            else:
+                arrays[f"column_{i}"] = np.frombuffer(
+                    pickle.dumps(df[column].tolist(), protocol=pickle.HIGHEST_PROTOCOL),
+                    dtype=np.uint8)
+                is_pickled.append(True)
+        # A file object is used so that numpy does not append the .npz extension
+        with open(path, "wb") as output_file:
+            np.savez(output_file,
+                     columns=np.array([str(c) for c in df.columns]),
+                     is_pickled=np.array(is_pickled, dtype=bool),
+                     **arrays)
+
+
+#: Mapping from persistence mode names to the :class:`PersistenceBackend` subclasses
+#: that implement them.
+persistence_backends = {
+    backend.name: backend for backend in (
+        CSVPersistenceBackend, JournaledCSVPersistenceBackend,
+        NPZPersistenceBackend, ParquetPersistenceBackend, FeatherPersistenceBackend)}
+
+
 def string_or_float(cell_value):
     """Takes the input value from an |ATable| cell and returns either its
     float value or its string value. In the latter case, one level of
@@ -1821,8 +2469,13 @@ def indices_to_internal_loc(values):
     if isinstance(values, (str, numbers.Number)):
         values = [values]
 
+    # Canonicalization of existing paths is memoized, since the same index values
+    # are converted many times per get_df call. Existence is always checked,
+    # since files may be created or removed at any time.
+    base_dir, working_dir = _get_canonical_base_dir(), os.getcwd()
     values = [
-        get_canonical_path(v) if isinstance(v, str) and os.path.exists(v) else v
+        _get_relative_path(v, base_dir, working_dir)
+        if isinstance(v, str) and os.path.exists(v) else v
         for v in values]
 
     return str(tuple(values))
@@ -1842,17 +2495,28 @@ def unpack_index_value(index):
 
 
 @enb.parallel.parallel()
-def parallel_compute_one_row(atable_instance, filtered_df, index, loc,
-                             column_fun_tuples, overwrite):
-    """Ray wrapper for :meth:`ATable.process_row`
+def parallel_compute_row_batch(shared_table, filtered_df, indices, locs, overwrite):
+    """Parallel wrapper for :meth:`ATable.compute_one_row` that
+    computes a batch of rows.
+
+    :param shared_table: an `enb.parallel.SharedObject` handle to
+      an (atable_instance, column_fun_tuples) tuple.
+    :param filtered_df: |DataFrame| with the existing data for the rows in
+      the batch (if any).
+    :param indices: list of indices of the rows in the batch.
+    :param locs: list of locs of the rows in the batch, in the same order as indices.
+
+    :return: a list with the result of compute_one_row for each row.
     """
     # pylint: disable=too-many-arguments
-    return atable_instance.compute_one_row(
+    atable_instance, column_fun_tuples = shared_table.get()
+    return [atable_instance.compute_one_row(
         filtered_df=filtered_df,
         index=index,
         loc=loc,
         column_fun_tuples=column_fun_tuples,
         overwrite=overwrite)
+        for index, loc in zip(indices, locs)]
 
 
 def column_function(*column_property_list, **kwargs):
@@ -1963,6 +2627,147 @@ def get_class_that_defined_method(meth):
     return getattr(meth, '__objclass__', None)
 
 
+class DatasetIndex:
+    """Index of the files contained in one or more directory trees.
+
+    The list of files and subdirectories of each directory is reused while the
+    directory's modification time does not change, so that only modified subtrees are
+    listed again. Listing is based on os.scandir, so that no additional stat calls are
+    needed for most file systems. If index_path is not None, the index is loaded from
+    and saved to that path, so that it can be reused across executions.
+
+    Hidden (dot-prefixed) files and directories are ignored, consistently with glob.
+    """
+    # Directories modified less than these many seconds before being listed are listed
+    # again the next time, since changes made within the timestamp granularity of some
+    # file systems would otherwise go unnoticed.
+    racy_seconds = 2
+
+    def __init__(self, index_path=None):
+        self.index_path = index_path
+        # Indexed by absolute directory path, values are
+        # (mtime_ns or None, file_names, subdir_names) tuples.
+        self.dir_entries = {}
+        self.modified = False
+        if index_path is not None and os.path.isfile(index_path):
+            try:
+                with open(index_path, "rb") as index_file:
+                    dir_entries = pickle.load(index_file)
+                if isinstance(dir_entries, dict):
+                    self.dir_entries = dir_entries
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError) as ex:
+                enb.logger.debug(f"Cannot load dataset index from {index_path}: {repr(ex)}. "
+                                 f"Creating a new one.")
+
+    def list_dir(self, dir_path):
+        """Get the (non-hidden) file and subdirectory names of a directory,
+        listing it only if it has been modified since it was last listed.
+
+        :param dir_path: absolute path to the directory.
+        :return: a (stat_result, file_names, subdir_names) tuple, where stat_result
+          is the result of os.stat for dir_path.
+        """
+        dir_stat = os.stat(dir_path)
+        try:
+            mtime_ns, file_names, subdir_names = self.dir_entries[dir_path]
+            if mtime_ns == dir_stat.st_mtime_ns:
+                return dir_stat, file_names, subdir_names
+        except KeyError:
+            pass
+
+        file_names = []
+        subdir_names = []
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir():
+                        subdir_names.append(entry.name)
+                    elif entry.is_file():
+                        file_names.append(entry.name)
+                except OSError:
+                    # Broken entries are ignored, as glob and os.path.isfile do
+                    pass
+        file_names = tuple(file_names)
+        subdir_names = tuple(subdir_names)
+        trusted_mtime = time.time_ns() - dir_stat.st_mtime_ns > self.racy_seconds * 1e9
+        self.dir_entries[dir_path] = (dir_stat.st_mtime_ns if trusted_mtime else None,
+                                      file_names, subdir_names)
+        self.modified = True
+        return dir_stat, file_names, subdir_names
+
+    def iter_files(self, base_dir):
+        """Recursively iterate all files contained in base_dir, following symbolic links
+        to directories (but not symbolic link loops).
+
+        :param base_dir: path to the directory to be scanned.
+        :return: an iterator of (dir_path, file_names) tuples, where dir_path is the
+          absolute path of each directory and file_names are the names of the
+          files it contains.
+        """
+        base_dir = os.path.abspath(base_dir)
+        visited_dirs = set()
+        # Each element is a (dir_path, (st_dev, st_ino) of dir_path and its ancestors)
+        pending_dirs = [(base_dir, frozenset())]
+        while pending_dirs:
+            dir_path, ancestor_ids = pending_dirs.pop()
+            try:
+                dir_stat, file_names, subdir_names = self.list_dir(dir_path)
+            except OSError as ex:
+                enb.logger.debug(f"Cannot list {dir_path}: {repr(ex)}. Skipping.")
+                continue
+            visited_dirs.add(dir_path)
+            dir_id = (dir_stat.st_dev, dir_stat.st_ino)
+            if dir_id in ancestor_ids:
+                continue
+            ancestor_ids = ancestor_ids | {dir_id}
+            yield dir_path, file_names
+            pending_dirs.extend((os.path.join(dir_path, name), ancestor_ids)
+                                for name in reversed(subdir_names))
+
+        # Forget directories no longer present in the scanned tree
+        base_prefix = os.path.join(base_dir, "")
+        for dir_path in [d for d in self.dir_entries
+                         if (d == base_dir or d.startswith(base_prefix))
+                            and d not in visited_dirs]:
+            del self.dir_entries[dir_path]
+            self.modified = True
+
+    def save(self):
+        """Save the index to self.index_path, if not None and the index has
+        been modified since it was loaded or last saved.
+        """
+        if self.index_path is None or not self.modified:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as index_file:
+                pickle.dump(self.dir_entries, index_file)
+            os.replace(tmp_path, self.index_path)
+            self.modified = False
+        except OSError as ex:
+            enb.logger.debug(f"Cannot save dataset index to {self.index_path}: {repr(ex)}.")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+_dataset_indices = {}
+
+
+def get_dataset_index():
+    """Get the DatasetIndex instance used by get_all_input_files, which is
+    persistent if options.dataset_index_path is not None.
+    """
+    index_path = options.dataset_index_path
+    try:
+        return _dataset_indices[index_path]
+    except KeyError:
+        _dataset_indices[index_path] = DatasetIndex(index_path=index_path)
+        return _dataset_indices[index_path]
+
+
 def get_all_input_files(ext=None, base_dataset_dir=None):
     """Get a list of all input files (recursively) contained in base_dataset_dir.
 
@@ -1982,12 +2787,28 @@ def get_all_input_files(ext=None, base_dataset_dir=None):
         return [os.path.basename(sys.argv[0])]
 
     # Recursively get all files, filtering only those that match the extension, if provided.
-    sorted_path_list = sorted(
-        (get_canonical_path(p) for p in glob.glob(
-            os.path.join(base_dataset_dir, "**", f"*{ext}" if ext else "*"),
-            recursive=True)
-         if os.path.isfile(p)),
-        key=lambda p: get_canonical_path(p).lower())
+    # Directories that have not been modified since the last call are not listed again,
+    # and canonical paths are obtained once per directory instead of once per file.
+    if ext and glob.has_magic(ext):
+        pattern = f"*{ext}"
+        name_filter = lambda name: fnmatch.fnmatchcase(name, pattern)
+    elif ext:
+        name_filter = lambda name: name.endswith(ext)
+    else:
+        name_filter = None
+    dataset_index = get_dataset_index()
+    canonical_base_dir = _get_canonical_base_dir()
+    path_list = []
+    for dir_path, file_names in dataset_index.iter_files(base_dataset_dir):
+        canonical_dir = os.path.relpath(dir_path, canonical_base_dir)
+        if name_filter is not None:
+            file_names = filter(name_filter, file_names)
+        if canonical_dir == os.curdir:
+            path_list.extend(file_names)
+        else:
+            path_list.extend(os.path.join(canonical_dir, name) for name in file_names)
+    dataset_index.save()
+    sorted_path_list = sorted(path_list, key=str.lower)
 
     # If quick is selected, return at most as many paths as the quick parameter count
     all_input_files = sorted_path_list if not options.quick else sorted_path_list[
@@ -2001,6 +2822,21 @@ def get_canonical_path(file_path):
     :return: the canonical version of a path to be stored in the database, to make sure
       indexing is consistent across code using |ATable| and its subclasses.
     """
+    return _get_relative_path(file_path, _get_canonical_base_dir(), os.getcwd())
+
+
+def _get_canonical_base_dir():
+    """Return the directory relative to which canonical paths are expressed.
+    """
     if enb.parallel_ray.is_remote_node():
-        return os.path.relpath(file_path, enb.parallel_ray.RemoteNode.remote_project_mount_path)
-    return os.path.relpath(file_path, options.project_root)
+        return enb.parallel_ray.RemoteNode.remote_project_mount_path
+    return options.project_root
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def _get_relative_path(file_path, base_dir, working_dir):
+    """Memoized version of os.path.relpath. The working dir is passed only to
+    invalidate cached results for relative paths if it changes.
+    """
+    # pylint: disable=unused-argument
+    return os.path.relpath(file_path, base_dir)
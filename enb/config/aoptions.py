@@ -158,6 +158,40 @@ class ExecutionOptions:
         """
         return int(value)
 
+    @OptionsBase.property(type=int)
+    def row_batch_size(self, value):
+        """Number of table rows computed by each parallel task in ATable's get_df().
+        If None or not positive, it is chosen at the beginning of each chunk
+        based on the number of available CPUs and the computation time of the
+        rows of previous chunks, if any. It is not modified within a chunk.
+        Larger batches reduce the scheduling overhead of tables with fast columns.
+        """
+        if value is None:
+            return value
+        value = int(value)
+        return value if value > 0 else None
+
+    @OptionsBase.property(action="store_true")
+    def group_tasks_by_file(self, value):
+        """If this flag is enabled, all tasks of an Experiment
+        (e.g., all codecs of a CompressionExperiment) for a given input file are computed
+        consecutively by the same parallel task. This way, the file is read
+        while it is still in the OS page cache, and the number of input files being
+        processed at the same time is limited by the number of workers.
+        """
+        return bool(value)
+
+    @OptionsBase.property(action=_singleton_cli.PositiveIntegerAction)
+    def io_buffer_size(self, value):
+        """Maximum number of bytes read at once when files are processed in chunks,
+        e.g., to obtain hash digests and sample statistics of the dataset files.
+        This bounds the memory used for files of any size. It is rounded down to a
+        multiple of 8 bytes.
+        """
+        _singleton_cli.PositiveIntegerAction.assert_valid_value(value)
+        value = int(value)
+        return max(8, value - value % 8)
+
     @OptionsBase.property(action=_singleton_cli.PositiveIntegerAction)
     def repetitions(self, value):
         """Number of repetitions when calculating execution times.
@@ -168,6 +202,40 @@ class ExecutionOptions:
         _singleton_cli.PositiveIntegerAction.assert_valid_value(value)
         return int(value)
 
+    @OptionsBase.property(type=float)
+    def repetition_time_budget(self, value):
+        """If set to a positive number of seconds, execution times are measured
+        adaptively: after the first options.repetitions measurements, the measurement
+        is repeated until this much time has been spent on it (or until
+        options.repetition_target_rse is reached, if set).
+        This allows precise measurements of fast processes
+        without repeating slow ones unnecessarily.
+        """
+        if value is None:
+            return value
+        value = float(value)
+        return value if value > 0 else None
+
+    @OptionsBase.property(type=float)
+    def repetition_target_rse(self, value):
+        """If set to a positive number, execution times are measured adaptively:
+        after the first options.repetitions measurements, the measurement is repeated
+        until the relative standard error of the mean time is not larger than this value
+        (e.g., 0.01 for 1%), or until options.repetition_time_budget is spent, if set.
+        """
+        if value is None:
+            return value
+        value = float(value)
+        return value if value > 0 else None
+
+    @OptionsBase.property(action=_singleton_cli.PositiveIntegerAction)
+    def max_repetitions(self, value):
+        """Maximum number of repetitions when execution times are measured adaptively,
+        i.e., when options.repetition_time_budget or options.repetition_target_rse are set.
+        """
+        _singleton_cli.PositiveIntegerAction.assert_valid_value(value)
+        return int(value)
+
     @OptionsBase.property(action="store_true")
     def report_wall_time(self, value):
         """If this flag is activated, the wall time instead of the CPU time is reported by default by
@@ -175,6 +243,15 @@ class ExecutionOptions:
         """
         return bool(value)
 
+    @OptionsBase.property(action="store_true")
+    def direct_invocation(self, value):
+        """If this flag is activated, tcall.get_status_output_time runs invocations
+        that do not need a shell directly, instead of through a shell with /usr/bin/time.
+        This saves two process creations per invocation, but the memory usage of
+        processes that do not exceed that of the calling process is not reported.
+        """
+        return bool(value)
+
     @OptionsBase.property(action="store_true")
     def force_sanity_checks(self, value):
         """If this flag is used, extra sanity checks are performed by enb during the execution of this script.
@@ -206,6 +283,66 @@ class ExecutionOptions:
         """
         return bool(value)
 
+    @OptionsBase.property(type=float)
+    def persistence_flush_period(self, value):
+        """If set to a positive number of seconds, rows computed by ATable's get_df()
+        are made persistent approximately with this period as they are completed,
+        instead of only when each chunk is completed. This limits the amount of work lost if
+        execution is interrupted. It is most efficient with the 'journal' persistence mode.
+        """
+        if value is None:
+            return value
+        value = float(value)
+        return value if value > 0 else None
+
+    @OptionsBase.property(type=str)
+    def properties_cache_path(self, value):
+        """If not None, path to an SQLite database file used as a cache of the dataset
+        file properties computed by FilePropertiesTable subclasses (e.g., hash digests,
+        sample extrema and entropy). The same path can be used by any number of projects
+        to avoid computing those properties again for the same files.
+        Cached values are reused while files are not modified.
+        """
+        return str(value) if value else None
+
+    @OptionsBase.property(action=_singleton_cli.PositiveIntegerAction)
+    def properties_cache_max_entries(self, value):
+        """Maximum number of (table, file) entries stored in the properties cache
+        (see options.properties_cache_path). The least recently used entries are
+        evicted first.
+        """
+        _singleton_cli.PositiveIntegerAction.assert_valid_value(value)
+        return int(value)
+
+    @OptionsBase.property(type=str)
+    def dataset_index_path(self, value):
+        """If not None, path to a file where the index of dataset files is stored,
+        so that only the dataset directories modified since the last execution are
+        listed again (see enb.atable.get_all_input_files). This can greatly reduce
+        startup times for datasets with many files, e.g., in network file systems.
+        """
+        return str(value) if value else None
+
+    @OptionsBase.property(action="store_true")
+    def persistent_pool(self, value):
+        """If this flag is enabled, the worker processes used for local parallel computation
+        (when ray is not used) are kept alive across get_df() calls instead of being restarted
+        for each call. Updated values of enb.config.options are pushed to the workers
+        at the beginning of each get_df() call (see enb.parallel.push_options).
+        """
+        return bool(value)
+
+    @OptionsBase.property(type=str)
+    def persistence_mode(self, value):
+        """Name of the backend used by default to store ATable persistence data.
+        Use 'csv' to rewrite the full CSV file after each chunk, or 'journal' to
+        append new rows to a journal file that is merged into the CSV file only occasionally.
+        Binary columnar formats are also available ('npz', and 'parquet' and 'feather' if
+        pyarrow is installed), and are selected automatically for persistence paths
+        with those extensions. See enb.atable.persistence_backends for all available modes.
+        """
+        return str(value)
+
 
 @_singleton_cli.property_class(OptionsBase)
 class DirOptions:
@@ -7,9 +7,12 @@ __since__ = "2019/09/19"
 import os
 import collections
 import itertools
+import math
 import inspect
 import time
 import datetime
+import numpy as np
+import pandas as pd
 
 import enb.atable
 import enb.sets
@@ -99,6 +102,8 @@ class Experiment(enb.atable.ATable):
     task_name_column = "task_name"
     task_label_column = "task_label"
     task_apply_time_column = "task_apply_time"
+    # Columns whose sum is used to estimate the computation cost of each row
+    row_cost_columns = [task_apply_time_column]
     default_file_properties_table_class = enb.sets.FilePropertiesTable
     no_family_label = "No family"
 
@@ -250,6 +255,10 @@ class Experiment(enb.atable.ATable):
             else options.chunk_size
         chunk_size = chunk_size if chunk_size is not None \
             else len(target_indices)
+        if options.group_tasks_by_file:
+            # All tasks for each file are kept in the same chunk
+            task_count = len(set(target_task_names))
+            chunk_size = math.ceil(chunk_size / task_count) * task_count
 
         chunks = [target_indices[i:i + chunk_size]
                   for i in range(0, len(target_indices), chunk_size)]
@@ -260,6 +269,7 @@ class Experiment(enb.atable.ATable):
                                                             chunk_size=chunk_size).__enter__()
         else:
             progress_tracker = False
+        self._row_cost_models = {}
         try:
             for chunk_index, chunk in enumerate(chunks):
                 with enb.logger.debug_context(
@@ -290,6 +300,7 @@ class Experiment(enb.atable.ATable):
                 if progress_tracker:
                     progress_tracker.complete_chunk()
         finally:
+            self._row_cost_models = None
             if progress_tracker:
                 progress_tracker.__exit__(None, None, None)
 
@@ -320,6 +331,97 @@ class Experiment(enb.atable.ATable):
 
         return df[(c for c in df.columns if not c.endswith(rsuffix))]
 
+    def get_row_batch_bounds(self, target_indices, batch_size):
+        """If options.group_tasks_by_file is enabled, batches contain all the tasks
+        of one or more input files, so that each file is processed by a single worker
+        while it is in the OS page cache. Batches grow with whole files up to
+        batch_size rows, and contain at least one file.
+        Otherwise, the default batches are used.
+        """
+        if not options.group_tasks_by_file:
+            return super().get_row_batch_bounds(
+                target_indices=target_indices, batch_size=batch_size)
+
+        # Consecutive indices with the same file path are grouped together
+        file_bounds = []
+        for position, index in enumerate(target_indices):
+            if position == 0 or index[0] != target_indices[position - 1][0]:
+                file_bounds.append([position, position + 1])
+            else:
+                file_bounds[-1][1] = position + 1
+
+        batch_bounds = []
+        for start, end in file_bounds:
+            if batch_bounds and end - batch_bounds[-1][0] <= batch_size:
+                batch_bounds[-1] = (batch_bounds[-1][0], end)
+            else:
+                batch_bounds.append((start, end))
+        return batch_bounds
+
+    def get_row_costs(self, loaded_df, target_indices, target_locs):
+        """Estimate the cost of each row based on previously stored results.
+
+        For rows with stored values in all self.row_cost_columns, the sum of those
+        values is used. Otherwise, the cost is estimated as the input file size
+        times the average cost per byte of the row's task in the stored results,
+        or the median of all tasks' averages if that task has no stored results.
+        If no results are stored at all, the input file size is used.
+
+        Within a call to :meth:`get_df`, the average costs per byte are obtained
+        only for the first chunk, and reused for the rest.
+        """
+        cost_columns = [c for c in self.row_cost_columns if c in loaded_df.columns]
+        # Set only while get_df is running
+        cost_models = getattr(self, "_row_cost_models", None)
+        try:
+            cost_model = cost_models[tuple(cost_columns)]
+        except (TypeError, KeyError):
+            cost_model = self.get_row_cost_model(loaded_df=loaded_df, cost_columns=cost_columns)
+            if cost_models is not None:
+                cost_models[tuple(cost_columns)] = cost_model
+        path_to_size, task_to_cost_per_byte, default_cost_per_byte = cost_model
+
+        target_paths = pd.Series([path for path, _ in target_indices], dtype=object)
+        target_tasks = pd.Series([task_name for _, task_name in target_indices], dtype=object)
+        sizes = target_paths.map(path_to_size).fillna(1).to_numpy(dtype=np.float64)
+        sizes[sizes <= 0] = 1
+        estimated_costs = target_tasks.map(task_to_cost_per_byte).fillna(
+            default_cost_per_byte).to_numpy(dtype=np.float64) * sizes
+        if cost_columns:
+            # Only rows with stored values in all cost columns are used
+            stored_costs = loaded_df[cost_columns].reindex(target_locs).astype(float).sum(
+                axis=1, min_count=len(cost_columns)).to_numpy(dtype=np.float64)
+            estimated_costs = np.where(np.isnan(stored_costs), estimated_costs, stored_costs)
+        return estimated_costs.tolist()
+
+    def get_row_cost_model(self, loaded_df, cost_columns):
+        """Get the information used by :meth:`get_row_costs` to estimate the cost
+        of rows without stored results.
+
+        :return: a tuple (path_to_size, task_to_cost_per_byte, default_cost_per_byte),
+          where the first two elements are Series indexed respectively by
+          canonical path and by task name.
+        """
+        file_column = self.dataset_info_table.indices[0]
+        dataset_df = self.get_dataset_df()
+        path_to_size = pd.Series(dataset_df["size_bytes"].values,
+                                 index=dataset_df[file_column].values, dtype=np.float64) \
+            if "size_bytes" in dataset_df.columns else pd.Series([], dtype=np.float64)
+
+        task_to_cost_per_byte = pd.Series([], dtype=np.float64)
+        if cost_columns and len(loaded_df) > 0:
+            history_df = loaded_df.dropna(subset=cost_columns)
+            sizes = history_df[file_column].map(path_to_size)
+            valid = (sizes > 0).to_numpy()
+            totals = pd.DataFrame({
+                "task": history_df[self.task_name_column].to_numpy()[valid],
+                "cost": history_df[cost_columns].astype(float).sum(axis=1).to_numpy()[valid],
+                "size": sizes.to_numpy()[valid]}).groupby("task").sum()
+            task_to_cost_per_byte = totals["cost"] / totals["size"]
+        default_cost_per_byte = float(task_to_cost_per_byte.median()) \
+            if len(task_to_cost_per_byte) > 0 else 1
+        return path_to_size, task_to_cost_per_byte, default_cost_per_byte
+
     def index_to_path_task(self, index):
         """Given an Experiment's row index, return `(path, task)`, where
         `path` is the canonical path of the row's dataset element,
@@ -329,9 +431,22 @@ class Experiment(enb.atable.ATable):
 
     def get_dataset_info_row(self, file_path):
         """Get the dataset info table row for the file path given as argument.
+
+        Rows are directly accessed by position using a mapping from canonical paths,
+        built once for each dataset DataFrame. Paths not in the mapping are
+        looked up by internal loc.
         """
-        return self.get_dataset_df().loc[
-            enb.atable.indices_to_internal_loc(file_path)]
+        dataset_df = self.get_dataset_df()
+        mapped_df, path_to_position = getattr(self, "_dataset_path_to_position", (None, None))
+        if mapped_df is not dataset_df:
+            path_to_position = {
+                path: position for position, path in enumerate(
+                    dataset_df[self.dataset_info_table.indices[0]].values)}
+            self._dataset_path_to_position = (dataset_df, path_to_position)
+        try:
+            return dataset_df.iloc[path_to_position[file_path]]
+        except (KeyError, TypeError):
+            return dataset_df.loc[enb.atable.indices_to_internal_loc(file_path)]
 
     def get_dataset_df(self):
         """Get the DataFrame of the employed dataset.
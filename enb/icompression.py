@@ -10,12 +10,14 @@ import os
 import tempfile
 import time
 import collections
+import contextlib
 import functools
+import itertools
 import shutil
 import math
+import statistics
 import numpy as np
 
-from scipy import signal
 from scipy.ndimage.filters import convolve
 
 import enb
@@ -96,6 +98,121 @@ class DecompressionResults:
         self.maximum_memory_kb = maximum_memory_kb
 
 
+class DistortionMetrics:
+    """Distortion statistics between an original and a reconstructed image,
+    as produced by :func:`get_distortion_metrics`.
+    Global and per-band values are available.
+    """
+
+    def __init__(self, component_count, integer=True):
+        """
+        :param component_count: number of bands (components) in the image
+        :param integer: True if the compared samples are integers, False otherwise
+        """
+        self.integer = integer
+        self.band_sample_counts = np.zeros(component_count, dtype=np.int64)
+        self.band_sse = np.zeros(component_count, dtype=np.float64)
+        self.band_pae = np.zeros(component_count, dtype=np.int64 if integer else np.float64)
+        #: Counter of error values (original minus reconstructed), or None if
+        #: not requested or not available (e.g., for floating point data)
+        self.error_histogram = None
+
+    @property
+    def sample_count(self):
+        """Total number of compared samples.
+        """
+        return int(self.band_sample_counts.sum())
+
+    @property
+    def sse(self):
+        """Sum of squared errors.
+        """
+        return float(self.band_sse.sum())
+
+    @property
+    def mse(self):
+        """Mean squared error.
+        """
+        return self.sse / self.sample_count
+
+    @property
+    def pae(self):
+        """Peak absolute error.
+        """
+        return int(self.band_pae.max()) if self.integer else float(self.band_pae.max())
+
+    @property
+    def band_mse(self):
+        """Array with the mean squared error of each band.
+        """
+        return self.band_sse / self.band_sample_counts
+
+    def psnr(self, max_error):
+        """Return the PSNR in dB for the given maximum error value
+        (e.g., 2**bitdepth - 1), or infinity if the MSE is zero.
+        """
+        mse = self.mse
+        return 20 * math.log10(max_error / math.sqrt(mse)) if mse > 0 else float("inf")
+
+
+def get_distortion_metrics(original_array, reconstructed_array, component_count=1,
+                           block_samples=2 ** 20, error_histogram=False):
+    """Compute the distortion metrics between two images in a single pass,
+    processing blocks of at most block_samples samples so that memory usage is
+    bounded regardless of the image size.
+
+    :param original_array: flat array with the original samples in BSQ order,
+      e.g., a memory-mapped array as given by
+      :attr:`CompressionExperiment.CompressionDecompressionWrapper.original_array`.
+    :param reconstructed_array: flat array with the reconstructed samples,
+      with the same size and order as original_array.
+    :param component_count: number of bands in the image.
+    :param block_samples: maximum number of samples processed at once.
+    :param error_histogram: if True, the histogram of the error values is
+      obtained for integer data (it is not obtained for floating point data).
+      It is disabled by default, since it adds significant cost to each block.
+    :return: a :class:`DistortionMetrics` instance.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    if original_array.size != reconstructed_array.size:
+        raise ValueError(f"Cannot compare arrays of different sizes: "
+                         f"{original_array.size} and {reconstructed_array.size}")
+    if original_array.size % component_count != 0:
+        raise ValueError(f"Array size {original_array.size} is not a multiple "
+                         f"of component_count={component_count}")
+
+    is_integer = original_array.dtype.kind in "iu" and reconstructed_array.dtype.kind in "iu"
+    metrics = DistortionMetrics(component_count=component_count, integer=is_integer)
+    if error_histogram and is_integer:
+        metrics.error_histogram = collections.Counter()
+
+    band_size = original_array.size // component_count
+    for band_index in range(component_count):
+        band_end = (band_index + 1) * band_size
+        for start in range(band_index * band_size, band_end, block_samples):
+            end = min(start + block_samples, band_end)
+            error = np.subtract(original_array[start:end], reconstructed_array[start:end],
+                                dtype=np.float64, casting="unsafe")
+            metrics.band_sample_counts[band_index] += error.size
+            metrics.band_sse[band_index] += np.dot(error, error)
+            metrics.band_pae[band_index] = max(
+                metrics.band_pae[band_index], np.max(np.abs(error)))
+
+            if metrics.error_histogram is not None:
+                # Counting is linear in the block size unless errors span a very large range
+                int_error = error.astype(np.int64)
+                min_error = int(int_error.min())
+                if int(int_error.max()) - min_error < 2 * block_samples:
+                    counts = np.bincount(int_error - min_error)
+                    values = np.flatnonzero(counts)
+                    values, counts = values + min_error, counts[values]
+                else:
+                    values, counts = np.unique(int_error, return_counts=True)
+                metrics.error_histogram.update(dict(zip(values.tolist(), counts.tolist())))
+
+    return metrics
+
+
 class CompressionException(Exception):
     """Base class for exceptions occurred during a compression instance
     """
@@ -155,6 +272,8 @@ class AbstractCodec(enb.experiment.ExperimentTask):
 
     def compress(self, original_path: str, compressed_path: str, original_file_info=None):
         """Compress original_path into compress_path using param_dict as params.
+        By default, the in-memory interface (compress_bytes) is used if available.
+
         :param original_path: path to the original file to be compressed
         :param compressed_path: path to the compressed file to be created
         :param original_file_info: a dict-like object describing
@@ -162,11 +281,18 @@ class AbstractCodec(enb.experiment.ExperimentTask):
         :return: (optional) a CompressionResults instance, or None
           (see compression_results_from_paths)
         """
-        raise NotImplementedError()
+        if not self.in_memory_supported:
+            raise NotImplementedError()
+        with open(original_path, "rb") as original_file:
+            original_data = original_file.read()
+        with open(compressed_path, "wb") as compressed_file:
+            compressed_file.write(self.compress_bytes(
+                original_data=original_data, original_file_info=original_file_info))
 
     def decompress(self, compressed_path, reconstructed_path, original_file_info=None):
         """Decompress compressed_path into reconstructed_path using param_dict
         as params (if needed).
+        By default, the in-memory interface (decompress_bytes) is used if available.
 
         :param compressed_path: path to the input compressed file
         :param reconstructed_path: path to the output reconstructed file
@@ -177,8 +303,45 @@ class AbstractCodec(enb.experiment.ExperimentTask):
         :return: (optional) a DecompressionResults instance, or None (see
         decompression_results_from_paths)
         """
+        if not self.in_memory_supported:
+            raise NotImplementedError()
+        with open(compressed_path, "rb") as compressed_file:
+            compressed_data = compressed_file.read()
+        with open(reconstructed_path, "wb") as reconstructed_file:
+            reconstructed_file.write(self.decompress_bytes(
+                compressed_data=compressed_data, original_file_info=original_file_info))
+
+    def compress_bytes(self, original_data, original_file_info=None):
+        """Optional in-memory compression interface. Codecs that implement both
+        compress_bytes and decompress_bytes are run by |CompressionExperiment|
+        without reading or writing any file during the timed compression
+        and decompression, and need not implement compress and decompress.
+
+        :param original_data: bytes-like object with the contents of the original file
+        :param original_file_info: a dict-like object describing
+          the original file's properties (e.g., geometry), or None.
+        :return: a bytes-like object with the compressed data
+        """
         raise NotImplementedError()
 
+    def decompress_bytes(self, compressed_data, original_file_info=None):
+        """Optional in-memory decompression interface. See compress_bytes.
+
+        :param compressed_data: bytes-like object with the compressed data
+        :param original_file_info: a dict-like object describing
+          the original file's properties (e.g., geometry), or None.
+        :return: a bytes-like object with the reconstructed data
+        """
+        raise NotImplementedError()
+
+    @property
+    def in_memory_supported(self):
+        """True if and only if this codec implements both compress_bytes and
+        decompress_bytes.
+        """
+        return type(self).compress_bytes is not AbstractCodec.compress_bytes \
+            and type(self).decompress_bytes is not AbstractCodec.decompress_bytes
+
     def compression_results_from_paths(self, original_path, compressed_path):
         """Get the default CompressionResults instance corresponding to
         the compression of original_path into compressed_path
@@ -406,10 +569,7 @@ class WrapperCodec(AbstractCodec):
         contents of binary_path. By default, the first 5 digits of the
         sha-256 hexdigest are returned.
         """
-        hasher = hashlib.sha256()
-        with open(binary_path, "rb") as open_file:
-            hasher.update(open_file.read())
-        return hasher.hexdigest()[:5]
+        return enb.sets.get_file_digest(binary_path, algorithm="sha256")[0][:5]
 
     @property
     def name(self):
@@ -646,11 +806,13 @@ class CompressionExperiment(enb.experiment.Experiment):
     and decompression results are valid while the row is being processed, and
     are disposed of afterwards.
     Also, the image_info_row attribute gives access to the image metainformation
-    (e.g., geometry)
+    (e.g., geometry), and the original_array and reconstructed_array
+    attributes of self.codec_results give access to the (cached) image samples.
     """
     dataset_files_extension = "raw"
     default_file_properties_table_class = enb.isets.ImagePropertiesTable
     row_wrapper_column_name = "_codec_wrapper"
+    row_cost_columns = ["compression_time_seconds", "decompression_time_seconds"]
 
     class CompressionDecompressionWrapper:
         """This class is instantiated for each row of the table, and added to a temporary
@@ -658,6 +820,9 @@ class CompressionExperiment(enb.experiment.Experiment):
         and in particular its `compression_results` and `decompression_results` properties,
         which will run compression and decompression at most once. This way, many columns can
         be defined independently without needing to compress and decompress for each one.
+
+        Similarly, the original and reconstructed samples (and their distortion metrics)
+        are loaded at most once per row, and shared by all columns that need them.
         """
 
         def __init__(self, file_path, codec, image_info_row,
@@ -681,6 +846,73 @@ class CompressionExperiment(enb.experiment.Experiment):
             self._decompression_results = None
             self.compressed_copy_dir = compressed_copy_dir
             self.reconstructed_copy_dir = reconstructed_copy_dir
+            self._original_array = None
+            self._reconstructed_array = None
+            self._distortion_metrics = None
+            self._original_data = None
+            self._compressed_data = None
+            self._reconstructed_data = None
+            self._compressed_digest = None
+            self._reconstructed_digest = None
+            self.compression_time_measurements = None
+            self.decompression_time_measurements = None
+
+        @property
+        def original_data(self):
+            """Get the contents of the original file, read at most once. This is
+            used for codecs that support in-memory compression.
+            """
+            if self._original_data is None:
+                with open(self.file_path, "rb") as original_file:
+                    self._original_data = original_file.read()
+            return self._original_data
+
+        def _compress(self, compressed_path):
+            """Compress the original data into compressed_path, using the
+            codec's in-memory interface if available. In that case,
+            compressed_path is only written after the codec returns.
+
+            :return: (codec results, wall time in seconds)
+            """
+            time_before_ns = time.time_ns()
+            if not self.codec.in_memory_supported:
+                results = self.codec.compress(original_path=self.file_path,
+                                              compressed_path=compressed_path,
+                                              original_file_info=self.image_info_row)
+                return results, (time.time_ns() - time_before_ns) / 1e9
+
+            self._compressed_data = self.codec.compress_bytes(
+                original_data=self.original_data, original_file_info=self.image_info_row)
+            wall_time = (time.time_ns() - time_before_ns) / 1e9
+            with open(compressed_path, "wb") as compressed_file:
+                compressed_file.write(self._compressed_data)
+            return None, wall_time
+
+        def _decompress(self, reconstructed_path):
+            """Decompress the compressed data into reconstructed_path, using the
+            codec's in-memory interface if available. In that case,
+            reconstructed_path is only written after the codec returns.
+
+            :return: (codec results, wall time in seconds)
+            """
+            compressed_path = self.compression_results.compressed_path
+            if not self.codec.in_memory_supported:
+                time_before_ns = time.time_ns()
+                results = self.codec.decompress(compressed_path=compressed_path,
+                                                reconstructed_path=reconstructed_path,
+                                                original_file_info=self.image_info_row)
+                return results, (time.time_ns() - time_before_ns) / 1e9
+
+            if self._compressed_data is None:
+                with open(compressed_path, "rb") as compressed_file:
+                    self._compressed_data = compressed_file.read()
+            time_before_ns = time.time_ns()
+            self._reconstructed_data = self.codec.decompress_bytes(
+                compressed_data=self._compressed_data, original_file_info=self.image_info_row)
+            wall_time = (time.time_ns() - time_before_ns) / 1e9
+            with open(reconstructed_path, "wb") as reconstructed_file:
+                reconstructed_file.write(self._reconstructed_data)
+            return None, wall_time
 
         @property
         def compression_results(self):
@@ -699,17 +931,14 @@ class CompressionExperiment(enb.experiment.Experiment):
                     measured_memory = []
 
                     enb.logger.debug(
-                        f"Executing compression {self.codec.name} on {self.file_path} "
-                        f"[{options.repetitions} times]")
-                    for repetition_index in range(options.repetitions):
+                        f"Executing compression {self.codec.name} on {self.file_path}")
+                    time_before = time.time()
+                    for repetition_index in itertools.count():
                         enb.logger.debug(
                             f"Executing compression {self.codec.name} on {self.file_path} "
-                            f"[rep{repetition_index + 1}/{options.repetitions}]")
-                        time_before_ns = time.time_ns()
-                        self._compression_results = self.codec.compress(
-                            original_path=self.file_path,
-                            compressed_path=tmp_compressed_path,
-                            original_file_info=self.image_info_row)
+                            f"[rep{repetition_index + 1}]")
+                        self._compression_results, wall_compression_time = \
+                            self._compress(compressed_path=tmp_compressed_path)
 
                         if not os.path.isfile(tmp_compressed_path) \
                                 or os.path.getsize(tmp_compressed_path) == 0:
@@ -720,8 +949,6 @@ class CompressionExperiment(enb.experiment.Experiment):
                                 output=f"Compression of {self.file_path} "
                                        f"didn't produce a file (or it was empty)")
 
-                        wall_compression_time = \
-                            (time.time_ns() - time_before_ns) / 1e9
                         if self._compression_results is None:
                             enb.logger.debug(
                                 f"[W]arning: codec {self.codec.name} "
@@ -752,11 +979,14 @@ class CompressionExperiment(enb.experiment.Experiment):
                                 f"at {repr(output_path)}")
                             shutil.copyfile(tmp_compressed_path, output_path)
 
-                        if repetition_index < options.repetitions - 1:
-                            os.remove(tmp_compressed_path)
+                        if not enb.tcall.is_repetition_needed(
+                                measured_times, elapsed_seconds=time.time() - time_before):
+                            break
+                        os.remove(tmp_compressed_path)
 
                     # The minimum time is kept, all other values are
                     # considered to have noise added by the OS
+                    self.compression_time_measurements = measured_times
                     self._compression_results.compression_time_seconds = min(
                         measured_times)
                     # The maximum resident memory in kb is kept
@@ -785,24 +1015,19 @@ class CompressionExperiment(enb.experiment.Experiment):
                 try:
                     measured_times = []
                     measured_memory = []
+                    time_before = time.time()
                     with enb.logger.debug_context(
                             f"Executing decompression {self.codec.name} "
-                            f"on {self.file_path} [{options.repetitions} times]"
-                            + ("\n" if options.repetitions > 1 else "")):
-                        for repetition_index in range(options.repetitions):
+                            f"on {self.file_path}\n"):
+                        for repetition_index in itertools.count():
                             enb.logger.debug(
                                 f"Executing decompression {self.codec.name} "
                                 f"on {self.file_path} "
-                                f"[rep{repetition_index + 1}/{options.repetitions}]")
+                                f"[rep{repetition_index + 1}]")
 
-                            time_before = time.time_ns()
-                            self._decompression_results = self.codec.decompress(
-                                compressed_path=self.compression_results.compressed_path,
-                                reconstructed_path=tmp_reconstructed_path,
-                                original_file_info=self.image_info_row)
+                            self._decompression_results, wall_decompression_time = \
+                                self._decompress(reconstructed_path=tmp_reconstructed_path)
 
-                            wall_decompression_time = \
-                                (time.time_ns() - time_before) / 1e9
                             if self._decompression_results is None:
                                 enb.logger.debug(
                                     f"Codec {self.codec.name} did not report "
@@ -845,10 +1070,13 @@ class CompressionExperiment(enb.experiment.Experiment):
                                 shutil.copyfile(tmp_reconstructed_path,
                                                 output_path)
 
-                            if repetition_index < options.repetitions - 1:
-                                os.remove(tmp_reconstructed_path)
+                            if not enb.tcall.is_repetition_needed(
+                                    measured_times, elapsed_seconds=time.time() - time_before):
+                                break
+                            os.remove(tmp_reconstructed_path)
                     # The minimum time is kept, the remaining values are
                     # assumed to contain noised added by the OS
+                    self.decompression_time_measurements = measured_times
                     self._decompression_results.decompression_time_seconds = \
                         min(measured_times)
                     self._decompression_results.maximum_memory_kb \
@@ -869,7 +1097,116 @@ class CompressionExperiment(enb.experiment.Experiment):
             return enb.isets.iproperties_row_to_numpy_dtype(
                 self.image_info_row)
 
+        @property
+        def original_array(self):
+            """Get a flat, read-only, memory-mapped array with the original samples,
+            with the dtype given by `numpy_dtype`. It is loaded at most once, and it
+            shares memory with original_data if that was already read.
+            """
+            if self._original_array is None:
+                self._original_array = np.frombuffer(
+                    self._original_data, dtype=self.numpy_dtype) \
+                    if self._original_data is not None \
+                    else np.memmap(self.file_path, dtype=self.numpy_dtype, mode="r")
+            return self._original_array
+
+        @property
+        def reconstructed_array(self):
+            """Get a flat, read-only, memory-mapped array with the reconstructed samples,
+            with the dtype given by `numpy_dtype`. Decompression is performed if needed,
+            and the array is loaded at most once. For codecs that support in-memory
+            decompression, the array shares memory with the decompressed data.
+            """
+            if self._reconstructed_array is None:
+                reconstructed_path = self.decompression_results.reconstructed_path
+                self._reconstructed_array = np.frombuffer(
+                    self._reconstructed_data, dtype=self.numpy_dtype) \
+                    if self._reconstructed_data is not None \
+                    else np.memmap(reconstructed_path, dtype=self.numpy_dtype, mode="r")
+            return self._reconstructed_array
+
+        @property
+        def distortion_metrics(self):
+            """Get a :class:`DistortionMetrics` instance comparing the original and
+            reconstructed samples, computed at most once in a single, block-wise pass.
+            """
+            if self._distortion_metrics is None:
+                self._distortion_metrics = get_distortion_metrics(
+                    original_array=self.original_array,
+                    reconstructed_array=self.reconstructed_array,
+                    component_count=self.image_info_row["component_count"])
+            return self._distortion_metrics
+
+        @property
+        def compressed_digest(self):
+            """Get a tuple (SHA-256 hexdigest, size in bytes) of the compressed data,
+            obtained at most once with a single read of the compressed file
+            (or none, if the data is already in memory).
+            """
+            if self._compressed_digest is None:
+                self._compressed_digest = self._get_digest(
+                    data=self._compressed_data,
+                    path=self.compression_results.compressed_path,
+                    algorithm="sha256")
+            return self._compressed_digest
+
+        @property
+        def reconstructed_digest(self):
+            """Get a tuple (hexdigest, size in bytes) of the reconstructed data,
+            using the same algorithm as the dataset's file properties table
+            (:data:`enb.sets.HASH_ALGORITHM`).
+            """
+            if self._reconstructed_digest is None:
+                self._reconstructed_digest = self._get_digest(
+                    data=self._reconstructed_data,
+                    path=self.decompression_results.reconstructed_path,
+                    algorithm=enb.sets.HASH_ALGORITHM)
+            return self._reconstructed_digest
+
+        @staticmethod
+        def _get_digest(data, path, algorithm):
+            """Return (hexdigest, size_bytes) of data if not None,
+            or of the contents of path otherwise.
+            """
+            if data is not None:
+                return hashlib.new(algorithm, data).hexdigest(), len(data)
+            return enb.sets.get_file_digest(path, algorithm=algorithm)
+
+        def is_lossless(self):
+            """Return True if and only if the reconstructed data is identical to
+            the original. If available, the original's digest stored in the dataset
+            table is compared to the reconstructed data's digest, so that the
+            original need not be read again. Byte-by-byte comparison is used
+            otherwise, and to confirm mismatches (e.g., if the stored digest
+            is outdated).
+            """
+            try:
+                original_size = self.image_info_row["size_bytes"]
+                original_digest = self.image_info_row[enb.sets.HASH_ALGORITHM]
+                if original_digest and isinstance(original_digest, str) \
+                        and self.reconstructed_digest == (original_digest, original_size):
+                    return True
+            except KeyError:
+                pass
+            if self._original_data is not None and self._reconstructed_data is not None:
+                return self._original_data == self._reconstructed_data
+            return filecmp.cmp(self.file_path,
+                               self.decompression_results.reconstructed_path,
+                               shallow=False)
+
+        def release_arrays(self):
+            """Release the cached sample arrays, file contents and distortion metrics
+            (if any), so that memory and memory-mapped files are freed.
+            """
+            self._original_array = None
+            self._reconstructed_array = None
+            self._distortion_metrics = None
+            self._original_data = None
+            self._compressed_data = None
+            self._reconstructed_data = None
+
         def __del__(self):
+            self.release_arrays()
             if self._compression_results is not None:
                 try:
                     os.remove(self._compression_results.compressed_path)
@@ -1006,8 +1343,7 @@ class CompressionExperiment(enb.experiment.Experiment):
         # results.
         file_path, codec_name = index
         codec = self.codecs_by_name[codec_name]
-        image_info_row = self.dataset_table_df.loc[
-            enb.atable.indices_to_internal_loc(file_path)]
+        image_info_row = self.get_dataset_info_row(file_path)
 
         # A temporary attribute is created with a
         # self.CompressionDecompressionWrapper instance, which allows lazy,
@@ -1034,6 +1370,8 @@ class CompressionExperiment(enb.experiment.Experiment):
                 # Should not do anything beyond here if errors occurred
                 return processed_row
         finally:
+            if getattr(self, "codec_results", None) is not None:
+                self.codec_results.release_arrays()
             del self.codec_results
             self.codec_results = None
 
@@ -1048,8 +1386,7 @@ class CompressionExperiment(enb.experiment.Experiment):
                                 label="Compressed data size (Bytes)",
                                 plot_min=0)
     def set_compressed_data_size(self, index, row):
-        row[_column_name] = os.path.getsize(
-            self.codec_results.compression_results.compressed_path)
+        row[_column_name] = self.codec_results.compressed_digest[1]
 
     @enb.atable.column_function([
         enb.atable.ColumnProperties(name="compression_ratio",
@@ -1064,6 +1401,22 @@ class CompressionExperiment(enb.experiment.Experiment):
                                     label="Number of compression/decompression "
                                           "repetitions",
                                     plot_min=0),
+        enb.atable.ColumnProperties(name="compression_repetitions",
+                                    label="Number of compression repetitions",
+                                    plot_min=0),
+        enb.atable.ColumnProperties(name="decompression_repetitions",
+                                    label="Number of decompression repetitions",
+                                    plot_min=0),
+        enb.atable.ColumnProperties(name="compression_time_median_seconds",
+                                    label="Median compression time (s)", plot_min=0),
+        enb.atable.ColumnProperties(name="compression_time_stddev_seconds",
+                                    label="Compression time standard deviation (s)",
+                                    plot_min=0),
+        enb.atable.ColumnProperties(name="decompression_time_median_seconds",
+                                    label="Median decompression time (s)", plot_min=0),
+        enb.atable.ColumnProperties(name="decompression_time_stddev_seconds",
+                                    label="Decompression time standard deviation (s)",
+                                    plot_min=0),
         enb.atable.ColumnProperties(name="compressed_file_sha256",
                                     label="Compressed file's SHA256"),
         enb.atable.ColumnProperties(name="compression_memory_kb",
@@ -1078,8 +1431,7 @@ class CompressionExperiment(enb.experiment.Experiment):
         results
         """
         file_path, codec_name = self.index_to_path_task(index)
-        row.image_info_row = self.dataset_table_df.loc[
-            enb.atable.indices_to_internal_loc(file_path)]
+        row.image_info_row = self.get_dataset_info_row(file_path)
         assert self.codec_results.compression_results.compressed_path \
                == self.codec_results.decompression_results.compressed_path
         try:
@@ -1089,15 +1441,9 @@ class CompressionExperiment(enb.experiment.Experiment):
                 self.codec_results.compression_results.original_path)
         except (KeyError, AssertionError) as ex:
             enb.logger.debug(f"Could not verify valid size. {repr(ex)}")
-        hasher = hashlib.sha256()
-        with open(self.codec_results.compression_results.compressed_path,
-                  "rb") as compressed_file:
-            hasher.update(compressed_file.read())
-        compressed_file_sha256 = hasher.hexdigest()
-
-        row["lossless_reconstruction"] = filecmp.cmp(
-            self.codec_results.compression_results.original_path,
-            self.codec_results.decompression_results.reconstructed_path)
+        compressed_file_sha256 = self.codec_results.compressed_digest[0]
+
+        row["lossless_reconstruction"] = self.codec_results.is_lossless()
         assert self.codec_results.compression_results.compression_time_seconds \
                is not None
         row["compression_time_seconds"] = \
@@ -1107,6 +1453,15 @@ class CompressionExperiment(enb.experiment.Experiment):
         row["decompression_time_seconds"] = \
             self.codec_results.decompression_results.decompression_time_seconds
         row["repetitions"] = options.repetitions
+        # The compression and decompression times are the minimum of all
+        # measurements. Their median and standard deviation are also stored.
+        for prefix, measured_times in [
+                ("compression", self.codec_results.compression_time_measurements),
+                ("decompression", self.codec_results.decompression_time_measurements)]:
+            row[f"{prefix}_repetitions"] = len(measured_times)
+            row[f"{prefix}_time_median_seconds"] = statistics.median(measured_times)
+            row[f"{prefix}_time_stddev_seconds"] = statistics.stdev(measured_times) \
+                if len(measured_times) > 1 else 0
         row["compression_ratio"] = os.path.getsize(
             self.codec_results.compression_results.original_path) \
                                    / row["compressed_size_bytes"]
@@ -1120,8 +1475,7 @@ class CompressionExperiment(enb.experiment.Experiment):
                                 plot_min=0)
     def set_bpppc(self, index, row):
         file_path, codec_name = self.index_to_path_task(index)
-        row.image_info_row = self.dataset_table_df.loc[
-            enb.atable.indices_to_internal_loc(file_path)]
+        row.image_info_row = self.get_dataset_info_row(file_path)
         try:
             row[_column_name] = 8 * row["compressed_size_bytes"] / \
                                 row.image_info_row["samples"]
@@ -1137,8 +1491,7 @@ class CompressionExperiment(enb.experiment.Experiment):
         the input samples, as opposed to 8*bytes_per_sample.
         """
         file_path, codec_name = self.index_to_path_task(index)
-        row.image_info_row = self.dataset_table_df.loc[
-            enb.atable.indices_to_internal_loc(file_path)]
+        row.image_info_row = self.get_dataset_info_row(file_path)
         row[_column_name] = (row.image_info_row["dynamic_range_bits"] *
                              row.image_info_row["samples"]) \
                             / (8 * row["compressed_size_bytes"])
@@ -1155,8 +1508,7 @@ class CompressionExperiment(enb.experiment.Experiment):
         ])
     def set_efficiency(self, index, row):
         file_path, codec_name = self.index_to_path_task(index)
-        row.image_info_row = self.dataset_table_df.loc[
-            enb.atable.indices_to_internal_loc(file_path)]
+        row.image_info_row = self.get_dataset_info_row(file_path)
         for bytes in (1, 2):
             column_name = f"compression_efficiency_{bytes}byte_entropy"
             try:
@@ -1200,29 +1552,14 @@ class LossyCompressionExperiment(CompressionExperiment):
     def set_MSE(self, index, row):
         """Set the mean squared error of the reconstructed image.
         """
-        original_array = np.fromfile(
-            self.codec_results.compression_results.original_path,
-            dtype=self.codec_results.numpy_dtype).astype(np.int64)
-
-        reconstructed_array = np.fromfile(
-            self.codec_results.decompression_results.reconstructed_path,
-            dtype=self.codec_results.numpy_dtype).astype(np.int64)
-        row[_column_name] = np.average(
-            ((original_array - reconstructed_array) ** 2))
+        row[_column_name] = self.codec_results.distortion_metrics.mse
 
     @enb.atable.column_function("pae", label="PAE", plot_min=0)
     def set_PAE(self, index, row):
         """Set the peak absolute error (maximum absolute pixelwise
         difference) of the reconstructed image.
         """
-        original_array = np.fromfile(
-            self.codec_results.compression_results.original_path,
-            dtype=self.codec_results.numpy_dtype).astype(np.int64)
-
-        reconstructed_array = np.fromfile(
-            self.codec_results.decompression_results.reconstructed_path,
-            dtype=self.codec_results.numpy_dtype).astype(np.int64)
-        row[_column_name] = np.max(np.abs(original_array - reconstructed_array))
+        row[_column_name] = self.codec_results.distortion_metrics.pae
 
     @enb.atable.column_function("psnr_bps", label="PSNR (dB)", plot_min=0)
     def set_PSNR_nominal(self, index, row):
@@ -1230,8 +1567,7 @@ class LossyCompressionExperiment(CompressionExperiment):
         bytes_per_sample.
         """
         file_path, codec_name = self.index_to_path_task(index)
-        row.image_info_row = self.dataset_table_df.loc[
-            enb.atable.indices_to_internal_loc(file_path)]
+        row.image_info_row = self.get_dataset_info_row(file_path)
         if row.image_info_row["float"]:
             row[_column_name] = float("inf")
         else:
@@ -1245,8 +1581,7 @@ class LossyCompressionExperiment(CompressionExperiment):
         """Set the PSNR assuming dynamic range given by dynamic_range_bits.
         """
         file_path, codec_name = self.index_to_path_task(index)
-        row.image_info_row = self.dataset_table_df.loc[
-            enb.atable.indices_to_internal_loc(file_path)]
+        row.image_info_row = self.get_dataset_info_row(file_path)
         max_error = (2 ** row.image_info_row["dynamic_range_bits"]) - 1
         row[_column_name] = 20 * math.log10(max_error / math.sqrt(row["mse"])) \
             if row["mse"] > 0 else float("inf")
@@ -1268,12 +1603,11 @@ class GeneralLosslessExperiment(LosslessCompressionExperiment):
             enb.atable.ColumnProperties(name="sample_max",
                                         label="Max sample value (byte samples)")])
         def set_sample_extrema(self, file_path, row):
-            """Set the minimum and maximum byte value extrema.
+            """Set the minimum and maximum byte value extrema,
+            obtained from the file's byte histogram.
             """
-            with open(file_path, "rb") as input_file:
-                contents = input_file.read()
-                row["sample_min"] = min(contents)
-                row["sample_max"] = max(contents)
+            row["sample_min"], row["sample_max"] = \
+                (int(v) for v in self.get_file_statistics(file_path).get_extrema("u1"))
 
         @enb.atable.column_function("bytes_per_sample",
                                     label="Bytes per sample",
@@ -1315,30 +1649,25 @@ class StructuralSimilarity(CompressionExperiment):
         - https://github.com/dashayushman/TAC-GAN/blob/master/msssim.py
     """
 
+    #: Data type used for SSIM and MS-SSIM computation. Using np.float32
+    #: is faster and halves the memory usage, at the cost of some precision.
+    ssim_dtype = np.float64
+
     @enb.atable.column_function([
         enb.atable.ColumnProperties(name="ssim", label="SSIM", plot_max=1),
         enb.atable.ColumnProperties(name="ms_ssim", label="MS-SSIM",
                                     plot_max=1)])
     def set_StructuralSimilarity(self, index, row):
         file_path, codec_name = self.index_to_path_task(index)
-        row.image_info_row = self.dataset_table_df.loc[
-            enb.atable.indices_to_internal_loc(file_path)]
-        original_array = np.fromfile(
-            self.codec_results.compression_results.original_path,
-            dtype=self.codec_results.numpy_dtype)
-        original_array = np.reshape(original_array,
-                                    (row.image_info_row["width"],
-                                     row.image_info_row["height"],
-                                     row.image_info_row["component_count"]))
-
-        reconstructed_array = np.fromfile(
-            self.codec_results.decompression_results.reconstructed_path,
-            dtype=self.codec_results.numpy_dtype)
-        reconstructed_array = np.reshape(reconstructed_array,
-                                         (row.image_info_row["width"],
-                                          row.image_info_row["height"],
-                                          row.image_info_row[
-                                              "component_count"]))
+        row.image_info_row = self.get_dataset_info_row(file_path)
+        # Arrays are indexed by [x,y,z]
+        geometry = (row.image_info_row["component_count"],
+                    row.image_info_row["height"],
+                    row.image_info_row["width"])
+        original_array = self.codec_results.original_array.reshape(
+            geometry).swapaxes(0, 2)
+        reconstructed_array = self.codec_results.reconstructed_array.reshape(
+            geometry).swapaxes(0, 2)
 
         row["ssim"] = self.compute_SSIM(original_array, reconstructed_array)
         row["ms_ssim"] = self.cumpute_MSSIM(original_array, reconstructed_array)
@@ -1346,148 +1675,181 @@ class StructuralSimilarity(CompressionExperiment):
     def cumpute_MSSIM(self, img1, img2, max_val=255, filter_size=11,
                       filter_sigma=1.5, k1=0.01, k2=0.03, weights=None):
         """Return the MS-SSIM score between `img1` and `img2`.
-
-        This function implements Multi-Scale Structural Similarity (MS-SSIM) Image
-        Quality Assessment according to Zhou Wang's paper, "Multi-scale structural
-        similarity for image quality assessment" (2003).
-        Link: https://ece.uwaterloo.ca/~z70wang/publications/msssim.pdf
-
-        Author's MATLAB implementation:
-        http://www.cns.nyu.edu/~lcv/ssim/msssim.zip
-
-        Author's Python implementation:
-        https://github.com/dashayushman/TAC-GAN/blob/master/msssim.py
-
-        Authors documentation:
-
-        :param img1: Numpy array holding the first RGB image batch.
-        :param img2: Numpy array holding the second RGB image batch.
-        :param max_val: the dynamic range of the images (i.e., the difference
-          between the maximum the and minimum allowed values).
-        :param filter_size: Size of blur kernel to use (will be reduced for
-          small images).
-        :param filter_sigma: Standard deviation for Gaussian blur kernel (
-          will be reduced for small images).
-        :param k1: Constant used to maintain stability in the SSIM
-          calculation (0.01 in the original paper).
-        :param k2: Constant used to maintain stability in the SSIM
-          calculation (0.03 in the original paper).
+        See :func:`compute_ms_ssim` for details on the parameters.
+        The data type used for computation is given by the ssim_dtype attribute.
         """
         # pylint: disable=too-many-arguments
-        if img1.shape != img2.shape:
-            raise RuntimeError(
-                'Input images must have the same shape (%s vs. %s).',
-                img1.shape, img2.shape)
-        if img1.ndim != 3:
-            raise RuntimeError("Input images must have four dimensions, "
-                               f"not {img1.ndim}")
-
-        weights = np.array(weights if weights else
-                           [0.0448, 0.2856, 0.3001, 0.2363, 0.1333])
-        levels = weights.size
-        downsample_filter = np.ones((2, 2, 1)) / 4.0
-        im1, im2 = [x.astype(np.float64) for x in [img1, img2]]
-        mssim = np.array([])
-        mcs = np.array([])
-        for _ in range(levels):
-            ssim, cs = self.compute_SSIM(
-                im1, im2, max_val=max_val, filter_size=filter_size,
-                filter_sigma=filter_sigma, k1=k1, k2=k2, full=True)
-            mssim = np.append(mssim, ssim)
-            mcs = np.append(mcs, cs)
-            filtered = [convolve(im, downsample_filter, mode='reflect')
-                        for im in [im1, im2]]
-            im1, im2 = [x[::2, ::2, :] for x in filtered]
-
-        return np.prod(mcs[0:levels - 1] ** weights[0:levels - 1]) * (
-                mssim[levels - 1] ** weights[levels - 1])
+        return compute_ms_ssim(img1, img2, max_val=max_val, filter_size=filter_size,
+                               filter_sigma=filter_sigma, k1=k1, k2=k2, weights=weights,
+                               dtype=self.ssim_dtype)
 
     def compute_SSIM(self, img1, img2, max_val=255, filter_size=11,
                      filter_sigma=1.5, k1=0.01, k2=0.03, full=False):
         """Return the Structural Similarity Map between `img1` and `img2`.
-
-        This function attempts to match the functionality of ssim_index_new.m
-        by Zhou Wang: http://www.cns.nyu.edu/~lcv/ssim/msssim.zip
-
-        Author's Python implementation:
-        https://github.com/dashayushman/TAC-GAN/blob/master/msssim.py
-
-        :param img1: Numpy array holding the first RGB image batch.
-        :param img2: Numpy array holding the second RGB image batch.
-
-        :param max_val: the dynamic range of the images (i.e., the difference
-          between the maximum the and minimum allowed values).
-
-        :param filter_size: Size of blur kernel to use (will be reduced for
-          small images). :param filter_sigma: Standard deviation for Gaussian
-          blur kernel (will be reduced for small images). :param k1: Constant
-          used to maintain stability in the SSIM calculation (0.01 in the
-          original paper). :param k2: Constant used to maintain stability in
-          the SSIM calculation (0.03 in the original paper).
+        See :func:`compute_ssim` for details on the parameters.
+        The data type used for computation is given by the ssim_dtype attribute.
         """
         # pylint: disable=too-many-arguments
-        if img1.shape != img2.shape:
-            raise RuntimeError(
-                'Input images must have the same shape (%s vs. %s).',
-                img1.shape, img2.shape)
-        if img1.ndim != 3:
-            raise RuntimeError(
-                f"Input images must have four dimensions, not {img1.ndim}")
-        img1 = img1.astype(np.float64)
-        img2 = img2.astype(np.float64)
-        height, width, bytes = img1.shape
-
-        # Filter size can't be larger than height or width of images.
-        size = min(filter_size, height, width)
-
-        # Scale down sigma if a smaller filter size is used.
-        sigma = size * filter_sigma / filter_size if filter_size else 0
-
-        if filter_size:
-            window = np.reshape(self._FSpecialGauss(size, sigma),
-                                (size, size, 1))
-            mu1 = signal.fftconvolve(img1, window, mode='valid')
-            mu2 = signal.fftconvolve(img2, window, mode='valid')
-            sigma11 = signal.fftconvolve(img1 * img1, window, mode='valid')
-            sigma22 = signal.fftconvolve(img2 * img2, window, mode='valid')
-            sigma12 = signal.fftconvolve(img1 * img2, window, mode='valid')
-        else:
-            # Empty blur kernel so no need to convolve.
-            mu1, mu2 = img1, img2
-            sigma11 = img1 * img1
-            sigma22 = img2 * img2
-            sigma12 = img1 * img2
-
-        mu11 = mu1 * mu1
-        mu22 = mu2 * mu2
-        mu12 = mu1 * mu2
-        sigma11 -= mu11
-        sigma22 -= mu22
-        sigma12 -= mu12
-
-        # Calculate intermediate values used by both ssim and cs_map.
-        c1 = (k1 * max_val) ** 2
-        c2 = (k2 * max_val) ** 2
-        v1 = 2.0 * sigma12 + c2
-        v2 = sigma11 + sigma22 + c2
-        ssim = np.mean((((2.0 * mu12 + c1) * v1) / ((mu11 + mu22 + c1) * v2)))
-        cs = np.mean(v1 / v2)
-        if full:
-            return ssim, cs
-        return ssim
-
-    def _FSpecialGauss(self, size, sigma):
-
-        radius = size // 2
-        offset = 0.0
-        start, stop = -radius, radius + 1
-        if size % 2 == 0:
-            offset = 0.5
-            stop -= 1
-        x, y = np.mgrid[offset + start:stop, offset + start:stop]
-        assert len(x) == size
-        g = np.exp(-((x ** 2 + y ** 2) / (2.0 * sigma ** 2)))
-        return g / g.sum()
+        return compute_ssim(img1, img2, max_val=max_val, filter_size=filter_size,
+                            filter_sigma=filter_sigma, k1=k1, k2=k2, full=full,
+                            dtype=self.ssim_dtype)
+
+
+def compute_ssim(img1, img2, max_val=255, filter_size=11, filter_sigma=1.5,
+                 k1=0.01, k2=0.03, full=False, dtype=np.float64, tile_samples=2 ** 20):
+    """Return the Structural Similarity (SSIM) between `img1` and `img2`.
+
+    This function attempts to match the functionality of ssim_index_new.m
+    by Zhou Wang: http://www.cns.nyu.edu/~lcv/ssim/msssim.zip
+    (see also https://github.com/dashayushman/TAC-GAN/blob/master/msssim.py).
+    Each band is processed independently, with a separable Gaussian filter
+    applied to tiles of rows, so that memory usage is bounded by the tile size.
+
+    :param img1: 3D numpy array indexed by [x,y,z].
+    :param img2: 3D numpy array indexed by [x,y,z], with the same shape as img1.
+    :param max_val: the dynamic range of the images (i.e., the difference
+      between the maximum the and minimum allowed values).
+    :param filter_size: Size of blur kernel to use (will be reduced for
+      small images).
+    :param filter_sigma: Standard deviation for Gaussian blur kernel (will be
+      reduced for small images).
+    :param k1: Constant used to maintain stability in the SSIM calculation
+      (0.01 in the original paper).
+    :param k2: Constant used to maintain stability in the SSIM calculation
+      (0.03 in the original paper).
+    :param full: if True, a tuple (ssim, cs) is returned, where cs is the
+      mean contrast-structure value.
+    :param dtype: floating point type used for computation (e.g., np.float32
+      or np.float64).
+    :param tile_samples: approximate maximum number of samples of each tile.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    if img1.shape != img2.shape:
+        raise RuntimeError(
+            f"Input images must have the same shape ({img1.shape} vs. {img2.shape}).")
+    if img1.ndim != 3:
+        raise RuntimeError(
+            f"Input images must have three dimensions, not {img1.ndim}")
+    width, height, _ = img1.shape
+
+    # Filter size can't be larger than height or width of images.
+    size = min(filter_size, height, width)
+    # Scale down sigma if a smaller filter size is used.
+    sigma = size * filter_sigma / filter_size if filter_size else 0
+    kernel = _get_gaussian_kernel(size, sigma).astype(dtype) if filter_size else None
+    margin = size - 1 if filter_size else 0
+    tile_rows = max(1, tile_samples // height)
+
+    c1 = (k1 * max_val) ** 2
+    c2 = (k2 * max_val) ** 2
+    ssim_sum, cs_sum, count = 0.0, 0.0, 0
+    for z in range(img1.shape[2]):
+        # Samples are centered to preserve precision when computing variances
+        band1, band2 = img1[:, :, z], img2[:, :, z]
+        mean1, mean2 = np.mean(band1, dtype=np.float64), np.mean(band2, dtype=np.float64)
+        for start in range(0, width - margin, tile_rows):
+            tile1 = (band1[start:start + tile_rows + margin] - mean1).astype(dtype)
+            tile2 = (band2[start:start + tile_rows + margin] - mean2).astype(dtype)
+            mu1 = _gaussian_filter_valid(tile1, kernel)
+            mu2 = _gaussian_filter_valid(tile2, kernel)
+            sigma11 = _gaussian_filter_valid(tile1 * tile1, kernel) - mu1 * mu1
+            sigma22 = _gaussian_filter_valid(tile2 * tile2, kernel) - mu2 * mu2
+            sigma12 = _gaussian_filter_valid(tile1 * tile2, kernel) - mu1 * mu2
+            mu1 += mean1
+            mu2 += mean2
+
+            v1 = 2.0 * sigma12 + c2
+            v2 = sigma11 + sigma22 + c2
+            ssim_sum += float(np.sum(((2.0 * mu1 * mu2 + c1) * v1)
+                                     / ((mu1 * mu1 + mu2 * mu2 + c1) * v2), dtype=np.float64))
+            cs_sum += float(np.sum(v1 / v2, dtype=np.float64))
+            count += v1.size
+
+    ssim, cs = ssim_sum / count, cs_sum / count
+    if full:
+        return ssim, cs
+    return ssim
+
+
+def compute_ms_ssim(img1, img2, max_val=255, filter_size=11, filter_sigma=1.5,
+                    k1=0.01, k2=0.03, weights=None, dtype=np.float64):
+    """Return the MS-SSIM score between `img1` and `img2`.
+
+    This function implements Multi-Scale Structural Similarity (MS-SSIM) Image
+    Quality Assessment according to Zhou Wang's paper, "Multi-scale structural
+    similarity for image quality assessment" (2003).
+    Link: https://ece.uwaterloo.ca/~z70wang/publications/msssim.pdf
+
+    Author's MATLAB implementation: http://www.cns.nyu.edu/~lcv/ssim/msssim.zip
+
+    :param weights: if not None, the list of weights of each scale. Otherwise,
+      the weights in the original paper are used.
+
+    See :func:`compute_ssim` for the remaining parameters.
+    """
+    # pylint: disable=too-many-arguments
+    if img1.shape != img2.shape:
+        raise RuntimeError(
+            f"Input images must have the same shape ({img1.shape} vs. {img2.shape}).")
+    if img1.ndim != 3:
+        raise RuntimeError(
+            f"Input images must have three dimensions, not {img1.ndim}")
+
+    weights = np.array(weights if weights else
+                       [0.0448, 0.2856, 0.3001, 0.2363, 0.1333])
+    levels = weights.size
+    downsample_filter = np.ones((2, 2, 1), dtype=dtype) / 4.0
+    im1, im2 = img1.astype(dtype), img2.astype(dtype)
+    mssim = np.zeros(levels)
+    mcs = np.zeros(levels)
+    for level in range(levels):
+        mssim[level], mcs[level] = compute_ssim(
+            im1, im2, max_val=max_val, filter_size=filter_size,
+            filter_sigma=filter_sigma, k1=k1, k2=k2, full=True, dtype=dtype)
+        if level < levels - 1:
+            im1, im2 = [convolve(im, downsample_filter, mode='reflect')[::2, ::2, :]
+                        for im in (im1, im2)]
+
+    return np.prod(mcs[0:levels - 1] ** weights[0:levels - 1]) * (
+            mssim[levels - 1] ** weights[levels - 1])
+
+
+def _get_gaussian_kernel(size, sigma):
+    """Return a normalized 1D Gaussian kernel. Its outer product with itself is
+    the normalized 2D Gaussian window used for SSIM.
+    """
+    radius = size // 2
+    offset = 0.0
+    start, stop = -radius, radius + 1
+    if size % 2 == 0:
+        offset = 0.5
+        stop -= 1
+    x = np.arange(offset + start, stop)
+    assert len(x) == size
+    g = np.exp(-(x ** 2) / (2.0 * sigma ** 2))
+    return g / g.sum()
+
+
+def _gaussian_filter_valid(image, kernel):
+    """Filter a 2D image with the separable window given by the outer product
+    of kernel with itself, returning only the fully overlapped ('valid') samples.
+    If kernel is None, the image is returned unmodified.
+    """
+    if kernel is None:
+        return image
+    for axis in (0, 1):
+        output_length = image.shape[axis] - len(kernel) + 1
+        output = None
+        for i, weight in enumerate(kernel):
+            taps = image[i:i + output_length] if axis == 0 else image[:, i:i + output_length]
+            if output is None:
+                output = taps * weight
+                weighted_taps = np.empty_like(output)
+            else:
+                np.multiply(taps, weight, out=weighted_taps)
+                output += weighted_taps
+        image = output
+    return image
 
 
 class SpectralAngleTable(LossyCompressionExperiment):
@@ -1498,50 +1860,45 @@ class SpectralAngleTable(LossyCompressionExperiment):
     automatically add the data columns defined here
     """
 
-    def get_spectral_angles_deg(self, index, row):
-        """Return a sequence of spectral angles (in degrees),
-        one per (x,y) position in the image, flattened in raster order.
+    #: If not None, the per-pixel spectral angles of each row are stored in this dir,
+    #: as raw little-endian float64 files in raster order
+    spectral_angle_dump_dir = None
+
+    def get_spectral_angle_dump_path(self, index):
+        """Get the path where the per-pixel spectral angles of a row are stored,
+        or None if self.spectral_angle_dump_dir is None. Dataset files are identified
+        by their path relative to the dataset dir, so that files with the same name
+        in different dirs are stored separately.
         """
-        # Read original and reconstructed images
+        if self.spectral_angle_dump_dir is None:
+            return None
         original_file_path, task_name = index
+        original_file_path = os.path.join(options.project_root, original_file_path)
+        base_dir = self.dataset_info_table.base_dir
+        relative_path = os.path.relpath(original_file_path, base_dir) \
+            if base_dir is not None else os.pardir
+        if relative_path.split(os.sep)[0] == os.pardir:
+            # Files outside the dataset dir are identified by their absolute path
+            relative_path = os.path.abspath(original_file_path).lstrip(os.sep)
+        return os.path.join(self.spectral_angle_dump_dir, task_name,
+                            f"{relative_path}.spectral_angles_f64le")
+
+    def get_spectral_angles_deg(self, index, row):
+        """Return a list of spectral angles (in degrees), one per (x,y) position
+        in the image, with the x-major order (i.e., position x*height + y)
+        of previous versions.
+
+        Use :func:`compute_spectral_angles_deg` to obtain an array in raster order,
+        or :func:`compute_spectral_angle_stats` if only statistics are needed.
+        """
+        original_file_path, _ = index
         image_properties_row = self.get_dataset_info_row(original_file_path)
-        decompression_results = self.codec_results.decompression_results
-        original_array = enb.isets.load_array_bsq(
-            file_or_path=original_file_path,
-            image_properties_row=image_properties_row)
-        reconstructed_array = enb.isets.load_array_bsq(
-            file_or_path=decompression_results.reconstructed_path,
-            image_properties_row=image_properties_row)
-
-        # Reshape flattening the x,y axes, and maintaining the z axis for
-        # each (x,y) position
-        original_array = np.reshape(
-            original_array.swapaxes(0, 1),
-            (image_properties_row["width"] * image_properties_row["height"],
-             image_properties_row["component_count"]),
-            "F").astype("i8")
-        reconstructed_array = np.reshape(
-            reconstructed_array.swapaxes(0, 1),
-            (image_properties_row["width"] * image_properties_row["height"],
-             image_properties_row["component_count"]),
-            "F").astype("i8")
-
-        dots = np.einsum("ij,ij->i", original_array, reconstructed_array)
-        magnitude_a = np.linalg.norm(original_array, axis=1)
-        magnitude_b = np.linalg.norm(reconstructed_array, axis=1)
-
-        for i in range(magnitude_a.shape[0]):
-            # Avoid division by zero
-            magnitude_a[i] = max(1e-4, magnitude_a[i])
-            magnitude_b[i] = max(1e-4, magnitude_b[i])
-
-        # Clip, because the dot product can slip past 1 or -1 due to rounding
-        cosines = np.clip(dots / (magnitude_a * magnitude_b), -1, 1)
-        angles = np.degrees(np.arccos(cosines))
-        # Round because two identical images should return an angle of exactly 0
-        angles = np.round(angles, 5)
-
-        return angles.tolist()
+        angles = compute_spectral_angles_deg(
+            original_array=self.codec_results.original_array,
+            reconstructed_array=self.codec_results.reconstructed_array,
+            component_count=image_properties_row["component_count"])
+        return angles.reshape((image_properties_row["height"],
+                               image_properties_row["width"])).T.flatten().tolist()
 
     @enb.atable.column_function([
         enb.atable.ColumnProperties("mean_spectral_angle_deg",
@@ -1549,14 +1906,183 @@ class SpectralAngleTable(LossyCompressionExperiment):
                                     plot_min=0, plot_max=None),
         enb.atable.ColumnProperties("max_spectral_angle_deg",
                                     label="Max spectral angle (deg)",
+                                    plot_min=0, plot_max=None),
+        enb.atable.ColumnProperties("p50_spectral_angle_deg",
+                                    label="Median spectral angle (deg)",
+                                    plot_min=0, plot_max=None),
+        enb.atable.ColumnProperties("p90_spectral_angle_deg",
+                                    label="90th percentile spectral angle (deg)",
+                                    plot_min=0, plot_max=None),
+        enb.atable.ColumnProperties("p99_spectral_angle_deg",
+                                    label="99th percentile spectral angle (deg)",
                                     plot_min=0, plot_max=None)])
     def set_spectral_distances(self, index, row):
-        spectral_angles = self.get_spectral_angles_deg(index=index, row=row)
-
-        for angle in spectral_angles:
-            assert not np.isnan(
-                angle), f"Error calculating an angle for {index}: {angle}"
-
-        row["mean_spectral_angle_deg"] = sum(spectral_angles) / len(
-            spectral_angles)
-        row["max_spectral_angle_deg"] = max(spectral_angles)
+        """Set the spectral angle statistics of a row without keeping the
+        per-pixel angles in memory. Percentiles are estimated as described
+        in :func:`compute_spectral_angle_stats`.
+        """
+        original_file_path, _ = index
+        image_properties_row = self.get_dataset_info_row(original_file_path)
+        stats = compute_spectral_angle_stats(
+            original_array=self.codec_results.original_array,
+            reconstructed_array=self.codec_results.reconstructed_array,
+            component_count=image_properties_row["component_count"],
+            percentiles=(50, 90, 99),
+            output_path=self.get_spectral_angle_dump_path(index))
+        assert not np.isnan(stats["mean"]), \
+            f"Error calculating the spectral angles for {index}"
+        row["mean_spectral_angle_deg"] = stats["mean"]
+        row["max_spectral_angle_deg"] = stats["max"]
+        for percentile in (50, 90, 99):
+            row[f"p{percentile}_spectral_angle_deg"] = stats[f"p{percentile}"]
+
+
+def iter_spectral_angle_blocks(original_array, reconstructed_array, component_count,
+                               block_pixels=2 ** 16):
+    """Iterate the spectral angles (in degrees) between the original and the
+    reconstructed spectra of each pixel, in blocks of at most block_pixels
+    in raster order, so that temporary arrays are bounded in size.
+
+    :param original_array: flat array with the original samples in BSQ order,
+      e.g., a memory-mapped array as given by
+      :attr:`CompressionExperiment.CompressionDecompressionWrapper.original_array`.
+    :param reconstructed_array: flat array with the reconstructed samples,
+      with the same size and order as original_array.
+    :param component_count: number of bands in the image.
+    :param block_pixels: maximum number of pixels processed at once.
+    :return: an iterator of float64 arrays with the angles of each block of pixels.
+    """
+    if original_array.size != reconstructed_array.size:
+        raise ValueError(f"Cannot compare arrays of different sizes: "
+                         f"{original_array.size} and {reconstructed_array.size}")
+    pixel_count = original_array.size // component_count
+    original_bands = original_array.reshape((component_count, pixel_count))
+    reconstructed_bands = reconstructed_array.reshape((component_count, pixel_count))
+    for start in range(0, pixel_count, block_pixels):
+        end = min(start + block_pixels, pixel_count)
+        original_block = original_bands[:, start:end].astype(np.float64)
+        reconstructed_block = reconstructed_bands[:, start:end].astype(np.float64)
+        dots = np.einsum("ij,ij->j", original_block, reconstructed_block)
+        # Magnitudes are clamped to avoid division by zero
+        magnitudes = np.maximum(np.linalg.norm(original_block, axis=0), 1e-4) \
+                     * np.maximum(np.linalg.norm(reconstructed_block, axis=0), 1e-4)
+        # Clip, because the dot product can slip past 1 or -1 due to rounding,
+        # and round because two identical images should return an angle of exactly 0
+        yield np.round(np.degrees(np.arccos(np.clip(dots / magnitudes, -1, 1))), 5)
+
+
+def compute_spectral_angles_deg(original_array, reconstructed_array, component_count,
+                                block_pixels=2 ** 16, output_path=None):
+    """Compute the spectral angle (in degrees) between the original and the
+    reconstructed spectra of each pixel. See :func:`iter_spectral_angle_blocks`
+    for the meaning of the parameters.
+
+    Use :func:`compute_spectral_angle_stats` instead if only summary statistics
+    are needed, so that the per-pixel angles are not kept in memory.
+
+    :param output_path: if not None, the angles are also streamed to
+      this path as raw little-endian float64 values.
+    :return: a float64 array with one angle per pixel, in raster order.
+    """
+    # pylint: disable=too-many-arguments
+    angles = np.empty(original_array.size // component_count, dtype=np.float64)
+    if output_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "wb") if output_path is not None \
+            else contextlib.nullcontext() as output_file:
+        start = 0
+        for block_angles in iter_spectral_angle_blocks(
+                original_array=original_array, reconstructed_array=reconstructed_array,
+                component_count=component_count, block_pixels=block_pixels):
+            angles[start:start + len(block_angles)] = block_angles
+            start += len(block_angles)
+            if output_file is not None:
+                block_angles.astype("<f8").tofile(output_file)
+    return angles
+
+
+#: Edges of the histogram bins used to estimate spectral angle percentiles in
+#: :func:`compute_spectral_angle_stats`. The first bin contains the zero angles
+#: (angles are rounded to 1e-5 degrees), and the rest are logarithmically spaced
+#: up to 180 degrees, each one 0.23% wider than the previous one.
+_spectral_angle_bin_edges = np.concatenate(([0], np.geomspace(
+    1e-5, 180, int(np.ceil(1000 * np.log10(180 / 1e-5))) + 1)))
+
+
+def compute_spectral_angle_stats(original_array, reconstructed_array, component_count,
+                                 percentiles=(50, 90, 99), block_pixels=2 ** 16,
+                                 output_path=None):
+    """Compute summary statistics of the spectral angles (in degrees) between the
+    original and the reconstructed spectra of each pixel, processing one block of
+    pixels at a time (see :func:`iter_spectral_angle_blocks`) so that the
+    per-pixel angles are not kept in memory.
+
+    The mean and max values are exact. Percentiles are estimated with a histogram of
+    logarithmically spaced bins, with a relative error below 0.25%
+    (angles rounded to zero are counted exactly).
+
+    :param percentiles: percentiles to be estimated.
+    :param output_path: if not None, the per-pixel angles are streamed to
+      this path as raw little-endian float64 values.
+    :return: a dictionary with the same keys as :func:`get_spectral_angle_stats`.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    angle_sum = 0.0
+    angle_max = -np.inf
+    angle_count = 0
+    bin_counts = np.zeros(len(_spectral_angle_bin_edges), dtype=np.int64)
+    if output_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "wb") if output_path is not None \
+            else contextlib.nullcontext() as output_file:
+        for block_angles in iter_spectral_angle_blocks(
+                original_array=original_array, reconstructed_array=reconstructed_array,
+                component_count=component_count, block_pixels=block_pixels):
+            angle_sum += float(block_angles.sum())
+            angle_max = max(angle_max, float(block_angles.max()))
+            angle_count += len(block_angles)
+            if len(percentiles) > 0:
+                bin_counts += np.bincount(
+                    np.searchsorted(_spectral_angle_bin_edges, block_angles, side="right") - 1,
+                    minlength=len(bin_counts))
+            if output_file is not None:
+                block_angles.astype("<f8").tofile(output_file)
+
+    stats = dict(mean=angle_sum / angle_count, max=angle_max)
+    cumulative_counts = np.cumsum(bin_counts)
+
+    def estimate_sorted_angle(rank):
+        """Estimate the angle at position rank of the sorted angles,
+        assuming angles are evenly spread within each bin.
+        """
+        bin_index = int(np.searchsorted(cumulative_counts, rank, side="right"))
+        if bin_index == 0:
+            return 0.0
+        bin_start = _spectral_angle_bin_edges[bin_index]
+        bin_end = _spectral_angle_bin_edges[bin_index + 1] \
+            if bin_index + 1 < len(_spectral_angle_bin_edges) else bin_start
+        return bin_start + (bin_end - bin_start) \
+               * (rank - cumulative_counts[bin_index - 1] + 0.5) / bin_counts[bin_index]
+
+    for percentile in percentiles:
+        # Linear interpolation between the closest ranks, as in np.percentile
+        rank = percentile / 100 * (angle_count - 1)
+        lower_rank = int(np.floor(rank))
+        value = estimate_sorted_angle(lower_rank)
+        if rank > lower_rank:
+            value += (rank - lower_rank) * (estimate_sorted_angle(lower_rank + 1) - value)
+        stats[f"p{percentile}"] = float(min(value, angle_max))
+    return stats
+
+
+def get_spectral_angle_stats(angles_deg, percentiles=(50, 90, 99)):
+    """Return a dictionary with summary statistics of an array of spectral angles.
+    Keys are "mean", "max", and "p{percentile}" for each element of percentiles
+    (e.g., "p50" for the median).
+    """
+    angles_deg = np.asarray(angles_deg)
+    stats = dict(mean=float(np.mean(angles_deg)), max=float(np.max(angles_deg)))
+    if len(percentiles) > 0:
+        for percentile, value in zip(percentiles, np.percentile(angles_deg, percentiles)):
+            stats[f"p{percentile}"] = float(value)
+    return stats
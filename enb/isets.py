@@ -7,6 +7,7 @@ __since__ = "2020/04/01"
 import os
 import math
 import re
+import hashlib
 import numpy as np
 import enb
 from enb import atable
@@ -15,43 +16,66 @@ from enb import sets
 
 # pylint: disable=no-self-use
 
+def get_value_counts(data):
+    """Get the distinct values in data and the number of times each one appears.
+
+    For integer data, values are counted with :func:`np.bincount` using their
+    offset from the minimum value, unless the range of values is much larger than
+    the number of samples. Otherwise (e.g., for floating point data), :func:`np.unique`
+    is used.
+
+    :param data: a numpy array (or array-like) with any shape.
+    :return: a tuple (values, counts) of arrays, with values sorted in increasing order.
+    """
+    data = np.asarray(data).ravel(order="K")
+    if data.size > 0 and data.dtype.kind in "biu":
+        min_value, max_value = int(data.min()), int(data.max())
+        value_range = max_value - min_value + 1
+        if max_value < 2 ** 63 and value_range <= max(2 ** 16, 2 * data.size):
+            counts = np.bincount(data.astype(np.int64) - min_value, minlength=value_range)
+            offsets = np.flatnonzero(counts)
+            return (offsets + min_value).astype(data.dtype), counts[offsets]
+    return np.unique(data, return_counts=True)
+
+
+def get_counts_entropy(counts):
+    """Get the entropy in bits of the probability distribution given by
+    an array of counts.
+    """
+    counts = np.asarray(counts)
+    probabilities = counts[counts > 0] / counts.sum()
+    return float(-np.sum(probabilities * np.log2(probabilities)))
+
+
 def entropy(data):
     """Compute the zero-order entropy of the provided data
     """
-    values, count = np.unique(data.flatten(), return_counts=True)
-    total_sum = sum(count)
-    probabilities = (count / total_sum for value, count in zip(values, count))
-    return -sum(p * math.log2(p) for p in probabilities)
+    return get_counts_entropy(get_value_counts(data)[1])
 
 
 def mutual_information(data1, data2):
     """Compute the mutual information between two vectors of identical length
     after flattening. Implemented following
     https://en.wikipedia.org/wiki/Mutual_information#Definition
+
+    The joint distribution is obtained by counting only the (x,y) pairs
+    that actually appear.
     """
-    # pylint: disable=too-many-locals
-    # x: data1
-    values1, counts1 = np.unique(data1.flatten(), return_counts=True)
-    total_sum1 = counts1.sum()
-    probabilities1 = (c / total_sum1 for v, c in zip(values1, counts1))
-    entropy_x = -sum(p * math.log2(p) for p in probabilities1)
-
-    # y: data1
-    values2, counts2 = np.unique(data2.flatten(), return_counts=True)
-    total_sum2 = counts2.sum()
-    assert total_sum1 == total_sum2
-    probabilities2 = (c / total_sum2 for v, c in zip(values2, counts2))
-    entropy_y = -sum(p * math.log2(p) for p in probabilities2)
-
-    # joint (x,y)
-    bin_count = max(max(v) for v in (values1, values2)) - min(
-        min(v) for v in (values1, values2)) + 1
-    count_xy = np.histogram2d(data1.flatten(), data2.flatten(), bin_count)[
-        0].flatten()
-    total_sum_xy = count_xy.sum()
-    assert total_sum_xy == total_sum1
-    probabilities_xy = count_xy / total_sum_xy
-    entropy_xy = -sum(p * math.log2(p) for p in probabilities_xy if p != 0)
+    data1 = np.asarray(data1).ravel(order="K")
+    data2 = np.asarray(data2).ravel(order="K")
+    values1, counts1 = get_value_counts(data1)
+    values2, counts2 = get_value_counts(data2)
+    assert counts1.sum() == counts2.sum()
+    entropy_x = get_counts_entropy(counts1)
+    entropy_y = get_counts_entropy(counts2)
+
+    # Each (x,y) pair is mapped to a unique integer code based on
+    # the positions of x and y among the distinct values of each vector
+    joint_codes = np.searchsorted(values1, data1).astype(np.int64) * len(values2) \
+                  + np.searchsorted(values2, data2)
+    count_xy = get_value_counts(joint_codes)[1]
+    assert count_xy.sum() == counts1.sum()
+    entropy_xy = get_counts_entropy(count_xy)
 
     return entropy_x + entropy_y - entropy_xy
 
@@ -69,31 +93,110 @@ def kl_divergence(data1, data2):
     the factor is skipped from the count. In this case, the two values most
     likely differ and they should be carefully interpreted.
     """
-    # x: data1
-    values1, counts1 = np.unique(data1.flatten(), return_counts=True)
-    total_sum1 = counts1.sum()
-    probabilities1 = {v: c / total_sum1 for v, c in zip(values1, counts1)}
-
-    # y: data1
-    values2, counts2 = np.unique(data2.flatten(), return_counts=True)
-    total_sum2 = counts2.sum()
-    assert total_sum1 == total_sum2
-    probabilities2 = {v: c / total_sum2 for v, c in zip(values2, counts2)}
-
-    kl_pq = sum(
-        probabilities1[k] * math.log(probabilities1[k] / probabilities2[k])
-        if k in probabilities2 and probabilities1[k] != 0 and probabilities2[
-            k] != 0 else 0
-        for k in probabilities1.keys())
-    kl_qp = sum(
-        probabilities2[k] * math.log(probabilities2[k] / probabilities1[k])
-        if k in probabilities1 and probabilities1[k] != 0 and probabilities2[
-            k] != 0 else 0
-        for k in probabilities2.keys())
+    values1, counts1 = get_value_counts(data1)
+    values2, counts2 = get_value_counts(data2)
+    assert counts1.sum() == counts2.sum()
+
+    # Only values present in both distributions contribute
+    _, indices1, indices2 = np.intersect1d(
+        values1, values2, assume_unique=True, return_indices=True)
+    probabilities1 = counts1[indices1] / counts1.sum()
+    probabilities2 = counts2[indices2] / counts2.sum()
+
+    kl_pq = float(np.sum(probabilities1 * np.log(probabilities1 / probabilities2)))
+    kl_qp = float(np.sum(probabilities2 * np.log(probabilities2 / probabilities1)))
 
     return kl_pq, kl_qp
 
 
+class FileStatistics:
+    """Statistics of the contents of a file, obtained by :func:`get_file_statistics`
+    with a single read of the file.
+    """
+
+    def __init__(self, digest, size_bytes, histograms):
+        """
+        :param digest: hex digest of the file contents.
+        :param size_bytes: size of the file in bytes.
+        :param histograms: dict indexed by number of bytes per sample (e.g., 1 or 2),
+          with values being an array of counts indexed by the native-endian unsigned
+          integer value of each sample. Values can be None if the file size is not
+          a multiple of the number of bytes per sample.
+        """
+        self.digest = digest
+        self.size_bytes = size_bytes
+        self.histograms = histograms
+
+    def get_entropy(self, bytes_per_sample):
+        """Get the zero-order entropy of the file's contents in bits per sample,
+        considering samples of bytes_per_sample bytes.
+        """
+        return get_counts_entropy(self.histograms[bytes_per_sample])
+
+    def get_extrema(self, dtype):
+        """Get the minimum and maximum sample values of the file's contents
+        when interpreted with the given numpy dtype. The dtype's size must be
+        one of the sample sizes of the available histograms.
+        """
+        dtype = np.dtype(dtype)
+        values = np.flatnonzero(self.histograms[dtype.itemsize]).astype(
+            f"=u{dtype.itemsize}").view(dtype)
+        return values.min(), values.max()
+
+
+def get_file_statistics(file_path, histogram_bytes=(1, 2),
+                        hash_algorithm=sets.HASH_ALGORITHM, chunk_size=None):
+    """Compute the hash digest and the histograms of the contents of file_path,
+    reading it only once. Histograms are obtained by direct counting, without sorting.
+
+    :param file_path: path to the file to be analyzed.
+    :param histogram_bytes: sizes in bytes of the samples for which the histogram is
+      computed. Only 1 and 2 are allowed.
+    :param hash_algorithm: name of the hashlib algorithm to be used.
+    :param chunk_size: maximum number of bytes read at once.
+      It must be a multiple of the histogram sample sizes. If None,
+      options.io_buffer_size is used.
+    :return: a :class:`FileStatistics` instance.
+    """
+    assert all(b in (1, 2) for b in histogram_bytes), histogram_bytes
+    assert chunk_size is None or all(chunk_size % b == 0 for b in histogram_bytes), chunk_size
+    hasher = hashlib.new(hash_algorithm)
+    histograms = {b: np.zeros(2 ** (8 * b), dtype=np.int64) for b in histogram_bytes}
+    size_bytes = 0
+    for chunk in sets.iter_file_chunks(file_path, chunk_size=chunk_size):
+        hasher.update(chunk)
+        size_bytes += len(chunk)
+        for bytes_per_sample, histogram in histograms.items():
+            histogram += np.bincount(
+                np.frombuffer(chunk, dtype=f"=u{bytes_per_sample}",
+                              count=len(chunk) // bytes_per_sample),
+                minlength=len(histogram))
+    return FileStatistics(
+        digest=hasher.hexdigest(), size_bytes=size_bytes,
+        histograms={b: h if size_bytes % b == 0 else None for b, h in histograms.items()})
+
+
+def get_file_extrema(file_path, dtype, chunk_size=None):
+    """Get the minimum and maximum sample values of the contents of file_path
+    interpreted with the given numpy dtype, reading the file in chunks so that
+    memory usage is bounded.
+
+    :param chunk_size: maximum number of bytes read at once. It is rounded down to
+      a multiple of the dtype size. If None, options.io_buffer_size is used.
+    :return: a tuple (min, max).
+    """
+    dtype = np.dtype(dtype)
+    chunk_size = chunk_size if chunk_size is not None else enb.config.options.io_buffer_size
+    chunk_size = max(dtype.itemsize, chunk_size - chunk_size % dtype.itemsize)
+    extrema = [(chunk_array.min(), chunk_array.max())
+               for chunk_array in (np.frombuffer(chunk, dtype=dtype)
+                                   for chunk in sets.iter_file_chunks(file_path, chunk_size))]
+    if not extrema:
+        raise ValueError(f"Cannot obtain the extrema of empty file {repr(file_path)}")
+    minima, maxima = zip(*extrema)
+    return np.min(minima), np.max(maxima)
+
+
 def file_path_to_geometry_dict(file_path, existing_dict=None,
                                verify_file_size=True):
     """Return a dict with basic geometry dict based on the file path and the
@@ -355,15 +458,45 @@ class ImagePropertiesTable(ImageGeometryTable):
     """
     dataset_files_extension = "raw"
 
+    def get_file_statistics(self, file_path):
+        """Get the :class:`FileStatistics` of file_path. They are computed
+        once and reused by all columns of the same row, so that each file is read
+        only once for the hash digest, sample extrema and entropy columns.
+        """
+        file_stat = os.stat(file_path)
+        key = (file_path, file_stat.st_size, file_stat.st_mtime_ns)
+        try:
+            cached_key, file_statistics = self._file_statistics
+            if cached_key == key:
+                return file_statistics
+        except AttributeError:
+            pass
+        file_statistics = get_file_statistics(file_path)
+        self._file_statistics = (key, file_statistics)
+        return file_statistics
+
+    @atable.redefines_column
+    def set_hash_digest(self, file_path, row):
+        """Store the hexdigest of file_path's contents, computed along with
+        the remaining file statistics.
+        """
+        row[_column_name] = self.get_file_statistics(file_path).digest
+
     @atable.column_function([
         atable.ColumnProperties(name="sample_min", label="Min sample value"),
         atable.ColumnProperties(name="sample_max", label="Max sample value")])
     def set_sample_extrema(self, file_path, row):
         """Set the minimum and maximum values stored in file_path.
+        For 1 and 2-byte samples, they are obtained from the file's histogram.
+        Otherwise, the file is read in chunks of bounded size.
         """
-        array = load_array_bsq(file_or_path=file_path,
-                               image_properties_row=row).flatten()
-        row["sample_min"], row["sample_max"] = array.min(), array.max()
+        dtype = np.dtype(row["dtype"] if "dtype" in row
+                         else iproperties_row_to_numpy_dtype(row))
+        file_statistics = self.get_file_statistics(file_path)
+        if file_statistics.histograms.get(dtype.itemsize) is not None:
+            row["sample_min"], row["sample_max"] = file_statistics.get_extrema(dtype)
+        else:
+            row["sample_min"], row["sample_max"] = get_file_extrema(file_path, dtype)
         if row["float"] == False:  # pylint: disable=singleton-comparison
             assert row["sample_min"] == int(row["sample_min"])
             assert row["sample_max"] == int(row["sample_max"])
@@ -396,16 +529,21 @@ class ImagePropertiesTable(ImageGeometryTable):
                                 plot_min=0, plot_max=8 * bytes_per_sample)
         for bytes_per_sample in (1, 2)])
     def set_file_entropy(self, file_path, row):
-        """Set the zero-order entropy of the data in file_path for 1, 2 and 4
-        bytes per sample in entropy_1B_bps, entropy_2B_bps and
-        entropy_4B_bps, respectively. If the file is not a multiple of those
-        bytes per sample, -1 is stored instead.
+        """Set the zero-order entropy of the data in file_path for 1 and 2
+        bytes per sample in entropy_1B_bps and entropy_2B_bps, respectively,
+        based on the file's histograms. The entropy for 4 bytes per sample is stored
+        in entropy_4B_bps only if that column is defined (e.g., in a subclass).
+        If the file is not a multiple of those bytes per sample, -1 is stored instead.
         """
+        file_statistics = self.get_file_statistics(file_path)
         for bytes_per_sample in (1, 2, 4):
+            column = f"entropy_{bytes_per_sample}B_bps"
             if row["bytes_per_sample"] % bytes_per_sample != 0:
-                row[f"entropy_{bytes_per_sample}B_bps"] = -1
-            else:
-                row[f"entropy_{bytes_per_sample}B_bps"] = entropy(
+                row[column] = -1
+            elif file_statistics.histograms.get(bytes_per_sample) is not None:
+                row[column] = file_statistics.get_entropy(bytes_per_sample)
+            elif column in self.column_to_properties:
+                row[column] = entropy(
                     np.fromfile(file_path,
                                 dtype=f"uint{8 * bytes_per_sample}").flatten())
 
@@ -493,7 +631,7 @@ class BandEntropyTable(ImageGeometryTable):
         being entropy in bits per sample.
         """
         array = load_array_bsq(file_or_path=file_path, image_properties_row=row)
-        row[_column_name] = {i: entropy(array[:, :, i].flatten())
+        row[_column_name] = {i: entropy(array[:, :, i])
                              for i in range(row["component_count"])}
 
 
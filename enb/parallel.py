@@ -4,14 +4,21 @@
 __author__ = "Miguel Hernández-Cabronero"
 __since__ = "2022/01/02"
 
+import atexit
 import os
+import tempfile
 import time
 import datetime
+import itertools
+import collections
+import queue
+import threading
 import pathos
 import dill
 
 # pylint: disable=relative-beyond-top-level
 from .config import options
+from . import log
 from . import parallel_ray
 
 
@@ -29,10 +36,63 @@ def init():
 def fallback_init():
     """Initialization of the fallback engine. This needs to be called before
     each parallelization, or globals used in the pool might be updated.
+
+    If enb.config.options.persistent_pool is True, the current pool (if any)
+    is kept. Otherwise, the pool is stopped so that a new one is
+    created for the next parallel calls. In both cases, the current options
+    are pushed to the workers with :meth:`push_options`.
+    """
+    if not options.persistent_pool:
+        stop_pool()
+    push_options()
+
+
+def stop_pool():
+    """Stop the worker processes of the fallback engine, if any.
+    A new pool is created when new parallel calls are started.
     """
     if FallbackFuture.pathos_pool is not None:
-        FallbackFuture.pathos_pool.clear()
+        FallbackFuture.pathos_pool.close()
+        FallbackFuture.pathos_pool.join()
         FallbackFuture.pathos_pool = None
+        FallbackFuture.pool_shared_ids = frozenset()
+
+
+def push_options():
+    """Make the current values of enb.config.options available to all
+    parallel calls started from now on with the fallback engine, without
+    restarting its worker processes. Options are sent to each worker at most
+    once every time they change.
+    """
+    # pylint: disable=global-statement
+    global _options_handle
+    current_options = dict(options.items())
+    if _options_handle is None or _options_handle.get() != current_options:
+        if _options_handle is not None:
+            _options_handle.release()
+        _options_handle = share(current_options)
+    return _options_handle
+
+
+#: Handle to the values of enb.config.options last pushed to the fallback workers.
+_options_handle = None
+#: Id of the options handle last applied by this (worker) process.
+_applied_options_id = None
+
+
+def fallback_call(options_handle, fun, args, kwargs):
+    """Function run by the fallback workers. It updates enb.config.options
+    if needed, and then calls fun with the given arguments.
+    """
+    # pylint: disable=global-statement,protected-access
+    global _applied_options_id
+    if options_handle.id != _applied_options_id:
+        # None values are also copied, unlike in options.update()
+        options._name_to_property.update(options_handle.get())
+        log.logger.selected_log_level = log.logger.get_level(
+            log.logger.level_message.name, options.verbose)
+        _applied_options_id = options_handle.id
+    return fun(*args, **kwargs)
 
 
 def parallel(*args, **kwargs):
@@ -66,6 +126,20 @@ def get(ids, **kwargs):
     return fallback_get(ids, **kwargs)
 
 
+def release_results(ids):
+    """Free the memory used in this process by the results of the given
+    ids, once they have been obtained with :meth:`get`. Results cannot be
+    obtained again for those ids afterwards.
+
+    With ray, results are kept in the object store until no references to
+    the ids remain, and nothing is done here.
+    """
+    if parallel_ray.is_ray_enabled():
+        return
+    for fallback_future in ids:
+        fallback_future.release_result()
+
+
 def get_completed_pending_ids(ids, timeout=0):
     """Given a list of ids returned by start calls, return two lists: the
     first one with the input ids that are ready, and the second one with the
@@ -76,23 +150,158 @@ def get_completed_pending_ids(ids, timeout=0):
     return fallback_get_completed_pending_ids(ids, timeout=timeout)
 
 
+def get_worker_count():
+    """Return the number of parallel calls that can be run simultaneously.
+    """
+    if parallel_ray.is_ray_enabled():
+        return parallel_ray.get_cpu_count()
+    return options.cpu_limit if options.cpu_limit and options.cpu_limit > 0 \
+        else os.cpu_count()
+
+
+def share(obj):
+    """Return a :class:`SharedObject` handle to obj, which can be passed to
+    parallel calls instead of obj itself. Parallel calls obtain obj by calling
+    the handle's `get` method.
+
+    The main advantage of this is that obj is serialized only once, and it is sent
+    to (and deserialized by) each worker process at most once,
+    instead of once per parallel call. With the fallback engine, workers that did not
+    inherit obj when they were created read it from a temporary file (in
+    options.base_tmp_dir) the first time they use the handle.
+
+    The handle's `release` method should be called once no more parallel calls
+    are to be started with it.
+    """
+    return SharedObject(obj)
+
+
+#: Objects shared with :meth:`share` that have not been released, indexed by id.
+#: Workers forked after an object is shared can read it directly from here.
+_shared_objects = {}
+#: Shared objects received and deserialized by this (worker) process, indexed by id.
+_received_shared_objects = collections.OrderedDict()
+#: Paths of the temporary files with serialized shared objects created by this process.
+_payload_paths = set()
+
+
+@atexit.register
+def _remove_payload_files():
+    """Remove the serialized shared objects that were not released.
+    """
+    for path in list(_payload_paths):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    _payload_paths.clear()
+
+
+class SharedObject:
+    """Handle to an object shared with parallel calls. See :meth:`share`.
+    """
+    #: Maximum number of shared objects kept by each worker process.
+    #: The least recently received ones are discarded first.
+    max_received_objects = 4
+    _id_counter = itertools.count()
+
+    def __init__(self, obj):
+        self.id = f"{os.getpid()}_{next(self._id_counter)}"
+        _shared_objects[self.id] = obj
+        # With ray, the object is put in the object store only once
+        self.ray_ref = parallel_ray.put(obj) if parallel_ray.is_ray_enabled() else None
+        # Path to the serialized version of obj, read by pathos workers that
+        # did not inherit it.
+        self.payload_path = None
+
+    def get(self):
+        """Get the shared object. When invoked in a worker process,
+        it is deserialized only the first time.
+        """
+        try:
+            return _shared_objects[self.id]
+        except KeyError:
+            pass
+        try:
+            _received_shared_objects.move_to_end(self.id)
+            return _received_shared_objects[self.id]
+        except KeyError:
+            pass
+
+        if self.ray_ref is not None:
+            obj = parallel_ray.get(self.ray_ref)
+        elif self.payload_path is not None and os.path.isfile(self.payload_path):
+            with open(self.payload_path, "rb") as payload_file:
+                obj = dill.load(payload_file)
+        else:
+            raise KeyError(f"Shared object {self.id} is not available in "
+                           f"process {os.getpid()}. Was it released?")
+        _received_shared_objects[self.id] = obj
+        while len(_received_shared_objects) > self.max_received_objects:
+            _received_shared_objects.popitem(last=False)
+        return obj
+
+    def release(self):
+        """Stop sharing the object. The handle cannot be passed to new parallel calls afterwards.
+        """
+        _shared_objects.pop(self.id, None)
+        self.ray_ref = None
+        if self.payload_path in _payload_paths:
+            _payload_paths.remove(self.payload_path)
+            try:
+                os.remove(self.payload_path)
+            except OSError:
+                pass
+        self.payload_path = None
+
+    def __getstate__(self):
+        """The shared object is never serialized with the handle. When it is not
+        otherwise available to the receiving process, it is serialized once
+        into a temporary file, which each receiving process reads at most once.
+        """
+        if self.ray_ref is None and self.id not in FallbackFuture.pool_shared_ids \
+                and self.payload_path is None and self.id in _shared_objects:
+            payload_fd, payload_path = tempfile.mkstemp(
+                prefix=f"enb_shared_{self.id}_", suffix=".dill", dir=options.base_tmp_dir)
+            _payload_paths.add(payload_path)
+            with os.fdopen(payload_fd, "wb") as payload_file:
+                dill.dump(_shared_objects[self.id], payload_file)
+            self.payload_path = payload_path
+        return dict(self.__dict__)
+
+
 class FallbackFuture:
     """The fallback future is invoked when get is called.
     """
     current_id = 0
     pathos_pool = None
+    #: Ids of shared objects inherited by the workers of the current pool.
+    pool_shared_ids = frozenset()
 
     def __init__(self, fun, args, kwargs):
+        # Obtained before creating the pool, so that new workers inherit the options
+        options_handle = _options_handle if _options_handle is not None else push_options()
         if self.__class__.pathos_pool is None:
-            self.__class__.pathos_pool = pathos.pools.ProcessPool(
-                nodes=options.cpu_limit
+            # The multiprocess pool used by pathos (which serializes with dill) is
+            # employed directly, so that completion is notified via callbacks
+            # instead of polling
+            self.__class__.pathos_pool = pathos.helpers.mp.Pool(
+                processes=options.cpu_limit
                 if options.cpu_limit and options.cpu_limit > 0 else None)
+            # Workers are forked after this point, so they inherit all objects shared so far.
+            self.__class__.pool_shared_ids = frozenset(_shared_objects) \
+                if pathos.helpers.mp.get_start_method() == "fork" else frozenset()
         self.fun = fun
         self.args = args
         self.kwargs = kwargs
         self.current_id = self.__class__.current_id
         self.__class__.current_id += 1
-        self.pathos_result = self.pathos_pool.apipe(fun, *args, **kwargs)
+        self.completed = False
+        self.done_callbacks = []
+        self.lock = threading.Lock()
+        self.pathos_result = self.pathos_pool.apply_async(
+            fallback_call, (options_handle, fun, args, kwargs),
+            callback=self.notify_completion, error_callback=self.notify_completion)
 
     def get(self, **kwargs):
         """Blocking get of the return of the parallelized function.
@@ -103,7 +312,33 @@ class FallbackFuture:
         """Return True if the result has been received from the parallelized
         function.
         """
-        return self.pathos_result.ready()
+        return self.pathos_result is None or self.pathos_result.ready()
+
+    def release_result(self):
+        """Free the received result, which cannot be obtained afterwards.
+        See :meth:`enb.parallel.release_results`.
+        """
+        self.pathos_result = None
+
+    def add_done_callback(self, fun):
+        """Call fun with this future as its only argument once the result
+        is received. If it has already been received, fun is called immediately.
+        Note that fun may be run in a thread other than the caller's.
+        """
+        with self.lock:
+            if not self.completed:
+                self.done_callbacks.append(fun)
+                return
+        fun(self)
+
+    def notify_completion(self, _result):
+        """Callback invoked by the pool when the result is received.
+        """
+        with self.lock:
+            self.completed = True
+            done_callbacks, self.done_callbacks = self.done_callbacks, []
+        for fun in done_callbacks:
+            fun(self)
 
     def __hash__(self):
         return hash(self.current_id)
@@ -172,6 +407,10 @@ class ProgressiveGetter:
 
     Note that the for-loop body will always be executed at least once,
     namely after every potentially blocking call to :meth:`ray.wait`.
+
+    With the fallback engine, completion is notified by the futures
+    themselves, so that each update costs time proportional to the number of
+    newly completed tasks, not to the total number of tasks.
     """
 
     # pylint: disable=too-many-instance-attributes
@@ -208,24 +447,45 @@ class ProgressiveGetter:
             if weight_list is not None else [1] * len(self.full_id_list)
         self.id_to_weight = dict(zip(self.full_id_list, self.weight_list))
         self.iteration_period = iteration_period
-        self.pending_ids = list(self.full_id_list)
+        # Pending ids are kept in an (ordered) dict so that they can be removed in O(1)
+        self.pending_ids = dict.fromkeys(self.full_id_list)
         self.completed_ids = []
-        self.update_finished_tasks(timeout=0)
+        #: Sum of the weights of the completed tasks.
+        self.completed_weight = 0
         self.start_time = time.time_ns()
         self.end_time = None
+        if parallel_ray.is_ray_enabled():
+            self.completion_queue = None
+        else:
+            self.completion_queue = queue.SimpleQueue()
+            for fallback_future in self.full_id_list:
+                fallback_future.add_done_callback(self.completion_queue.put)
+        self.update_finished_tasks(timeout=0)
 
     def update_finished_tasks(self, timeout=None):
         """Wait for up to timeout seconds or until ray completes computation
         of all pending tasks. Update the list of completed and pending tasks.
         """
-        self.completed_ids, self.pending_ids = get_completed_pending_ids(
-            self.full_id_list,
-            timeout=timeout if timeout is not None else self.iteration_period)
-
-        try:
-            if not self.pending_ids and self.end_time is None:
-                self.end_time = time.time_ns()
-        except AttributeError:
+        timeout = timeout if timeout is not None else self.iteration_period
+        if self.completion_queue is None:
+            new_completed_ids, _ = get_completed_pending_ids(
+                list(self.pending_ids), timeout=timeout)
+        else:
+            new_completed_ids = []
+            deadline = time.time() + timeout
+            while len(new_completed_ids) < len(self.pending_ids):
+                try:
+                    new_completed_ids.append(self.completion_queue.get(
+                        timeout=max(0, deadline - time.time())))
+                except queue.Empty:
+                    break
+
+        for completed_id in new_completed_ids:
+            del self.pending_ids[completed_id]
+            self.completed_weight += self.id_to_weight[completed_id]
+        self.completed_ids.extend(new_completed_ids)
+
+        if not self.pending_ids and self.end_time is None:
             self.end_time = time.time_ns()
 
         assert len(self.completed_ids) + len(self.pending_ids) == len(
@@ -246,8 +506,8 @@ class ProgressiveGetter:
         seconds, minutes = seconds - 60 * (seconds // 60), seconds // 60
         minutes, hours = int(minutes % 60), int(minutes // 60)
 
-        total_weight = sum(self.id_to_weight.values())
-        completed_weight = sum(self.id_to_weight[i] for i in self.completed_ids)
+        total_weight = sum(self.weight_list)
+        completed_weight = self.completed_weight
 
         time_str = f"{hours:02d}h {minutes:02d}min {seconds:02.3f}s"
         percentage_str = f"{100 * (completed_weight / total_weight):0.1f}%"
@@ -25,6 +25,7 @@ import pandas as pd
 import textwrap
 import itertools
 import contextlib
+import functools
 
 import enb
 from . import config
@@ -529,7 +530,7 @@ def is_remote_node():
     if not is_parallel_process():
         return False
     try:
-        if os.environ['_head_node_ip'] == enb.misc.get_node_ip():
+        if os.environ['_head_node_ip'] == _get_node_ip():
             return False
     except KeyError:
         return False
@@ -537,6 +538,14 @@ def is_remote_node():
     return True
 
 
+@functools.lru_cache(maxsize=None)
+def _get_node_ip():
+    """Memoized version of :func:`enb.misc.get_node_ip`, so that
+    :func:`is_remote_node` does not open a socket on each call.
+    """
+    return enb.misc.get_node_ip()
+
+
 def is_ray_initialized():
     """Return True if and only if ray is enabled and initialized.
     """
@@ -597,6 +606,18 @@ def get(ids, **kwargs):
     return ray.get(ids, **kwargs)
 
 
+def get_cpu_count():
+    """Return the number of CPUs available in the ray cluster.
+    """
+    return int(ray.cluster_resources().get("CPU", 1))
+
+
+def put(obj):
+    """Call ray's put method to store obj in the object store, and return its id.
+    """
+    return ray.put(obj)
+
+
 def get_completed_pending_ids(ids, timeout=0):
     """Return the list of completed and pending ids.
     """
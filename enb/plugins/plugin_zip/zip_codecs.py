@@ -27,13 +27,11 @@ class LZ77Huffman(AbstractZipCodec):
     """Apply the LZ77 algorithm and Huffman coding to the file using zlib.
     """
 
-    def compress(self, original_path, compressed_path, original_file_info):
-        with open(original_path, "rb") as original_file, open(compressed_path, "wb") as compressed_file:
-            compressed_file.write(zlib.compress(original_file.read(), level=self.param_dict["compression_level"]))
+    def compress_bytes(self, original_data, original_file_info=None):
+        return zlib.compress(original_data, level=self.param_dict["compression_level"])
 
-    def decompress(self, compressed_path, reconstructed_path, original_file_info=None):
-        with open(compressed_path, "rb") as compressed_file, open(reconstructed_path, "wb") as reconstructed_file:
-            reconstructed_file.write(zlib.decompress(compressed_file.read()))
+    def decompress_bytes(self, compressed_data, original_file_info=None):
+        return zlib.decompress(compressed_data)
 
     @property
     def label(self):
@@ -44,13 +42,11 @@ class LZMA(AbstractZipCodec):
     """Apply the LZMA algorithm using the lzma library
     """
 
-    def compress(self, original_path: str, compressed_path: str, original_file_info=None):
-        with open(original_path, "rb") as input_file, open(compressed_path, "wb") as output_file:
-            output_file.write(lzma.compress(input_file.read(), preset=self.param_dict["compression_level"]))
+    def compress_bytes(self, original_data, original_file_info=None):
+        return lzma.compress(original_data, preset=self.param_dict["compression_level"])
 
-    def decompress(self, compressed_path, reconstructed_path, original_file_info=None):
-        with open(compressed_path, "rb") as compressed_file, open(reconstructed_path, "wb") as reconstructed_file:
-            reconstructed_file.write(lzma.decompress(compressed_file.read()))
+    def decompress_bytes(self, compressed_data, original_file_info=None):
+        return lzma.decompress(compressed_data)
 
     @property
     def label(self):
@@ -61,13 +57,11 @@ class BZIP2(AbstractZipCodec):
     """Apply the BZIP2 algorithm using zlib.
     """
 
-    def compress(self, original_path: str, compressed_path: str, original_file_info=None):
-        with open(original_path, "rb") as input_file, open(compressed_path, "wb") as output_file:
-            output_file.write(bz2.compress(input_file.read(), self.param_dict["compression_level"]))
+    def compress_bytes(self, original_data, original_file_info=None):
+        return bz2.compress(original_data, self.param_dict["compression_level"])
 
-    def decompress(self, compressed_path, reconstructed_path, original_file_info=None):
-        with open(compressed_path, "rb") as compressed_file, open(reconstructed_path, "wb") as reconstructed_file:
-            reconstructed_file.write(bz2.decompress(compressed_file.read()))
+    def decompress_bytes(self, compressed_data, original_file_info=None):
+        return bz2.decompress(compressed_data)
 
     @property
     def label(self):
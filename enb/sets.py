@@ -15,8 +15,12 @@ __since__ = "2019/09/18"
 import collections
 import os
 import hashlib
+import pickle
+import sqlite3
 import time
 
+import pandas as pd
+
 import enb
 from enb import atable
 from enb.atable import get_canonical_path
@@ -27,16 +31,184 @@ options = enb.config.options
 HASH_ALGORITHM = "sha256"
 
 
+def iter_file_chunks(file_path, chunk_size=None):
+    """Iterate over the contents of a file in consecutive chunks of bytes,
+    so that files of any size can be processed in bounded memory.
+
+    :param file_path: path to the file to be read.
+    :param chunk_size: maximum number of bytes of each chunk. If None,
+      options.io_buffer_size is used.
+    :return: a generator of bytes objects. Only the last one can be shorter
+      than chunk_size.
+    """
+    chunk_size = chunk_size if chunk_size is not None else options.io_buffer_size
+    with open(file_path, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(chunk_size), b""):
+            yield chunk
+
+
+def get_file_digest(file_path, algorithm=HASH_ALGORITHM, chunk_size=None):
+    """Hash the contents of a file in a single, streamed read.
+
+    :param file_path: path to the file to be hashed.
+    :param algorithm: name of the hashlib algorithm to be used.
+    :param chunk_size: maximum number of bytes read at once. If None,
+      options.io_buffer_size is used.
+    :return: a tuple (hexdigest, size_bytes) for the file's contents.
+    """
+    hasher = hashlib.new(algorithm)
+    size_bytes = 0
+    for chunk in iter_file_chunks(file_path, chunk_size=chunk_size):
+        hasher.update(chunk)
+        size_bytes += len(chunk)
+    return hasher.hexdigest(), size_bytes
+
+
+class PropertiesCache:
+    """Cache of file properties (i.e., the column values of FilePropertiesTable
+    subclasses), stored in an SQLite database so that it can be shared by any
+    number of projects and processes.
+
+    Files are identified by their device, inode, size, modification time and name,
+    and values are stored by the hash digest of the file contents and the file name,
+    since some properties (e.g., the image geometry) are obtained from the latter.
+    Values are ignored if the digest of the file is known and differs from the stored one.
+    The least recently used entries are evicted when more than max_entries are stored.
+    Only entries stored by each process are counted, so the limit is approximate
+    when several processes share the cache.
+    """
+    _instances = {}
+    # When max_entries is exceeded, entries are evicted until this fraction of
+    # max_entries is stored, so that eviction is not needed after every put
+    eviction_fraction = 0.1
+
+    def __init__(self, db_path, max_entries):
+        """
+        :param db_path: path to the SQLite database file. It is created if needed.
+        :param max_entries: maximum number of (table, file) entries stored.
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=600)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "file_key TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS properties ("
+                "table_name TEXT NOT NULL, digest TEXT NOT NULL, file_name TEXT NOT NULL, "
+                "properties BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (table_name, digest, file_name))")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS properties_last_used ON properties (last_used)")
+        self.entry_count = len(self)
+
+    @classmethod
+    def get_instance(cls):
+        """Get the cache for options.properties_cache_path, opened at most once
+        per process, or None if options.properties_cache_path is not set.
+        """
+        if not options.properties_cache_path:
+            return None
+        key = (os.getpid(), os.path.abspath(options.properties_cache_path))
+        try:
+            cache = cls._instances[key]
+        except KeyError:
+            cache = cls(db_path=options.properties_cache_path,
+                        max_entries=options.properties_cache_max_entries)
+            cls._instances[key] = cache
+        cache.max_entries = options.properties_cache_max_entries
+        return cache
+
+    @staticmethod
+    def get_file_key(file_path):
+        """Get the key that identifies file_path while it is not modified.
+        """
+        file_stat = os.stat(file_path)
+        return f"{file_stat.st_dev}:{file_stat.st_ino}:{file_stat.st_size}:" \
+               f"{file_stat.st_mtime_ns}:{os.path.basename(file_path)}"
+
+    def get(self, table_name, file_path, digest=None):
+        """Get the dict of properties stored for file_path and table_name.
+
+        :param digest: if not None, the known hash digest of file_path. Properties
+          stored for a different digest are ignored.
+        :return: the dict of properties, or None if not available.
+        """
+        file_name = os.path.basename(file_path)
+        with self.connection:
+            result = self.connection.execute(
+                "SELECT properties.digest, properties.properties FROM files "
+                "JOIN properties ON files.digest = properties.digest "
+                "WHERE files.file_key = ? AND properties.table_name = ? "
+                "AND properties.file_name = ?",
+                (self.get_file_key(file_path), table_name, file_name)).fetchone()
+            if result is None or (digest is not None and result[0] != digest):
+                return None
+            self.connection.execute(
+                "UPDATE properties SET last_used = ? "
+                "WHERE table_name = ? AND digest = ? AND file_name = ?",
+                (time.time(), table_name, result[0], file_name))
+        return pickle.loads(result[1])
+
+    def put(self, table_name, file_path, digest, properties):
+        """Store the dict of properties of file_path, whose contents have the
+        given hash digest, for table_name. Least recently used entries
+        are then evicted if needed.
+        """
+        file_name = os.path.basename(file_path)
+        serialized_properties = pickle.dumps(properties)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (file_key, digest) VALUES (?, ?)",
+                (self.get_file_key(file_path), digest))
+            updated_count = self.connection.execute(
+                "UPDATE properties SET properties = ?, last_used = ? "
+                "WHERE table_name = ? AND digest = ? AND file_name = ?",
+                (serialized_properties, time.time(), table_name, digest, file_name)).rowcount
+            if updated_count == 0:
+                self.connection.execute(
+                    "INSERT INTO properties "
+                    "(table_name, digest, file_name, properties, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (table_name, digest, file_name, serialized_properties, time.time()))
+                self.entry_count += 1
+            if self.entry_count > self.max_entries:
+                # Entries might have been stored or evicted by other processes
+                self.entry_count = len(self)
+                excess_count = self.entry_count - self.max_entries \
+                               + int(self.max_entries * self.eviction_fraction)
+                if self.entry_count > self.max_entries:
+                    self.connection.execute(
+                        "DELETE FROM properties WHERE rowid IN ("
+                        "SELECT rowid FROM properties ORDER BY last_used LIMIT ?)",
+                        (excess_count,))
+                    self.connection.execute(
+                        "DELETE FROM files WHERE digest NOT IN (SELECT digest FROM properties)")
+                    self.entry_count -= excess_count
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM properties").fetchone()[0]
+
+
 # pylint: disable=no-self-use
 
 class FilePropertiesTable(atable.ATable):
     """Table describing basic file properties (see decorated methods below).
+
+    If options.properties_cache_path is set, the column values of each file are
+    obtained from (and stored into) a :class:`PropertiesCache` shared among projects.
     """
     version_name = "original"
     hash_field_name = f"{HASH_ALGORITHM}"
     index_name = "file_path"
     base_dir = None
     dataset_files_extension = "raw"
+    # If True, the shared properties cache is used when enabled (see options.properties_cache_path)
+    use_properties_cache = True
+    # Columns that depend on the file's path or the time of computation are not cached
+    uncached_columns = ["corpus", "row_created", "row_updated"]
 
     def __init__(self, csv_support_path=None, base_dir=None):
         if csv_support_path is None and options.persistence_dir is not None:
@@ -64,6 +236,57 @@ class FilePropertiesTable(atable.ATable):
                               fill=fill, overwrite=overwrite,
                               chunk_size=chunk_size)
 
+    def compute_one_row(self, filtered_df, index, loc, column_fun_tuples, overwrite):
+        """Compute one row as in :meth:`enb.atable.ATable.compute_one_row`, but
+        using the values stored in the shared properties cache if it is enabled
+        and overwrite is False. Newly computed values are then stored in the cache.
+        """
+        # pylint: disable=too-many-arguments
+        cache = PropertiesCache.get_instance() if self.use_properties_cache else None
+        if cache is None:
+            return super().compute_one_row(
+                filtered_df=filtered_df, index=index, loc=loc,
+                column_fun_tuples=column_fun_tuples, overwrite=overwrite)
+
+        table_name = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        cached_properties = {}
+        if not overwrite:
+            try:
+                row = filtered_df.loc[loc].copy()
+            except KeyError:
+                row = pd.Series({k: None for k in self.column_to_properties.keys()},
+                                dtype=object)
+            known_digest = row.get(self.hash_field_name)
+            cached_properties = cache.get(
+                table_name=table_name, file_path=index,
+                digest=known_digest if isinstance(known_digest, str) and known_digest
+                else None) or {}
+            missing_columns = set(row.index[row.isnull()])
+            filled_columns = [c for c in cached_properties
+                              if c in missing_columns and c not in self.uncached_columns]
+            if filled_columns:
+                row = row.astype(object)
+                for column in filled_columns:
+                    row[column] = cached_properties[column]
+                index_name = filtered_df.index.name
+                filtered_df = row.to_frame().T
+                filtered_df.index = pd.Index([loc], name=index_name)
+
+        result = super().compute_one_row(
+            filtered_df=filtered_df, index=index, loc=loc,
+            column_fun_tuples=column_fun_tuples, overwrite=overwrite)
+
+        if not isinstance(result, Exception) \
+                and isinstance(result.get(self.hash_field_name), str):
+            null_columns = set(result.index[result.isnull()])
+            properties = {c: result[c] for c in self.column_to_properties
+                          if c in result.index and c not in null_columns
+                          and c not in self.uncached_columns}
+            if any(c not in cached_properties for c in properties):
+                cache.put(table_name=table_name, file_path=index,
+                          digest=result[self.hash_field_name], properties=properties)
+        return result
+
     def get_relative_path(self, file_path):
         """Get the relative path. Overwritten to handle the versioned path.
         """
@@ -102,10 +325,7 @@ class FilePropertiesTable(atable.ATable):
         :param file_path: path to the file to analyze.
         :param row: dictionary of previously computed values for this file_path (to speed up derived values).
         """
-        hasher = hashlib.new(HASH_ALGORITHM)
-        with open(file_path, "rb") as file:
-            hasher.update(file.read())
-        row[_column_name] = hasher.hexdigest()
+        row[_column_name] = get_file_digest(file_path)[0]
 
 
 class FileVersionTable(FilePropertiesTable):
@@ -114,6 +334,8 @@ class FileVersionTable(FilePropertiesTable):
     for all input files. Subclasses may be defined so that they inherit from
     other classes and can apply more complex versioning.
     """
+    # Versioning must take place for each file, so properties are never cached
+    use_properties_cache = False
 
     def __init__(self, version_base_dir, version_name="",
                  original_properties_table=None,
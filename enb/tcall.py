@@ -7,7 +7,11 @@ __since__ = "2020/05/23"
 import os
 import subprocess
 import re
+import shlex
+import threading
 import time
+import math
+import statistics
 import platform
 
 from enb.config import options
@@ -19,11 +23,41 @@ class InvocationError(Exception):
     pass
 
 
+# Characters that require invocations to be interpreted by a shell,
+# unless they are quoted (and not subject to expansion within double quotes)
+_shell_syntax_regex = re.compile(r"[|&;<>()$`*?\[\]{}~#\n]")
+_quoted_regex = re.compile(r"'[^']*'|\"[^\"\\$`]*\"")
+# Environment variable assignments before the command, e.g., VAR=value cmd
+_assignment_regex = re.compile(r"^\s*[A-Za-z_][A-Za-z0-9_]*=")
+
+
+def requires_shell(invocation):
+    """Return True if and only if the invocation string contains shell syntax,
+    e.g., pipes, redirections, variable assignments or expansions, or if it cannot
+    be split into arguments (e.g., due to unbalanced quotes), so that it cannot be run
+    by :func:`get_status_output_time_memory_direct`.
+    """
+    if _assignment_regex.match(invocation) \
+            or _shell_syntax_regex.search(_quoted_regex.sub("", invocation)):
+        return True
+    try:
+        shlex.split(invocation)
+    except ValueError:
+        return True
+    return False
+
+
 def get_status_output_time_memory(
-        invocation, expected_status_value=0, wall=None, timeout=None):
+        invocation, expected_status_value=0, wall=None, timeout=None,
+        max_output_bytes=None, output_path=None):
     """Run invocation, and return its status, output, and total (wall or
     user+system) time in seconds.
 
+    By default, invocations are run through a shell using /usr/bin/time
+    (or gtime in MacOS) to measure time and memory. If options.direct_invocation
+    is set, invocations that do not need a shell (e.g., they contain no pipes or
+    redirections) are run directly with :func:`get_status_output_time_memory_direct`.
+
     :param expected_status_value: if not None, status must be equal to this
       value or an InvocationError is raised.
     :param wall: if True, execution wall time is returned. If False,
@@ -31,9 +65,22 @@ def get_status_output_time_memory(
       of enb.config.options.report_wall_time is used.
     :param timeout: if not None and not 0, an exception is raised if the
       execution exceeds this value
+    :param max_output_bytes: if not None, only the last max_output_bytes bytes of
+      the output are returned. Direct invocations only keep those bytes in memory.
+    :param output_path: if not None, the output is written to this file
+      instead of being returned. Direct invocations write the output
+      to the file as it is produced.
 
     :return: status, output, time, used_memory_kb
     """
+    # pylint: disable=too-many-arguments
+    if options.direct_invocation and hasattr(os, "wait4") \
+            and (not isinstance(invocation, str) or not requires_shell(invocation)):
+        return get_status_output_time_memory_direct(
+            invocation=invocation, expected_status_value=expected_status_value,
+            wall=wall, timeout=timeout,
+            max_output_bytes=max_output_bytes, output_path=output_path)
+
     timeout = None if timeout == 0 else timeout
 
     if wall is None:
@@ -75,6 +122,16 @@ def get_status_output_time_memory(
     output_lines = output.splitlines()
     output = "\n".join(output_lines[:-1]
                        if not wall and len(output_lines) > 1 else output_lines)
+    if output_path is not None:
+        with open(output_path, "w") as output_file:
+            output_file.write(output)
+        output = ""
+    if max_output_bytes is not None:
+        output_data = output.encode("utf-8")
+        if len(output_data) > max_output_bytes:
+            output = output_data[len(output_data) - max_output_bytes:].decode(
+                "utf-8", errors="replace")
+            output = f"[{len(output_data) - max_output_bytes} bytes omitted]\n{output}"
 
     if expected_status_value is not None and status != expected_status_value:
         raise InvocationError(
@@ -98,6 +155,116 @@ def get_status_output_time_memory(
     return status, output, measured_time, measured_memory_kb
 
 
+def get_status_output_time_memory_direct(
+        invocation, expected_status_value=0, wall=None, timeout=None,
+        max_output_bytes=None, output_path=None):
+    """Run invocation without a shell and return its status, output, total (wall or
+    user+system) time in seconds and maximum resident memory in KB.
+
+    The invocation is split into arguments with :func:`shlex.split` (it can also be
+    a list of arguments), and the CPU time and memory are obtained from the resource
+    usage reported by the OS for the invoked process, so that no additional
+    processes are spawned. The standard output and error of the process are combined.
+    Same parameters and return value as :func:`get_status_output_time_memory`.
+
+    Note that the maximum resident memory reported by some OSs (e.g., Linux) for a
+    new process includes the memory of the process that started it. Therefore, the
+    returned memory is None unless it exceeds the maximum memory used so far by the
+    calling process.
+
+    :param max_output_bytes: if not None, only the last max_output_bytes bytes of
+      the output are kept in memory and returned.
+    :param output_path: if not None, the output is written to this file
+      instead of being kept in memory, and an empty output is returned.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    timeout = None if timeout == 0 else timeout
+    if wall is None:
+        wall = options.report_wall_time
+    try:
+        arguments = shlex.split(invocation) if isinstance(invocation, str) else list(invocation)
+    except ValueError as ex:
+        raise InvocationError(f"Cannot parse {repr(invocation)}: {repr(ex)}") from ex
+
+    # Not available in all platforms
+    import resource  # pylint: disable=import-outside-toplevel
+    caller_max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    output_file = open(output_path, "wb") if output_path is not None else None
+    wall_time_before = time.time()
+    try:
+        try:
+            process = subprocess.Popen(
+                arguments,
+                stdout=output_file if output_file is not None else subprocess.PIPE,
+                stderr=subprocess.STDOUT)
+        except OSError as ex:
+            raise InvocationError(f"Cannot execute {repr(invocation)}: {repr(ex)}") from ex
+
+        timeout_expired = threading.Event()
+
+        def kill_on_timeout():
+            timeout_expired.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill_on_timeout) if timeout is not None else None
+        if timer is not None:
+            timer.start()
+        try:
+            output_data = bytearray()
+            omitted_byte_count = 0
+            if process.stdout is not None:
+                for chunk in iter(lambda: process.stdout.read1(2 ** 16), b""):
+                    output_data += chunk
+                    if max_output_bytes is not None and len(output_data) > 2 * max_output_bytes:
+                        omitted_byte_count += len(output_data) - max_output_bytes
+                        del output_data[:len(output_data) - max_output_bytes]
+                process.stdout.close()
+            _, wait_status, resource_usage = os.wait4(process.pid, 0)
+        finally:
+            if timer is not None:
+                timer.cancel()
+    finally:
+        if output_file is not None:
+            output_file.close()
+    wall_time_after = time.time()
+
+    if os.WIFSIGNALED(wait_status):
+        status = -os.WTERMSIG(wait_status)
+    else:
+        status = os.WEXITSTATUS(wait_status)
+    # The process has already been waited for
+    process.returncode = status
+
+    if max_output_bytes is not None and len(output_data) > max_output_bytes:
+        omitted_byte_count += len(output_data) - max_output_bytes
+        del output_data[:len(output_data) - max_output_bytes]
+    output = output_data.decode("utf-8", errors="replace")
+    if omitted_byte_count:
+        output = f"[{omitted_byte_count} bytes omitted]\n{output}"
+    if timeout_expired.is_set():
+        output = output if output else f"Timeout exceeded ({timeout})"
+        status = -1
+
+    if expected_status_value is not None and status != expected_status_value:
+        raise InvocationError(
+            f"status={status} != {expected_status_value}.\nInput=[{invocation}].\nOutput=[{output}]")
+
+    if wall:
+        measured_time = wall_time_after - wall_time_before
+    else:
+        measured_time = resource_usage.ru_utime + resource_usage.ru_stime
+    # ru_maxrss is given in bytes in MacOS, and in KB elsewhere
+    if resource_usage.ru_maxrss <= caller_max_rss:
+        measured_memory_kb = None
+    elif "darwin" in platform.system().lower():
+        measured_memory_kb = resource_usage.ru_maxrss // 1024
+    else:
+        measured_memory_kb = resource_usage.ru_maxrss
+
+    return status, output, measured_time, measured_memory_kb
+
+
 def get_status_output_time(invocation, expected_status_value=0, wall=None,
                            timeout=None):
     """Run invocation, and return its status, output, and total (wall or
@@ -116,3 +283,39 @@ def get_status_output_time(invocation, expected_status_value=0, wall=None,
     return get_status_output_time_memory(
         invocation=invocation, expected_status_value=expected_status_value,
         wall=wall,timeout=timeout)[:3]
+
+
+def is_repetition_needed(measured_times, elapsed_seconds=None):
+    """Decide whether a time measurement needs to be repeated, given the times
+    measured so far.
+
+    At least options.repetitions measurements are always obtained. If
+    options.repetition_time_budget and/or options.repetition_target_rse are set,
+    the measurement is repeated (at most options.max_repetitions times) until
+    elapsed_seconds reaches the time budget, or the relative standard error
+    of the mean measured time is not larger than the target, whichever happens first.
+
+    :param measured_times: list of the times measured so far.
+    :param elapsed_seconds: total time spent so far obtaining the measurements.
+      If None, the sum of measured_times is used.
+
+    :return: True if and only if another measurement is needed.
+    """
+    count = len(measured_times)
+    if count < options.repetitions:
+        return True
+    time_budget = options.repetition_time_budget
+    target_rse = options.repetition_target_rse
+    if (time_budget is None and target_rse is None) or count >= options.max_repetitions:
+        return False
+
+    elapsed_seconds = elapsed_seconds if elapsed_seconds is not None \
+        else sum(measured_times)
+    if time_budget is not None and elapsed_seconds >= time_budget:
+        return False
+    if target_rse is not None and count > 1:
+        mean_time = statistics.mean(measured_times)
+        if mean_time <= 0 or statistics.stdev(measured_times) / math.sqrt(count) \
+                <= target_rse * mean_time:
+            return False
+    return True
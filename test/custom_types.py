@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""Custom types used in the tests. They are defined in an importable module
+so that their instances can be pickled even when test files are run as scripts.
+"""
+
+
+class CustomType:
+    """Custom class used in the tests of columns with object values.
+    """
+
+    def __init__(self, custom_prop):
+        self.custom_prop = custom_prop
+        self.other_prop = 2 * custom_prop
@@ -3,12 +3,16 @@
 import os
 import glob
 import pickle
+import shutil
 import unittest
 import string
+import tempfile
+import time
 import numpy as np
 
 import enb.atable
 import enb.atable as atable
+from custom_types import CustomType
 
 
 class Subclass(atable.ATable):
@@ -101,6 +105,62 @@ class TestATable(unittest.TestCase):
         assert (df["index_length"].values == range(df_length)).all(), \
             (df["index_length"].values)
 
+    def test_row_batches(self):
+        """Verify that rows are correctly computed in batches of fixed and adaptive size.
+        """
+        target_indices = ["a" * i for i in range(1, 50)]
+        original_row_batch_size = enb.config.options.row_batch_size
+        try:
+            for row_batch_size in [None, 1, 7, 100]:
+                enb.config.options.row_batch_size = row_batch_size
+                sc = Subclass(index="index")
+                df = sc.get_df(target_indices=target_indices)
+                assert list(df["index_length"]) == list(range(1, 50)), df["index_length"]
+                if row_batch_size:
+                    assert sc.get_row_batch_size(len(target_indices)) == row_batch_size
+                else:
+                    assert 1 <= sc.get_row_batch_size(len(target_indices)) <= len(target_indices)
+        finally:
+            enb.config.options.row_batch_size = original_row_batch_size
+
+    def test_new_columns_filled(self):
+        """Verify that columns defined after some rows were made persistent
+        are computed for those rows, and only for them.
+        """
+
+        class ExtendedSubclass(Subclass):
+            def column_double_length(self, index, row):
+                return 2 * row["index_length"]
+
+        with tempfile.NamedTemporaryFile(suffix=".csv") as tmp_file:
+            Subclass(index="index", csv_support_path=tmp_file.name).get_df(
+                target_indices=["a", "bb"])
+            df = ExtendedSubclass(index="index", csv_support_path=tmp_file.name).get_df(
+                target_indices=["a", "bb", "ccc"])
+            assert list(df["index_length"]) == [1, 2, 3], df
+            assert list(df["double_length"]) == [2, 4, 6], df
+
+    def test_internal_loc_memoization(self):
+        """Verify that memoized internal locs are consistent with canonical paths,
+        that canonical paths are not computed again for known values, and that
+        files created or removed after a loc is computed are taken into account.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_path = os.path.join(tmp_dir, "file.raw")
+            assert atable.indices_to_internal_loc((tmp_path, "task")) == str((tmp_path, "task"))
+            with open(tmp_path, "w") as tmp_file:
+                tmp_file.write("data")
+            expected_loc = str((atable.get_canonical_path(tmp_path), "task"))
+            assert atable.indices_to_internal_loc((tmp_path, "task")) == expected_loc
+            hits = atable._get_relative_path.cache_info().hits
+            for _ in range(10):
+                assert atable.indices_to_internal_loc((tmp_path, "task")) == expected_loc
+            assert atable._get_relative_path.cache_info().hits == hits + 10
+            os.remove(tmp_path)
+            assert atable.indices_to_internal_loc((tmp_path, "task")) == str((tmp_path, "task"))
+        assert atable.indices_to_internal_loc(["a", 1.0]) == str(("a", 1.0))
+        assert atable.indices_to_internal_loc(1) == str((1,))
+
     def test_column_definition_modes(self):
         """Test the different methods of adding columns to a table and verify that they work properly.
 
@@ -166,12 +226,6 @@ class TestSummaryTable(unittest.TestCase):
             assert summary_df.iloc[0]["group_size"] == len(target_paths)
 
 
-class CustomType:
-    def __init__(self, custom_prop):
-        self.custom_prop = custom_prop
-        self.other_prop = 2 * custom_prop
-
-
 class TestObjectColumns(unittest.TestCase):
     def test_object_values(self):
         df = TypesTable().get_df(target_indices=string.ascii_letters)
@@ -181,6 +235,275 @@ class TestObjectColumns(unittest.TestCase):
         assert np.all(df["custom_type_column"].apply(lambda ct: ct.other_prop) == 2)
 
 
+class TestPersistenceBackends(unittest.TestCase):
+    def test_journaled_persistence(self):
+        """Verify that the journaled backend appends new rows, compacts them
+        into the main CSV, and produces the same data as the regular CSV backend.
+        """
+        target_indices = list(string.ascii_letters)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "persistence.csv")
+            table = TypesTable(csv_support_path=csv_path)
+            table.persistence_mode = "journal"
+            table.persistence_backend.min_compaction_rows = 10
+            journal_path = table.persistence_backend.get_journal_path(csv_path)
+
+            table.get_df(target_indices=target_indices[:5], chunk_size=5)
+            assert os.path.exists(csv_path)
+            assert not os.path.exists(journal_path)
+            table.get_df(target_indices=target_indices[:10], chunk_size=1)
+            assert os.path.exists(journal_path)
+            assert len(enb.atable.pd.read_csv(journal_path)) == 5
+
+            df = table.get_df(target_indices=target_indices, chunk_size=1)
+            assert len(df) == len(target_indices)
+            assert list(df["uppercase"]) == [i.upper() for i in target_indices]
+            assert all(d["first"] == i for d, i in zip(df["first_last_dict"], target_indices))
+            assert all(ct.custom_prop == 1 for ct in df["custom_type_column"])
+
+            table.persistence_backend.compact(csv_path)
+            assert not os.path.exists(journal_path)
+            csv_table = TypesTable(csv_support_path=csv_path)
+            csv_table.persistence_mode = "csv"
+            csv_df = csv_table.get_df(target_indices=target_indices)
+            assert (csv_df["row_created"] == df["row_created"]).all()
+            assert list(csv_df["first_last_iterable"]) == list(df["first_last_iterable"])
+
+    def test_npz_persistence(self):
+        """Verify that the npz backend is selected by extension and that
+        it preserves scalar and non-scalar values.
+        """
+        target_indices = list(string.ascii_letters)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            npz_path = os.path.join(tmp_dir, "persistence.npz")
+            table = TypesTable(csv_support_path=npz_path)
+            assert table.persistence_backend.name == "npz"
+            df = table.get_df(target_indices=target_indices, chunk_size=10)
+            assert os.path.exists(npz_path)
+
+            loaded_df = TypesTable(csv_support_path=npz_path).get_df(
+                target_indices=target_indices, fill=False)
+            assert list(loaded_df["uppercase"]) == list(df["uppercase"])
+            assert list(loaded_df["first_last_iterable"]) == [(i, i) for i in target_indices]
+            assert list(loaded_df["first_last_dict"]) == list(df["first_last_dict"])
+            assert all(type(ct).__name__ == CustomType.__name__ and ct.other_prop == 2
+                       for ct in loaded_df["custom_type_column"])
+
+            index_table = Subclass(csv_support_path=npz_path.replace("persistence", "index"))
+            index_table.get_df(target_indices=["a" * i for i in range(1, 5)])
+            index_df = index_table.get_df(target_indices=["a" * i for i in range(1, 5)], fill=False)
+            assert index_df["index_length"].dtype.kind == "i", index_df["index_length"].dtype
+
+    def test_loaded_df_cache(self):
+        """Verify that persistence is read from disk only when it has been
+        modified by someone else.
+        """
+        target_indices = ["a" * i for i in range(1, 20)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "persistence.csv")
+            table = Subclass(csv_support_path=csv_path)
+            table.get_df(target_indices=target_indices, chunk_size=5)
+
+            read_paths = []
+            original_read = table.persistence_backend.read
+
+            def counting_read(path):
+                read_paths.append(path)
+                return original_read(path)
+
+            table.persistence_backend.read = counting_read
+            df = table.get_df(target_indices=target_indices, chunk_size=5)
+            assert not read_paths, read_paths
+            assert list(df["index_length"]) == list(range(1, 20))
+
+            other_table = Subclass(csv_support_path=csv_path)
+            other_table.get_df(target_indices=target_indices + ["b"], overwrite=True)
+            df = table.get_df(target_indices=target_indices + ["b"], fill=False)
+            assert read_paths == [csv_path], read_paths
+            assert df.loc[enb.atable.indices_to_internal_loc("b"), "index_length"] == 1
+
+    def test_cached_df_types(self):
+        """Verify that the types returned by get_df() do not depend on
+        whether persistence data are cached, also for non-scalar columns.
+        """
+        target_indices = list(string.ascii_letters[:10])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for extension in [".csv", ".npz"]:
+                csv_path = os.path.join(tmp_dir, f"persistence{extension}")
+                table = TypesTable(csv_support_path=csv_path)
+                table.get_df(target_indices=target_indices[:5])
+                table.get_df(target_indices=target_indices)
+                cached_df = table.get_df(target_indices=target_indices)
+                assert table.get_cached_df(csv_path) is not None
+                reread_df = TypesTable(csv_support_path=csv_path).get_df(
+                    target_indices=target_indices)
+                assert list(cached_df.dtypes) == list(reread_df.dtypes), \
+                    (cached_df.dtypes, reread_df.dtypes)
+                for column in cached_df.columns:
+                    assert list(cached_df[column].apply(lambda v: type(v).__name__)) \
+                           == list(reread_df[column].apply(lambda v: type(v).__name__)), column
+                    if column != "custom_type_column":
+                        assert list(cached_df[column]) == list(reread_df[column]), column
+
+    def test_streamed_persistence(self):
+        """Verify that completed rows are made persistent even if
+        other rows of the same chunk fail afterwards.
+        """
+        original_values = (enb.config.options.persistence_flush_period,
+                           enb.config.options.row_batch_size,
+                           enb.config.options.verbose)
+        try:
+            enb.config.options.persistence_flush_period = 0.01
+            enb.config.options.row_batch_size = 1
+            enb.config.options.verbose = -1
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                csv_path = os.path.join(tmp_dir, "persistence.csv")
+                table = SlowFailingTable(csv_support_path=csv_path, progress_report_period=0.05)
+                target_indices = [f"ok{i}" for i in range(10)] + ["fail"]
+                self.assertRaises(enb.atable.ColumnFailedError, table.get_df,
+                                  target_indices=target_indices)
+                df = enb.atable.pd.read_csv(csv_path)
+                assert sorted(df["index"]) == sorted(target_indices[:-1]), df
+        finally:
+            (enb.config.options.persistence_flush_period,
+             enb.config.options.row_batch_size,
+             enb.config.options.verbose) = original_values
+
+    def test_throttled_streamed_persistence(self):
+        """Verify that completed rows kept in memory because full rewrites are
+        throttled are made persistent when a later row fails.
+        """
+        original_values = (enb.config.options.persistence_flush_period,
+                           enb.config.options.row_batch_size,
+                           enb.config.options.verbose)
+        try:
+            enb.config.options.persistence_flush_period = 0.01
+            enb.config.options.row_batch_size = 1
+            enb.config.options.verbose = -1
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                csv_path = os.path.join(tmp_dir, "persistence.csv")
+                table = SlowFailingTable(csv_support_path=csv_path, progress_report_period=0.05)
+                # Only the first completed rows are written before the failure
+                table.flush_write_time_factor = 1e6
+                target_indices = [f"ok{i}" for i in range(10)] + ["fail"]
+                self.assertRaises(enb.atable.ColumnFailedError, table.get_df,
+                                  target_indices=target_indices, chunk_size=len(target_indices))
+                df = enb.atable.pd.read_csv(csv_path)
+                assert sorted(df["index"]) == sorted(target_indices[:-1]), df
+        finally:
+            (enb.config.options.persistence_flush_period,
+             enb.config.options.row_batch_size,
+             enb.config.options.verbose) = original_values
+
+    def test_streamed_journal_persistence(self):
+        """Verify that rows streamed into the journaled backend are appended
+        without rewriting the table, and that all rows are returned.
+        """
+        original_values = (enb.config.options.persistence_flush_period,
+                           enb.config.options.row_batch_size)
+        try:
+            enb.config.options.persistence_flush_period = 0.01
+            enb.config.options.row_batch_size = 1
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                csv_path = os.path.join(tmp_dir, "persistence.csv")
+                table = SlowTable(csv_support_path=csv_path, progress_report_period=0.02)
+                table.persistence_mode = "journal"
+                compacted_paths = []
+                original_write_compacted = table.persistence_backend.write_compacted
+
+                def counting_write_compacted(df, path):
+                    compacted_paths.append(path)
+                    return original_write_compacted(df=df, path=path)
+
+                table.persistence_backend.write_compacted = counting_write_compacted
+                target_indices = ["a" * i for i in range(1, 21)]
+                df = table.get_df(target_indices=target_indices,
+                                  chunk_size=len(target_indices))
+                assert list(df["index_length"]) == list(range(1, 21))
+                assert not compacted_paths, compacted_paths
+                assert os.path.exists(table.persistence_backend.get_journal_path(csv_path))
+                other_table = SlowTable(csv_support_path=csv_path)
+                other_table.persistence_mode = "journal"
+                df = other_table.get_df(target_indices=target_indices, fill=False)
+                assert list(df["index_length"]) == list(range(1, 21))
+        finally:
+            (enb.config.options.persistence_flush_period,
+             enb.config.options.row_batch_size) = original_values
+
+
+class TestDatasetIndex(unittest.TestCase):
+    def test_get_all_input_files(self):
+        """Verify that indexed dataset files are consistent with a recursive glob,
+        also after files and directories are added and removed, and when the
+        index is loaded from disk.
+        """
+
+        def get_expected_paths(base_dir, ext):
+            return sorted((enb.atable.get_canonical_path(p) for p in glob.glob(
+                os.path.join(base_dir, "**", f"*{ext}" if ext else "*"), recursive=True)
+                           if os.path.isfile(p)), key=str.lower)
+
+        def set_old_mtimes(base_dir):
+            for dir_path, _, _ in os.walk(base_dir):
+                os.utime(dir_path, (time.time() - 100, time.time() - 100))
+
+        original_index_path = enb.config.options.dataset_index_path
+        original_quick = enb.config.options.quick
+        try:
+            enb.config.options.quick = 0
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                base_dir = os.path.join(tmp_dir, "dataset")
+                for i in range(10):
+                    os.makedirs(os.path.join(base_dir, f"dir{i % 3}", f"Sub{i}"))
+                    for name in [f"file{i}.raw", f"file{i}.txt", f".hidden{i}.raw"]:
+                        with open(os.path.join(base_dir, f"dir{i % 3}", f"Sub{i}", name), "w") as f:
+                            f.write(name)
+                os.makedirs(os.path.join(base_dir, ".hidden_dir"))
+                with open(os.path.join(base_dir, ".hidden_dir", "file.raw"), "w") as f:
+                    f.write("hidden")
+                set_old_mtimes(base_dir)
+
+                enb.config.options.dataset_index_path = os.path.join(tmp_dir, "index.pickle")
+                for ext in [None, ".raw", ".r?w"]:
+                    assert enb.atable.get_all_input_files(ext, base_dir) \
+                           == get_expected_paths(base_dir, ext)
+                assert len(enb.atable.get_all_input_files(".raw", base_dir)) == 10
+                assert os.path.isfile(enb.config.options.dataset_index_path)
+                loaded_index = enb.atable.DatasetIndex(enb.config.options.dataset_index_path)
+                assert len(loaded_index.dir_entries) == 14
+
+                shutil.rmtree(os.path.join(base_dir, "dir0", "Sub3"))
+                with open(os.path.join(base_dir, "dir1", "Sub1", "new.raw"), "w") as f:
+                    f.write("new")
+                os.makedirs(os.path.join(base_dir, "dir2", "Sub2", "new_dir"))
+                with open(os.path.join(base_dir, "dir2", "Sub2", "new_dir", "a.raw"), "w") as f:
+                    f.write("new")
+                for index_path in [enb.config.options.dataset_index_path, None]:
+                    enb.config.options.dataset_index_path = index_path
+                    for ext in [None, ".raw"]:
+                        assert enb.atable.get_all_input_files(ext, base_dir) \
+                               == get_expected_paths(base_dir, ext)
+                    assert len(enb.atable.get_all_input_files(".raw", base_dir)) == 11
+        finally:
+            enb.config.options.dataset_index_path = original_index_path
+            enb.config.options.quick = original_quick
+
+
+class SlowFailingTable(enb.atable.ATable):
+    def column_result(self, index, row):
+        if index == "fail":
+            time.sleep(0.5)
+            raise ValueError("I am expected to crash - no worries!")
+        time.sleep(0.05)
+        return len(index)
+
+
+class SlowTable(enb.atable.ATable):
+    def column_index_length(self, index, row):
+        time.sleep(0.02)
+        return len(index)
+
+
 class TypesTable(enb.atable.ATable):
     @enb.atable.column_function(
         "uppercase",
@@ -4,7 +4,11 @@
 __author__ = "Miguel Hernández-Cabronero"
 __since__ = "2023/02/17"
 
+import itertools
+import os
+import tempfile
 import unittest
+
 import enb
 
 
@@ -49,5 +53,104 @@ class TestExperimentTask(unittest.TestCase):
         assert enb.experiment.ExperimentTask() != OtherTask()
 
 
+class PidExperiment(enb.experiment.Experiment):
+    def column_pid(self, index, row):
+        return os.getpid()
+
+
+class TestTaskGrouping(unittest.TestCase):
+    def test_group_tasks_by_file(self):
+        """Verify that all tasks of each file are computed in the same batch
+        when options.group_tasks_by_file is enabled.
+        """
+        original_group_tasks_by_file = enb.config.options.group_tasks_by_file
+        original_row_batch_size = enb.config.options.row_batch_size
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                paths = []
+                for i in range(5):
+                    paths.append(os.path.join(tmp_dir, f"file_{i}.raw"))
+                    with open(paths[-1], "wb") as output_file:
+                        output_file.write(bytes(i + 1))
+                tasks = [enb.experiment.ExperimentTask(dict(a=i)) for i in range(3)]
+                exp = PidExperiment(
+                    tasks=tasks, dataset_paths=paths,
+                    csv_experiment_path=os.path.join(tmp_dir, "exp_persistence.csv"),
+                    csv_dataset_path=os.path.join(tmp_dir, "dataset_persistence.csv"))
+                target_indices = list(itertools.product(sorted(paths), [t.name for t in tasks]))
+
+                enb.config.options.group_tasks_by_file = True
+                for batch_size in [1, 2, 3, 7, 100]:
+                    bounds = exp.get_row_batch_bounds(target_indices, batch_size)
+                    assert [i for start, end in bounds for i in range(start, end)] \
+                           == list(range(len(target_indices)))
+                    for start, end in bounds:
+                        assert (end - start) % len(tasks) == 0
+                        assert end - start <= max(batch_size, len(tasks))
+                enb.config.options.row_batch_size = 1
+                df = exp.get_df(chunk_size=4)
+                assert len(df) == len(target_indices)
+                assert (df.groupby("file_path")["pid"].nunique() == 1).all()
+
+                enb.config.options.group_tasks_by_file = False
+                assert exp.get_row_batch_bounds(target_indices, 2)[0] == (0, 2)
+        finally:
+            enb.config.options.group_tasks_by_file = original_group_tasks_by_file
+            enb.config.options.row_batch_size = original_row_batch_size
+
+
+class TestCostAwareScheduling(unittest.TestCase):
+    def test_row_costs(self):
+        """Verify that row costs are estimated from the file sizes when no results
+        are available, and from the stored results otherwise, and that
+        batch weights are proportional to those costs.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for i in range(4):
+                paths.append(os.path.join(tmp_dir, f"file_{i}.raw"))
+                with open(paths[-1], "wb") as output_file:
+                    output_file.write(bytes(100 * (i + 1)))
+            tasks = [enb.experiment.ExperimentTask(dict(a=i)) for i in range(2)]
+            exp = PidExperiment(
+                tasks=tasks, dataset_paths=paths,
+                csv_experiment_path=os.path.join(tmp_dir, "exp_persistence.csv"),
+                csv_dataset_path=os.path.join(tmp_dir, "dataset_persistence.csv"))
+            target_indices = list(itertools.product(
+                sorted(exp.target_file_paths), [t.name for t in tasks]))
+            target_locs = [enb.atable.indices_to_internal_loc(index)
+                           for index in target_indices]
+
+            costs = exp.get_row_costs(loaded_df=exp.load_saved_df(),
+                                      target_indices=target_indices,
+                                      target_locs=target_locs)
+            assert costs == [100 * (i // 2 + 1) for i in range(len(target_indices))], costs
+            batch_bounds = [(0, 2), (2, 6), (6, 8)]
+            weights = exp.get_batch_weights(
+                loaded_df=exp.load_saved_df(), target_indices=target_indices,
+                target_locs=target_locs, batch_bounds=batch_bounds)
+            assert abs(sum(weights) - len(target_indices)) < 1e-6
+            assert weights[0] < weights[2] < weights[1]
+
+            df = exp.get_df()
+            assert len(df) == len(target_indices)
+            loaded_df = exp.load_saved_df()
+            loaded_df[exp.task_apply_time_column] = \
+                [float(i) for i in range(len(loaded_df))]
+            costs = exp.get_row_costs(loaded_df=loaded_df,
+                                      target_indices=target_indices,
+                                      target_locs=target_locs)
+            assert costs == [loaded_df.loc[loc, exp.task_apply_time_column]
+                             for loc in target_locs]
+
+            # Tasks without stored results use the average cost per byte
+            new_index = (target_indices[0][0], "new_task")
+            cost_per_byte = sum(loaded_df[exp.task_apply_time_column]) / (2 * 1000)
+            new_cost = exp.get_row_costs(
+                loaded_df=loaded_df, target_indices=[new_index],
+                target_locs=[enb.atable.indices_to_internal_loc(new_index)])[0]
+            assert abs(new_cost - 100 * cost_per_byte) < 1e-6, (new_cost, cost_per_byte)
+
+
 if __name__ == '__main__':
     unittest.main()
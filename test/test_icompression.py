@@ -10,6 +10,7 @@ import os
 import sys
 import numpy as np
 import shutil
+import zlib
 
 import enb.icompression
 import test_all
@@ -93,6 +94,184 @@ class TestIcompression(unittest.TestCase):
                                 assert (np.abs(df["mse"] - error ** 2) < (2 * sys.float_info.epsilon)).all(), \
                                     (df["mse"], abs(error))
 
+    def test_distortion_metrics(self):
+        """Verify that block-wise distortion metrics match those computed
+        on the whole arrays, for any block size.
+        """
+        component_count = 3
+        generator = np.random.default_rng(0)
+        original = generator.integers(0, 2 ** 16, size=component_count * 1000, dtype=np.uint16)
+        reconstructed = generator.integers(0, 2 ** 16, size=original.size, dtype=np.uint16)
+        error = original.astype(np.int64) - reconstructed
+        values, counts = np.unique(error, return_counts=True)
+        for block_samples in [7, 1000, 2 ** 20]:
+            metrics = icompression.get_distortion_metrics(
+                original_array=original, reconstructed_array=reconstructed,
+                component_count=component_count, block_samples=block_samples,
+                error_histogram=True)
+            assert metrics.pae == np.max(np.abs(error))
+            assert np.isclose(metrics.mse, np.mean(error.astype(np.float64) ** 2))
+            assert np.allclose(metrics.band_mse, np.mean(
+                error.reshape((component_count, -1)).astype(np.float64) ** 2, axis=1))
+            assert metrics.error_histogram == dict(zip(values.tolist(), counts.tolist()))
+        assert metrics.psnr(max_error=2 ** 16 - 1) < float("inf")
+        assert icompression.get_distortion_metrics(
+            original_array=original, reconstructed_array=reconstructed,
+            component_count=component_count).error_histogram is None
+
+    def test_shared_arrays(self):
+        """Verify that original and reconstructed arrays, and their distortion
+        metrics, are obtained at most once per row, and that they can be released.
+        """
+        array = np.full((5, 3, 2), fill_value=7, dtype=">u2")
+        image_info_row = dict(width=5, height=3, component_count=2, float=False,
+                              signed=False, big_endian=True, bytes_per_sample=2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_path = os.path.join(tmp_dir, "img.raw")
+            isets.dump_array_bsq(array=array, file_or_path=tmp_path)
+            wrapper = icompression.CompressionExperiment.CompressionDecompressionWrapper(
+                file_path=tmp_path, codec=ConstantOutputCodec(reconstruct_value=9),
+                image_info_row=image_info_row)
+            assert wrapper.original_array is wrapper.original_array
+            assert wrapper.reconstructed_array is wrapper.reconstructed_array
+            metrics = wrapper.distortion_metrics
+            assert metrics is wrapper.distortion_metrics
+            assert metrics.pae == 2 and metrics.mse == 4
+            assert metrics.error_histogram is None
+            wrapper.release_arrays()
+            assert wrapper._original_array is None and wrapper._reconstructed_array is None
+            assert wrapper._distortion_metrics is None
+            del wrapper
+
+
+class TestLosslessVerification(unittest.TestCase):
+    def test_digest_verification(self):
+        """Verify that lossless reconstruction is detected using stored digests,
+        and that outdated or missing digests fall back to byte-by-byte comparison.
+        """
+        array = np.arange(5 * 3 * 2, dtype=">u2").reshape((5, 3, 2))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_path = os.path.join(tmp_dir, "img.raw")
+            isets.dump_array_bsq(array=array, file_or_path=tmp_path)
+            digest, size_bytes = enb.sets.get_file_digest(tmp_path)
+            assert size_bytes == os.path.getsize(tmp_path)
+            for stored_digest in [digest, "0" * len(digest), None]:
+                image_info_row = dict(width=5, height=3, component_count=2, float=False,
+                                      signed=False, big_endian=True, bytes_per_sample=2,
+                                      size_bytes=size_bytes)
+                image_info_row[enb.sets.HASH_ALGORITHM] = stored_digest
+                for codec, lossless in [(trivial_codecs.TrivialLosslessCodec(), True),
+                                        (ConstantOutputCodec(reconstruct_value=1), False)]:
+                    wrapper = icompression.CompressionExperiment.CompressionDecompressionWrapper(
+                        file_path=tmp_path, codec=codec, image_info_row=image_info_row)
+                    assert wrapper.is_lossless() == lossless
+                    assert wrapper.compressed_digest[1] == os.path.getsize(
+                        wrapper.compression_results.compressed_path)
+                    del wrapper
+
+
+class InMemoryZlibCodec(icompression.LosslessCodec):
+    """Codec that only implements the in-memory interface.
+    """
+
+    def compress_bytes(self, original_data, original_file_info=None):
+        return zlib.compress(original_data)
+
+    def decompress_bytes(self, compressed_data, original_file_info=None):
+        return zlib.decompress(compressed_data)
+
+
+class TestInMemoryCodec(unittest.TestCase):
+    def test_in_memory_codec(self):
+        """Verify that codecs implementing only the in-memory interface
+        can be used both in experiments and with file paths.
+        """
+        codec = InMemoryZlibCodec()
+        assert codec.in_memory_supported
+        assert not ConstantOutputCodec(reconstruct_value=0).in_memory_supported
+
+        array = np.arange(5 * 3 * 2, dtype=">u2").reshape((5, 3, 2))
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                tempfile.TemporaryDirectory() as persistence_dir:
+            tmp_path = os.path.join(tmp_dir, "img-2x3x5_u16be.raw")
+            isets.dump_array_bsq(array=array, file_or_path=tmp_path)
+
+            codec.compress(tmp_path, os.path.join(tmp_dir, "compressed.zlib"))
+            codec.decompress(os.path.join(tmp_dir, "compressed.zlib"),
+                             os.path.join(tmp_dir, "reconstructed.raw"))
+            with open(tmp_path, "rb") as original_file, \
+                    open(os.path.join(tmp_dir, "reconstructed.raw"), "rb") as reconstructed_file:
+                assert original_file.read() == reconstructed_file.read()
+
+            options.persistence_dir = persistence_dir
+            df = icompression.LossyCompressionExperiment(
+                codecs=[codec], dataset_paths=[tmp_path]).get_df()
+            assert (df["lossless_reconstruction"] == True).all()
+            assert (df["mse"] == 0).all()
+            assert (df["compressed_size_bytes"] == len(zlib.compress(array.swapaxes(0, 2).tobytes()))).all()
+
+
+class TestAdaptiveRepetitions(unittest.TestCase):
+    def test_adaptive_repetitions(self):
+        """Verify that time measurements are repeated until the time budget is spent
+        or the target relative standard error is reached, and that the obtained
+        statistics are stored.
+        """
+        original_values = (options.repetitions, options.repetition_time_budget,
+                           options.repetition_target_rse, options.max_repetitions)
+        try:
+            options.repetitions = 2
+            options.repetition_time_budget = None
+            options.repetition_target_rse = None
+            options.max_repetitions = 10
+            assert enb.tcall.is_repetition_needed([1])
+            assert not enb.tcall.is_repetition_needed([1, 1])
+
+            options.repetition_time_budget = 3
+            assert enb.tcall.is_repetition_needed([1, 1])
+            assert not enb.tcall.is_repetition_needed([1, 1, 1])
+            assert not enb.tcall.is_repetition_needed([1, 1], elapsed_seconds=3)
+            assert not enb.tcall.is_repetition_needed([0.01] * 10)
+
+            options.repetition_time_budget = None
+            options.repetition_target_rse = 0.01
+            assert not enb.tcall.is_repetition_needed([1, 1])
+            assert enb.tcall.is_repetition_needed([1, 2])
+            assert not enb.tcall.is_repetition_needed([1, 2] * 5)
+
+            options.repetitions = 1
+            options.repetition_target_rse = None
+            options.repetition_time_budget = 1e-9
+            options.max_repetitions = 3
+            array = np.arange(5 * 3 * 2, dtype=">u2").reshape((5, 3, 2))
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                tmp_path = os.path.join(tmp_dir, "img-2x3x5_u16be.raw")
+                isets.dump_array_bsq(array=array, file_or_path=tmp_path)
+                wrapper = icompression.CompressionExperiment.CompressionDecompressionWrapper(
+                    file_path=tmp_path, codec=trivial_codecs.TrivialLosslessCodec(),
+                    image_info_row=dict(width=5, height=3, component_count=2,
+                                        float=False, signed=False, big_endian=True,
+                                        bytes_per_sample=2))
+                assert wrapper.is_lossless()
+                assert len(wrapper.compression_time_measurements) == 1
+                assert len(wrapper.decompression_time_measurements) == 1
+                del wrapper
+
+                options.repetition_time_budget = 3600
+                with tempfile.TemporaryDirectory() as persistence_dir:
+                    options.persistence_dir = persistence_dir
+                    df = icompression.LosslessCompressionExperiment(
+                        codecs=[trivial_codecs.TrivialLosslessCodec()],
+                        dataset_paths=[tmp_path]).get_df()
+                assert (df["compression_repetitions"] == 3).all()
+                assert (df["decompression_repetitions"] == 3).all()
+                assert (df["compression_time_median_seconds"]
+                        >= df["compression_time_seconds"]).all()
+                assert (df["decompression_time_stddev_seconds"] >= 0).all()
+        finally:
+            options.repetitions, options.repetition_time_budget, \
+                options.repetition_target_rse, options.max_repetitions = original_values
+
 
 class TestGeneralLosslessExperiment(unittest.TestCase):
 
@@ -124,6 +303,12 @@ class TestGeneralLosslessExperiment(unittest.TestCase):
             assert (df["lossless_reconstruction"] == True).all()
 
 
+class SpectralAngleListTable(icompression.SpectralAngleTable):
+    @enb.atable.column_function("spectral_angles", has_iterable_values=True)
+    def set_spectral_angles(self, index, row):
+        row["spectral_angles"] = self.get_spectral_angles_deg(index=index, row=row)
+
+
 class TestSpectralAngle(unittest.TestCase):
     def get_expected_angles_deg(self, img_a, img_b):
         """Manually obtain the vector angles in degrees"""
@@ -166,7 +351,7 @@ class TestSpectralAngle(unittest.TestCase):
             with tempfile.TemporaryDirectory() as tmp_dir:
                 with tempfile.NamedTemporaryFile(suffix="-" + tag + ".raw", dir=tmp_dir) as tmp_file:
                     isets.dump_array_bsq(original_array, tmp_file.name)
-                    sa_exp = icompression.SpectralAngleTable(
+                    sa_exp = SpectralAngleListTable(
                         codecs=[trivial_codecs.OffsetLossyCodec(constant_offset)],
                         dataset_paths=[tmp_file.name],
                         csv_experiment_path=os.path.join(tmp_dir, "exp_persistence.csv"),
@@ -181,6 +366,138 @@ class TestSpectralAngle(unittest.TestCase):
 
                     assert abs_diff_average_sa < 1e-5, f"Wrong mean spectral angle (diff={abs_diff_average_sa})"
                     assert abs_diff_max_sa < 1e-5, f"Wrong maximum spectral angle (diff={abs_diff_max_sa})"
+                    assert abs(df.iloc[0]["p50_spectral_angle_deg"] - np.median(expected_angles)) \
+                           <= 0.0025 * np.median(expected_angles)
+                    assert np.allclose(df.iloc[0]["spectral_angles"], expected_angles, atol=1e-5)
+
+    def test_chunked_spectral_angles(self):
+        """Verify that spectral angles do not depend on the block size,
+        and that they can be streamed to a file.
+        """
+        generator = np.random.default_rng(0)
+        width, height, component_count = 7, 5, 3
+        original_array = generator.integers(0, 1000, size=(width, height, component_count)).astype(">u2")
+        reconstructed_array = original_array + generator.integers(0, 10, size=original_array.shape).astype(">u2")
+        expected_angles = np.array(self.get_expected_angles_deg(original_array, reconstructed_array))
+        # Expected angles are in column-major order
+        expected_angles = expected_angles.reshape((width, height)).T.flatten()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for block_pixels in [1, 4, width * height]:
+                output_path = os.path.join(tmp_dir, f"angles_{block_pixels}.f64")
+                angles = icompression.compute_spectral_angles_deg(
+                    original_array=original_array.swapaxes(0, 2).flatten(),
+                    reconstructed_array=reconstructed_array.swapaxes(0, 2).flatten(),
+                    component_count=component_count,
+                    block_pixels=block_pixels, output_path=output_path)
+                assert np.allclose(angles, expected_angles, atol=1e-5)
+                assert (np.fromfile(output_path, dtype="<f8") == angles).all()
+
+        stats = icompression.get_spectral_angle_stats(angles)
+        assert stats["max"] == angles.max() and stats["mean"] == angles.mean()
+        assert stats["p50"] == np.median(angles)
+
+    def test_spectral_angle_stats(self):
+        """Verify that block-wise spectral angle statistics are consistent with
+        those of the full array of angles, and that percentiles are accurately estimated.
+        """
+        generator = np.random.default_rng(1)
+        component_count, pixel_count = 4, 10000
+        original_array = generator.integers(1, 1000, size=component_count * pixel_count).astype("u2")
+        reconstructed_array = original_array.copy()
+        changed = generator.random(original_array.size) < 0.5
+        reconstructed_array[changed] += generator.integers(
+            0, 100, size=changed.sum()).astype("u2")
+        angles = icompression.compute_spectral_angles_deg(
+            original_array=original_array, reconstructed_array=reconstructed_array,
+            component_count=component_count)
+        expected_stats = icompression.get_spectral_angle_stats(angles, percentiles=(0, 50, 90, 99, 100))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, "angles.f64")
+            stats = icompression.compute_spectral_angle_stats(
+                original_array=original_array, reconstructed_array=reconstructed_array,
+                component_count=component_count, percentiles=(0, 50, 90, 99, 100),
+                block_pixels=1000, output_path=output_path)
+            assert (np.fromfile(output_path, dtype="<f8") == angles).all()
+        assert abs(stats["mean"] - expected_stats["mean"]) < 1e-10
+        assert stats["max"] == expected_stats["max"]
+        for key in ["p0", "p50", "p90", "p99", "p100"]:
+            assert abs(stats[key] - expected_stats[key]) <= 0.0025 * expected_stats[key], \
+                (key, stats[key], expected_stats[key])
+
+    def test_spectral_angle_dump_paths(self):
+        """Verify that per-pixel spectral angles are dumped separately for
+        dataset files with the same name in different dirs.
+        """
+        width, height, component_count = 3, 2, 4
+        tag = isets.iproperties_to_name_tag(
+            width=width, height=height, component_count=component_count,
+            big_endian=True, bytes_per_sample=2, signed=False)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dataset_dir = os.path.join(tmp_dir, "dataset")
+            for i, corpus in enumerate(["a", "b"]):
+                os.makedirs(os.path.join(dataset_dir, corpus))
+                isets.dump_array_bsq(
+                    np.full((width, height, component_count), 100 * (i + 1), dtype=">u2"),
+                    os.path.join(dataset_dir, corpus, f"img-{tag}.raw"))
+            original_base_dataset_dir, original_quick = options.base_dataset_dir, options.quick
+            try:
+                options.base_dataset_dir, options.quick = dataset_dir, 0
+                exp = icompression.SpectralAngleTable(
+                    codecs=[trivial_codecs.OffsetLossyCodec(5)],
+                    csv_experiment_path=os.path.join(tmp_dir, "exp_persistence.csv"),
+                    csv_dataset_path=os.path.join(tmp_dir, "dataset_persistence.csv"))
+                exp.spectral_angle_dump_dir = os.path.join(tmp_dir, "angles")
+                df = exp.get_df()
+            finally:
+                options.base_dataset_dir, options.quick = original_base_dataset_dir, original_quick
+            assert len(df) == 2
+            task_name = list(exp.codecs)[0].name
+            for corpus in ["a", "b"]:
+                dump_path = os.path.join(tmp_dir, "angles", task_name, corpus,
+                                         f"img-{tag}.raw.spectral_angles_f64le")
+                assert os.path.getsize(dump_path) == 8 * width * height, dump_path
+
+
+class TestStructuralSimilarity(unittest.TestCase):
+    def get_reference_ssim(self, img1, img2, max_val=255, filter_size=11, filter_sigma=1.5, k1=0.01, k2=0.03):
+        """Reference SSIM implementation based on 3D FFT convolution.
+        """
+        from scipy import signal
+        img1, img2 = img1.astype(np.float64), img2.astype(np.float64)
+        size = min(filter_size, img1.shape[0], img1.shape[1])
+        sigma = size * filter_sigma / filter_size
+        x, y = np.mgrid[-(size // 2):size // 2 + 1, -(size // 2):size // 2 + 1]
+        window = np.exp(-((x ** 2 + y ** 2) / (2.0 * sigma ** 2)))
+        window = (window / window.sum()).reshape((size, size, 1))
+        mu1 = signal.fftconvolve(img1, window, mode='valid')
+        mu2 = signal.fftconvolve(img2, window, mode='valid')
+        sigma11 = signal.fftconvolve(img1 * img1, window, mode='valid') - mu1 * mu1
+        sigma22 = signal.fftconvolve(img2 * img2, window, mode='valid') - mu2 * mu2
+        sigma12 = signal.fftconvolve(img1 * img2, window, mode='valid') - mu1 * mu2
+        c1, c2 = (k1 * max_val) ** 2, (k2 * max_val) ** 2
+        return np.mean(((2 * mu1 * mu2 + c1) * (2 * sigma12 + c2))
+                       / ((mu1 * mu1 + mu2 * mu2 + c1) * (sigma11 + sigma22 + c2)))
+
+    def test_ssim(self):
+        """Verify that the separable, tiled SSIM matches the reference implementation,
+        both in float64 and float32.
+        """
+        generator = np.random.default_rng(0)
+        for shape in [(64, 48, 3), (9, 20, 1)]:
+            img1 = generator.integers(0, 256, size=shape).astype(np.uint8)
+            img2 = np.clip(img1 + generator.integers(-20, 20, size=shape), 0, 255).astype(np.uint8)
+            expected_ssim = self.get_reference_ssim(img1, img2)
+            for tile_samples in [1, 100, 2 ** 20]:
+                assert abs(icompression.compute_ssim(img1, img2, tile_samples=tile_samples)
+                           - expected_ssim) < 1e-10
+            assert abs(icompression.compute_ssim(img1, img2, dtype=np.float32) - expected_ssim) < 1e-5
+            assert abs(icompression.compute_ssim(img1, img1) - 1) < 1e-10
+
+        ms_ssim = icompression.compute_ms_ssim(img1, img2)
+        assert 0 < ms_ssim < 1
+        assert abs(icompression.compute_ms_ssim(img1, img2, dtype=np.float32) - ms_ssim) < 1e-5
+
 
 class TestQuantizationWrapperCodec(unittest.TestCase):
     def test_pae(self):
@@ -6,10 +6,14 @@ __since__ = "2020/04/07"
 
 import unittest
 import tempfile
+import collections
+import hashlib
+import math
 import os
 import numpy as np
 
 import test_all
+import enb
 from enb import isets
 
 
@@ -74,5 +78,118 @@ class TestiSets(unittest.TestCase):
                 pass
 
 
+class TestInformationMetrics(unittest.TestCase):
+    def test_information_metrics(self):
+        """Verify the entropy, mutual information and KL divergence functions
+        against direct computations based on the probability of each value.
+        """
+        def get_probabilities(values):
+            return {k: v / len(values) for k, v in collections.Counter(values).items()}
+
+        def get_entropy(values):
+            return -sum(p * math.log2(p) for p in get_probabilities(values).values())
+
+        rng = np.random.default_rng(0)
+        for data1, data2 in [
+            (rng.integers(0, 256, 5000).astype(np.uint8),
+             rng.integers(0, 100, 5000).astype(np.uint8)),
+            (rng.integers(-40000, 40000, (50, 40, 3)).astype(">i4"),
+             rng.integers(0, 60000, (50, 40, 3)).astype(">u2")),
+            (rng.integers(0, 2 ** 63, 1000, dtype=np.uint64),
+             rng.integers(-5, 5, 1000).astype(np.int64)),
+            (rng.normal(size=3000).round(1), rng.normal(size=3000).round(2))]:
+            values1 = data1.flatten().tolist()
+            values2 = data2.flatten().tolist()
+
+            values, counts = isets.get_value_counts(data1)
+            assert (values == np.unique(data1)).all()
+            assert dict(zip(values.tolist(), counts.tolist())) \
+                   == collections.Counter(values1)
+            assert abs(isets.entropy(data1) - get_entropy(values1)) < 1e-10
+
+            expected_mi = get_entropy(values1) + get_entropy(values2) \
+                          - get_entropy(list(zip(values1, values2)))
+            assert abs(isets.mutual_information(data1, data2) - expected_mi) < 1e-10
+            assert abs(isets.mutual_information(data1, data1) - get_entropy(values1)) < 1e-10
+
+            probabilities1 = get_probabilities(values1)
+            probabilities2 = get_probabilities(values2)
+            common = set(probabilities1) & set(probabilities2)
+            kl_pq, kl_qp = isets.kl_divergence(data1, data2)
+            assert abs(kl_pq - sum(probabilities1[k] * math.log(probabilities1[k] / probabilities2[k])
+                                   for k in common)) < 1e-10
+            assert abs(kl_qp - sum(probabilities2[k] * math.log(probabilities2[k] / probabilities1[k])
+                                   for k in common)) < 1e-10
+
+
+class TestFileStatistics(unittest.TestCase):
+    def test_file_statistics(self):
+        """Verify that the single-pass file statistics are consistent with
+        the direct computation of the hash, extrema and entropy of the data, and
+        that they are used by ImagePropertiesTable.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for dtype, tag in [(">u1", "u8be"), (">u2", "u16be"), ("<i2", "s16le"),
+                               (">i4", "s32be"), ("f4", "f32")]:
+                array = (np.arange(4 * 5 * 3) * 37 % 101 - 50 * (dtype[-2] in "if")
+                         ).astype(dtype)
+                paths.append(os.path.join(tmp_dir, f"img_{tag}-3x5x4.raw"))
+                array.tofile(paths[-1])
+
+                with open(paths[-1], "rb") as input_file:
+                    contents = input_file.read()
+                file_statistics = isets.get_file_statistics(paths[-1], chunk_size=8)
+                assert file_statistics.digest == hashlib.sha256(contents).hexdigest()
+                assert file_statistics.size_bytes == len(contents)
+                for bytes_per_sample in (1, 2):
+                    assert abs(file_statistics.get_entropy(bytes_per_sample)
+                               - isets.entropy(np.frombuffer(
+                                contents, dtype=f"u{bytes_per_sample}"))) < 1e-10
+                if array.itemsize <= 2:
+                    assert file_statistics.get_extrema(dtype) == (array.min(), array.max())
+
+            table = isets.ImagePropertiesTable(
+                csv_support_path=os.path.join(tmp_dir, "persistence.csv"),
+                base_dir=tmp_dir)
+            df = table.get_df(target_indices=paths)
+            for path in paths:
+                row = df.loc[enb.atable.indices_to_internal_loc(path)]
+                array = np.fromfile(path, dtype=row["dtype"])
+                assert row["sample_min"] == array.min()
+                assert row["sample_max"] == array.max()
+                assert row["entropy_2B_bps"] == (
+                    isets.get_file_statistics(path).get_entropy(2)
+                    if row["bytes_per_sample"] % 2 == 0 else -1)
+                with open(path, "rb") as input_file:
+                    assert row[enb.sets.HASH_ALGORITHM] == \
+                           hashlib.sha256(input_file.read()).hexdigest()
+
+
+class TestChunkedReads(unittest.TestCase):
+    def test_chunked_reads(self):
+        """Verify that files are consistently processed in chunks of bounded size.
+        """
+        original_io_buffer_size = enb.config.options.io_buffer_size
+        try:
+            enb.config.options.io_buffer_size = 12
+            assert enb.config.options.io_buffer_size == 8
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "data.raw")
+                for dtype in [">u2", "<i4", ">f4", "<f8"]:
+                    array = (np.arange(101) * 37 % 53 - 20).astype(dtype)
+                    array.tofile(path)
+                    chunks = list(enb.sets.iter_file_chunks(path))
+                    assert all(len(chunk) == 8 for chunk in chunks[:-1])
+                    assert b"".join(chunks) == array.tobytes()
+                    assert enb.sets.get_file_digest(path) == (
+                        hashlib.sha256(array.tobytes()).hexdigest(), array.nbytes)
+                    for chunk_size in [None, 1, 13, 10 ** 6]:
+                        assert isets.get_file_extrema(path, dtype, chunk_size=chunk_size) \
+                               == (array.min(), array.max())
+        finally:
+            enb.config.options.io_buffer_size = original_io_buffer_size
+
+
 if __name__ == '__main__':
     unittest.main()
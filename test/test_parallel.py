@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Unit tests for the enb.parallel module.
+"""
+
+import collections
+import os
+import time
+import unittest
+
+import dill
+
+import enb
+
+
+@enb.parallel.parallel()
+def get_shared_value(shared_dict, key):
+    return shared_dict.get()[key]
+
+
+class TestSharedObjects(unittest.TestCase):
+    def test_share(self):
+        """Verify that shared objects are available to parallel calls,
+        both for workers started after (first iteration) and before (second
+        iteration) sharing them.
+        """
+        enb.parallel.init()
+        for _ in range(2):
+            shared_dict = enb.parallel.share({i: str(i) for i in range(100)})
+            try:
+                ids = [get_shared_value.start(shared_dict, i) for i in range(100)]
+                results = enb.parallel.get(ids)
+            finally:
+                shared_dict.release()
+            assert results == [str(i) for i in range(100)], results
+        self.assertRaises(KeyError, shared_dict.get)
+
+
+@enb.parallel.parallel()
+def get_option_value(name):
+    return getattr(enb.config.options, name)
+
+
+@enb.parallel.parallel()
+def get_shared_object_id(shared_object):
+    return os.getpid(), id(shared_object.get()), len(shared_object.get())
+
+
+class TestLateSharedObjects(unittest.TestCase):
+    def test_share_after_pool_creation(self):
+        """Verify that objects shared after the workers are created are not
+        sent with each parallel call, and that each worker deserializes them only once.
+        """
+        original_persistent_pool = enb.config.options.persistent_pool
+        try:
+            enb.config.options.persistent_pool = True
+            enb.parallel.init()
+            enb.parallel.get([get_option_value.start("quick")])
+            for _ in range(2):
+                shared_object = enb.parallel.share(list(range(100000)))
+                try:
+                    ids = [get_shared_object_id.start(shared_object) for _ in range(20)]
+                    results = enb.parallel.get(ids)
+                    assert len(dill.dumps(shared_object)) < 1000
+                    assert os.path.isfile(shared_object.payload_path)
+                finally:
+                    payload_path = shared_object.payload_path
+                    shared_object.release()
+                assert not os.path.exists(payload_path)
+                assert all(length == 100000 for _, _, length in results)
+                pid_to_object_ids = collections.defaultdict(set)
+                for pid, object_id, _ in results:
+                    pid_to_object_ids[pid].add(object_id)
+                assert all(len(object_ids) == 1 for object_ids in pid_to_object_ids.values())
+        finally:
+            enb.config.options.persistent_pool = original_persistent_pool
+            enb.parallel.init()
+
+
+class TestPersistentPool(unittest.TestCase):
+    def test_push_options(self):
+        """Verify that the pool is kept alive across init calls in persistent mode,
+        and that updated options reach its workers.
+        """
+        original_persistent_pool = enb.config.options.persistent_pool
+        original_quick = enb.config.options.quick
+        try:
+            enb.config.options.persistent_pool = True
+            enb.parallel.init()
+            pool = None
+            for quick in [0, 3, 5, 0]:
+                enb.config.options.quick = quick
+                enb.parallel.init()
+                ids = [get_option_value.start("quick") for _ in range(20)]
+                assert enb.parallel.get(ids) == [quick] * 20
+                assert pool is None or pool is enb.parallel.FallbackFuture.pathos_pool
+                pool = enb.parallel.FallbackFuture.pathos_pool
+        finally:
+            enb.config.options.persistent_pool = original_persistent_pool
+            enb.config.options.quick = original_quick
+            enb.parallel.init()
+
+
+@enb.parallel.parallel()
+def sleep_and_return(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestProgressiveGetter(unittest.TestCase):
+    def test_progressive_getter(self):
+        """Verify that completed tasks are progressively detected,
+        and that their weights are accounted for.
+        """
+        enb.parallel.init()
+        sleep_times = [0.01] * 10 + [0.5]
+        ids = [sleep_and_return.start(s) for s in sleep_times]
+        pg = enb.parallel.ProgressiveGetter(
+            id_list=ids, weight_list=[1] * 10 + [100], iteration_period=0.2)
+        for _ in pg:
+            assert len(pg.completed_ids) < len(ids)
+            assert pg.completed_weight == len(pg.completed_ids)
+        assert not pg.pending_ids
+        assert set(pg.completed_ids) == set(ids)
+        assert pg.completed_weight == 110
+        assert enb.parallel.get(ids, timeout=0) == sleep_times
+        assert "completed all" in pg.report()
+
+
+if __name__ == '__main__':
+    unittest.main()
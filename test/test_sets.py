@@ -122,5 +122,96 @@ class TestSets(unittest.TestCase):
                         f"{joint_df[joint_df[column] != joint_df[version_column]][[column, version_column]].iloc[0]}"
 
 
+class TestPropertiesCache(unittest.TestCase):
+    def test_properties_cache(self):
+        """Verify that file properties are reused across tables with different
+        persistence through the shared cache while files are not modified,
+        and that least recently used entries are evicted.
+        """
+        original_path = options.properties_cache_path
+        original_max_entries = options.properties_cache_max_entries
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                options.properties_cache_path = os.path.join(tmp_dir, "cache", "properties.db")
+                paths = []
+                for i in range(3):
+                    paths.append(os.path.join(tmp_dir, f"img_u8be-1x2x{5 + i}.raw"))
+                    np.arange(5 + i, 15 + 3 * i, dtype=np.uint8).tofile(paths[-1])
+
+                def get_df(name):
+                    return enb.isets.ImagePropertiesTable(
+                        csv_support_path=os.path.join(tmp_dir, f"{name}.csv"),
+                        base_dir=tmp_dir).get_df(target_indices=paths)
+
+                df = get_df("project1")
+                cache = sets.PropertiesCache.get_instance()
+                assert len(cache) == len(paths)
+
+                # Contents are modified without updating size or modification time,
+                # so that cached values are employed in a different project
+                file_stat = os.stat(paths[0])
+                with open(paths[0], "r+b") as output_file:
+                    output_file.write(bytes([255]))
+                os.utime(paths[0], ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+                cached_df = get_df("project2")
+                assert (cached_df["sample_max"].values == df["sample_max"].values).all()
+                assert (cached_df[sets.HASH_ALGORITHM].values
+                        == df[sets.HASH_ALGORITHM].values).all()
+
+                # A new modification time invalidates the cached entry
+                os.utime(paths[0], ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10 ** 9))
+                updated_df = get_df("project3")
+                assert updated_df.iloc[0]["sample_max"] == 255
+                assert updated_df.iloc[0][sets.HASH_ALGORITHM] \
+                       == sets.get_file_digest(paths[0])[0]
+                assert (updated_df["sample_max"].values[1:] == df["sample_max"].values[1:]).all()
+
+                # Digests known to differ prevent using the cached values
+                table_name = "test.table"
+                cache.put(table_name=table_name, file_path=paths[1], digest="a",
+                          properties={"x": 1})
+                assert cache.get(table_name=table_name, file_path=paths[1]) == {"x": 1}
+                assert cache.get(table_name=table_name, file_path=paths[1], digest="a") == {"x": 1}
+                assert cache.get(table_name=table_name, file_path=paths[1], digest="b") is None
+
+                options.properties_cache_max_entries = 2
+                cache = sets.PropertiesCache.get_instance()
+                cache.put(table_name=table_name, file_path=paths[2], digest="c",
+                          properties={"x": 2})
+                assert len(cache) == 2
+                assert cache.get(table_name=table_name, file_path=paths[2]) == {"x": 2}
+                cache.connection.close()
+                sets.PropertiesCache._instances.clear()
+        finally:
+            options.properties_cache_path = original_path
+            options.properties_cache_max_entries = original_max_entries
+
+    def test_name_dependent_properties(self):
+        """Verify that cached properties are not shared among files with identical
+        contents but different names, from which some properties are obtained.
+        """
+        original_path = options.properties_cache_path
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                options.properties_cache_path = os.path.join(tmp_dir, "properties.db")
+                geometries = {"b-u16be-2x3x4.raw": (4, 3, 2), "a-u16be-1x3x8.raw": (8, 3, 1)}
+                for i, (name, geometry) in enumerate(geometries.items()):
+                    file_path = os.path.join(tmp_dir, name)
+                    np.arange(24, dtype=">u2").tofile(file_path)
+                    df = enb.isets.ImagePropertiesTable(
+                        csv_support_path=os.path.join(tmp_dir, f"project{i}.csv"),
+                        base_dir=tmp_dir).get_df(target_indices=[file_path])
+                    assert tuple(df.iloc[0][["width", "height", "component_count"]]) \
+                           == geometry, (name, df.iloc[0])
+                    assert "row_updated" not in sets.PropertiesCache.get_instance().get(
+                        table_name="enb.isets.ImagePropertiesTable", file_path=file_path)
+                cache = sets.PropertiesCache.get_instance()
+                assert len(cache) == 2
+                cache.connection.close()
+                sets.PropertiesCache._instances.clear()
+        finally:
+            options.properties_cache_path = original_path
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Unit tests for tcall.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import enb
+
+
+class TestDirectInvocation(unittest.TestCase):
+    def test_requires_shell(self):
+        """Verify that invocations with shell syntax are identified.
+        """
+        for invocation in ["echo a | cat", "echo a > out.txt", "echo $HOME",
+                           'echo "$HOME"', "ls *.py", "a && b", "VAR=value cmd",
+                           " OMP_NUM_THREADS=1 cmd -i in.raw", "echo 'unbalanced"]:
+            assert enb.tcall.requires_shell(invocation), invocation
+        for invocation in ["echo a", "cmd -i in.raw -o out.raw",
+                           "echo 'a | b'", 'echo "a; b"', "cmd --option=value"]:
+            assert not enb.tcall.requires_shell(invocation), invocation
+
+    def test_direct_invocation(self):
+        """Verify that direct invocations report status, output, time and
+        memory consistently with shell invocations, and that output can be
+        truncated or written to a file.
+        """
+        original_direct_invocation = enb.config.options.direct_invocation
+        try:
+            for direct_invocation in [False, True]:
+                enb.config.options.direct_invocation = direct_invocation
+                status, output, measured_time, _ = \
+                    enb.tcall.get_status_output_time_memory(
+                        f"{sys.executable} -c 'print(sum(range(100000)))'")
+                assert status == 0
+                assert output.strip() == str(sum(range(100000))), output
+                assert measured_time >= 0
+                self.assertRaises(enb.tcall.InvocationError,
+                                  enb.tcall.get_status_output_time_memory,
+                                  f"{sys.executable} -c 'import sys; sys.exit(3)'")
+
+            invocation = [sys.executable, "-c",
+                          "import sys; sys.stdout.write('x' * 100000); sys.exit(3)"]
+            status, output, _, _ = enb.tcall.get_status_output_time_memory_direct(
+                invocation, expected_status_value=3, max_output_bytes=10)
+            assert status == 3
+            assert output.endswith("\n" + "x" * 10), output
+            assert "99990 bytes omitted" in output, output
+            status, output, _, _ = enb.tcall.get_status_output_time_memory_direct(
+                invocation, expected_status_value=3, max_output_bytes=0)
+            assert output == "[100000 bytes omitted]\n", output
+
+            with tempfile.NamedTemporaryFile() as output_file:
+                status, output, _, _ = enb.tcall.get_status_output_time_memory_direct(
+                    invocation, expected_status_value=None, output_path=output_file.name)
+                assert status == 3
+                assert output == ""
+                assert os.path.getsize(output_file.name) == 100000
+
+            self.assertRaises(enb.tcall.InvocationError,
+                              enb.tcall.get_status_output_time_memory_direct,
+                              "echo 'unbalanced")
+
+            # Output options are also applied to invocations run through a shell
+            enb.config.options.direct_invocation = False
+            invocation = f"{sys.executable} -c \"print('x' * 100000)\""
+            _, output, _, _ = enb.tcall.get_status_output_time_memory(
+                invocation, wall=False, max_output_bytes=10)
+            assert output.endswith("\n" + "x" * 10), output
+            assert "99990 bytes omitted" in output, output
+            with tempfile.NamedTemporaryFile() as output_file:
+                _, output, _, _ = enb.tcall.get_status_output_time_memory(
+                    invocation, wall=False, output_path=output_file.name)
+                assert output == ""
+                with open(output_file.name) as written_file:
+                    assert written_file.read() == "x" * 100000
+
+            status, output, _, _ = enb.tcall.get_status_output_time_memory_direct(
+                [sys.executable, "-c", "import time; time.sleep(10)"],
+                expected_status_value=None, timeout=0.5)
+            assert status == -1
+            assert "Timeout" in output
+        finally:
+            enb.config.options.direct_invocation = original_direct_invocation
+
+
+if __name__ == '__main__':
+    unittest.main()